@@ -0,0 +1,155 @@
+"""Latency and throughput of the client calls, offline.
+
+The REST calls are made against an in-process StubServer answering synthetic payloads and
+the CLI calls against the fake lambdaorm command, run per call and as a worker. Every call
+is made --calls times one after the other to measure its latency, then --calls times with
+--concurrency calls in flight to measure its throughput. The decode time and the memory
+of large Schema, Metadata and QueryPlan payloads are measured too.
+
+The results are written as JSON to --output. With --baseline they are compared with a
+previous result and the benchmark exits with status 1 when a median latency or a decode
+time regressed by more than --tolerance.
+
+    python -m benchmarks.bench_client --output before.json
+    python -m benchmarks.bench_client --baseline before.json
+"""
+from typing import Any, Awaitable, Callable, Dict
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from benchmarks.bench_memory import measure
+from lambdaorm.codec import compile_decoder
+from lambdaorm.domain import Metadata, QueryOptions, QueryPlan, Schema
+from lambdaorm.infrastructure import Orm
+from lambdaorm.metrics import percentile
+from lambdaorm.stub import StubServer, install_fake_cli, metadata_payload, plan_payload, schema_payload, stub_routes
+
+REST_CALLS: Dict[str, Callable[[Orm], Awaitable[Any]]] = {
+    'execute': lambda orm: orm.execute('Orders.filter(p => p.id == id)', {'id': 1}),
+    'plan': lambda orm: orm.plan('Orders', QueryOptions(stage='default')),
+    'metadata': lambda orm: orm.metadata('Orders'),
+    'schema.version': lambda orm: orm.get_schema.version(),
+    'schema.domain': lambda orm: orm.get_schema.domain(),
+    'schema.entities': lambda orm: orm.get_schema.entities(),
+    'schema.entity': lambda orm: orm.get_schema.entity('Entity0'),
+    'schema.mappings': lambda orm: orm.get_schema.mappings(),
+    'schema.sources': lambda orm: orm.get_schema.sources(),
+    'schema.stages': lambda orm: orm.get_schema.stages(),
+}
+
+async def measure_call(orm: Orm, call: Callable[[Orm], Awaitable[Any]], calls: int, concurrency: int) -> dict:
+    """Returns the latency of sequential calls and the throughput of concurrent ones."""
+    await call(orm)
+    times = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        await call(orm)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    semaphore = asyncio.Semaphore(concurrency)
+    async def bounded():
+        async with semaphore:
+            await call(orm)
+    start = time.perf_counter()
+    await asyncio.gather(*[bounded() for _ in range(calls)])
+    elapsed = time.perf_counter() - start
+    return {'p50Ms': percentile(times, 0.5) * 1000, 'p95Ms': percentile(times, 0.95) * 1000,
+            'meanMs': statistics.fmean(times) * 1000, 'callsPerSecond': calls / elapsed}
+
+async def measure_rest(calls: int, concurrency: int, entities: int) -> Dict[str, dict]:
+    """Measures every REST call against a stub service."""
+    server = StubServer(routes=stub_routes(entities))
+    orm = Orm(await server.start())
+    try:
+        return {name: await measure_call(orm, call, calls, concurrency) for name, call in REST_CALLS.items()}
+    finally:
+        await orm.close()
+        await server.stop()
+
+async def measure_cli(calls: int, concurrency: int) -> Dict[str, dict]:
+    """Measures execute through the fake CLI, one process per call and with a worker."""
+    results = {}
+    with tempfile.TemporaryDirectory() as workspace:
+        install_fake_cli(workspace)
+        os.environ['PATH'] = f"{workspace}{os.pathsep}{os.environ['PATH']}"
+        for name, worker in (('cli.execute', False), ('cli.worker.execute', True)):
+            orm = Orm(workspace, cli_worker=worker, cli_processes=concurrency)
+            try:
+                results[name] = await measure_call(orm, REST_CALLS['execute'], calls, concurrency)
+            finally:
+                await orm.close()
+    return results
+
+def measure_decode(entities: int, repeat: int, objects: int) -> Dict[str, dict]:
+    """Returns the best decode time and the memory per object of the large payloads."""
+    results = {}
+    for cls, payload in ((Schema, schema_payload(entities)), (Metadata, metadata_payload()), (QueryPlan, plan_payload())):
+        cls.from_dict(payload)
+        best = min(timeit.repeat(lambda cls=cls, payload=payload: cls.from_dict(payload), number=1, repeat=repeat))
+        size = measure(compile_decoder(cls), payload, objects)
+        results[cls.__name__] = {'decodeMs': best * 1000, 'bytesPerObject': size / objects}
+    return results
+
+def commit() -> str:
+    """Returns the commit of the working tree, if it is a git repository."""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(result: dict, baseline: dict, tolerance: float) -> bool:
+    """Prints the changes from the baseline and returns True if something regressed."""
+    regressed = False
+    pairs = [(f"{name} p50", values['p50Ms'], baseline['calls'].get(name, {}).get('p50Ms'))
+             for name, values in result['calls'].items()]
+    pairs += [(f"{name} decode", values['decodeMs'], baseline['decode'].get(name, {}).get('decodeMs'))
+              for name, values in result['decode'].items()]
+    for label, value, previous in pairs:
+        if not previous:
+            continue
+        change = value / previous - 1
+        slower = change > tolerance
+        regressed = regressed or slower
+        print(f"{label:28} {previous:9.3f} -> {value:9.3f} ms {change:+7.1%}{'  regressed' if slower else ''}")
+    return regressed
+
+def main() -> None:
+    """Runs the benchmarks, prints and stores the results."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--cli-calls', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--entities', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--objects', type=int, default=200, help='decoded objects kept to measure the memory')
+    parser.add_argument('--output', help='file to write the results to')
+    parser.add_argument('--baseline', help='results of a previous run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown, 0.2 is 20%%')
+    args = parser.parse_args()
+    calls = asyncio.run(measure_rest(args.calls, args.concurrency, args.entities))
+    calls.update(asyncio.run(measure_cli(args.cli_calls, args.concurrency)))
+    result = {'commit': commit(), 'python': platform.python_version(), 'platform': platform.platform(),
+              'calls': calls, 'decode': measure_decode(args.entities, args.repeat, args.objects)}
+    for name, values in calls.items():
+        print(f"{name:22} p50 {values['p50Ms']:8.3f} ms  p95 {values['p95Ms']:8.3f} ms  "
+              f"{values['callsPerSecond']:9.1f} calls/s")
+    for name, values in result['decode'].items():
+        print(f"{name:22} decode {values['decodeMs']:8.3f} ms  {values['bytesPerObject'] / 1024:8.1f} KiB/object")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(result, file, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)
+        sys.exit(1 if compare(result, baseline, args.tolerance) else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""Benchmark of the Schema decoder and encoder on a large synthetic schema.
+
+Compares the compiled from_dict and to_dict of the domain classes with the generic
+decoder and encoder of dataclasses_json that they replaced.
+
+    python -m benchmarks.bench_decode --entities 600
+"""
+import argparse
+import timeit
+import warnings
+from dataclasses_json.api import DataClassJsonMixin
+from lambdaorm.domain import Schema
+from lambdaorm.stub import schema_payload
+
+def main() -> None:
+    """Runs the benchmark and prints the best time of each decoder and encoder."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entities', type=int, default=600)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    data = schema_payload(args.entities)
+    generic = DataClassJsonMixin.from_dict.__func__
+    # dataclasses_json warns about every missing non optional field
+    warnings.simplefilter('ignore')
+    Schema.from_dict(data)
+    compiled_time = min(timeit.repeat(lambda: Schema.from_dict(data), number=1, repeat=args.repeat))
+    generic_time = min(timeit.repeat(lambda: generic(Schema, data), number=1, repeat=args.repeat))
+    print(f"entities: {args.entities}")
+    print(f"dataclasses_json: {generic_time * 1000:9.2f} ms")
+    print(f"compiled:         {compiled_time * 1000:9.2f} ms")
+    print(f"speedup:          {generic_time / compiled_time:9.1f}x")
+    schema = Schema.from_dict(data)
+    generic_encode = DataClassJsonMixin.to_dict
+    encode_time = min(timeit.repeat(schema.to_dict, number=1, repeat=args.repeat))
+    generic_encode_time = min(timeit.repeat(lambda: generic_encode(schema), number=1, repeat=args.repeat))
+    print(f"dataclasses_json to_dict: {generic_encode_time * 1000:9.2f} ms")
+    print(f"compiled to_dict:         {encode_time * 1000:9.2f} ms")
+    print(f"speedup:                  {generic_encode_time / encode_time:9.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Cold start time of the lambdaorm package.
+
+Runs every import statement in fresh interpreters and reports the median time spent in
+it. The benchmark exits with status 1 when a median exceeds the budget, so it can be used
+as a regression check.
+
+    python -m benchmarks.bench_import --runs 10 --budget 150
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+STATEMENTS = [
+    'from lambdaorm import QueryOptions',
+    'from lambdaorm import SyncOrm',
+    'from lambdaorm import Orm',
+]
+
+PROGRAM = """
+import time
+start = time.perf_counter()
+{statement}
+print(time.perf_counter() - start)
+"""
+
+def measure(statement: str, runs: int) -> float:
+    """Returns the median time in milliseconds of the statement in fresh interpreters."""
+    times = []
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, '-c', PROGRAM.format(statement=statement)])
+        times.append(float(output) * 1000)
+    return statistics.median(times)
+
+def main() -> None:
+    """Runs the benchmark and prints the median time of each statement."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--budget', type=float, default=150, help='milliseconds allowed for each statement')
+    args = parser.parse_args()
+    over_budget = False
+    for statement in STATEMENTS:
+        median = measure(statement, args.runs)
+        over_budget = over_budget or median > args.budget
+        print(f"{statement:40} {median:8.2f} ms{'  over budget' if median > args.budget else ''}")
+    sys.exit(1 if over_budget else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Memory used by decoded Metadata and QueryPlan trees.
+
+Decodes the same payloads with the slotted domain classes and with plain dataclass
+copies of them (same fields, with a per-instance __dict__) and reports the memory
+allocated by each, measured with tracemalloc.
+
+    python -m benchmarks.bench_memory --trees 2000
+"""
+from typing import Any, Dict, List, Optional, Union, get_args, get_origin, get_type_hints
+from dataclasses import field, fields, is_dataclass, make_dataclass
+import argparse
+import gc
+import tracemalloc
+from lambdaorm.codec import compile_decoder
+from lambdaorm.domain import Metadata, QueryPlan
+from lambdaorm.stub import metadata_payload, plan_payload
+
+def plain_copy(cls: type, copies: Dict[type, type]) -> type:
+    """Returns a dataclass with the fields of cls but without __slots__."""
+    if cls in copies:
+        return copies[cls]
+    copy = make_dataclass(f"Plain{cls.__name__}", [(f.name, Any, field(default=None)) for f in fields(cls)])
+    copies[cls] = copy
+    copy.__annotations__ = {name: _remap(hint, copies) for name, hint in get_type_hints(cls).items()}
+    return copy
+
+def _remap(hint: Any, copies: Dict[type, type]) -> Any:
+    if isinstance(hint, type) and is_dataclass(hint):
+        return plain_copy(hint, copies)
+    if get_origin(hint) is Union:
+        return Optional[_remap([arg for arg in get_args(hint) if arg is not type(None)][0], copies)]
+    if get_origin(hint) is list:
+        return List[_remap(get_args(hint)[0], copies)]
+    return hint
+
+def measure(decoder, payload: dict, trees: int) -> int:
+    """Returns the bytes allocated to keep the decoded trees alive."""
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    decoded = [decoder(payload) for _ in range(trees)]
+    size = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    del decoded
+    return size
+
+def main() -> None:
+    """Runs the comparison and prints the memory used per tree."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trees', type=int, default=2000)
+    args = parser.parse_args()
+    copies: Dict[type, type] = {}
+    for cls, payload in ((Metadata, metadata_payload()), (QueryPlan, plan_payload())):
+        slotted = measure(compile_decoder(cls), payload, args.trees)
+        plain = measure(compile_decoder(plain_copy(cls, copies)), payload, args.trees)
+        print(f"{cls.__name__}: slots {slotted / args.trees / 1024:8.1f} KiB/tree, "
+              f"__dict__ {plain / args.trees / 1024:8.1f} KiB/tree, saved {1 - slotted / plain:6.1%}")
+
+if __name__ == '__main__':
+    main()
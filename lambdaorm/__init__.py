@@ -0,0 +1,53 @@
+"""LambdaORM client.
+
+The public names are imported on first access, so `from lambdaorm import SyncOrm` does not
+load asyncio and `from lambdaorm import QueryOptions` does not load any client.
+"""
+from typing import TYPE_CHECKING
+import importlib
+
+_exports = {
+    'lambdaorm.infrastructure': ['Orm', 'OrmBuilder', 'RestClientOrm', 'CliClientOrm'],
+    'lambdaorm.sync': ['SyncOrm'],
+    'lambdaorm.application': ['Interceptor'],
+    'lambdaorm.transport': ['AsyncHttpClient', 'HttpError', 'HttpResponse'],
+    'lambdaorm.process': ['CliError'],
+    'lambdaorm.metrics': ['Metrics'],
+    'lambdaorm.resilience': ['RetryPolicy', 'CircuitBreaker', 'CircuitOpenError'],
+    'lambdaorm.balancer': ['LoadBalancer'],
+    'lambdaorm.hedging': ['HedgePolicy'],
+    'lambdaorm.compression': ['Compression'],
+    'lambdaorm.cache': ['PlanCache', 'IntrospectionCache', 'ResultCache', 'SingleFlight'],
+    'lambdaorm.domain': ['QueryOptions', 'MethodOptions', 'QueryPlan', 'Metadata', 'MetadataModel',
+                         'MetadataParameter', 'MetadataConstraint', 'ChunkResult', 'Schema', 'SchemaConfig',
+                         'Version', 'Ping', 'Health', 'TransportRequest'],
+}
+_modules = {name: module for module, names in _exports.items() for name in names}
+__all__ = list(_modules)
+
+if TYPE_CHECKING:
+    from lambdaorm.infrastructure import Orm, OrmBuilder, RestClientOrm, CliClientOrm
+    from lambdaorm.sync import SyncOrm
+    from lambdaorm.application import Interceptor
+    from lambdaorm.transport import AsyncHttpClient, HttpError, HttpResponse
+    from lambdaorm.process import CliError
+    from lambdaorm.metrics import Metrics
+    from lambdaorm.resilience import RetryPolicy, CircuitBreaker, CircuitOpenError
+    from lambdaorm.balancer import LoadBalancer
+    from lambdaorm.hedging import HedgePolicy
+    from lambdaorm.compression import Compression
+    from lambdaorm.cache import PlanCache, IntrospectionCache, ResultCache, SingleFlight
+    from lambdaorm.domain import (QueryOptions, MethodOptions, QueryPlan, Metadata, MetadataModel,
+    MetadataParameter, MetadataConstraint, ChunkResult, Schema, SchemaConfig, Version, Ping, Health,
+    TransportRequest)
+
+def __getattr__(name: str):
+    module = _modules.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -1,9 +1,9 @@
 # pylint: disable=invalid-name
 """This module contains the main class of the library."""
-from typing import List, Any, Optional
+from typing import List, Any, AsyncIterator, Awaitable, Callable, Optional
 from lambdaorm.domain import (Metadata, MetadataConstraint, MetadataModel,
 MetadataParameter, MethodOptions,QueryOptions, QueryPlan, SchemaConfig,Version, Ping, Health,
-Schema, DomainSchema, Entity, Enum, Mapping, EntityMapping, Stage )
+Schema, DomainSchema, Entity, Enum, Mapping, EntityMapping, Stage, ChunkResult, TransportRequest )
 
 class ExpressionService:
     """Interface for Expression Service."""
@@ -36,6 +36,66 @@ class ExpressionService:
         """Queue execute query for the given expression."""
         raise NotImplementedError
 
+    async def execute_many(self, expression: str, rows: List[dict], options: QueryOptions = None, method_options: MethodOptions = None) -> List[ChunkResult]:
+        """Execute the expression over the rows split in chunks of QueryOptions.chunkSize or MethodOptions.chunk.
+
+        The chunks are submitted concurrently, at most MethodOptions.concurrency at a time,
+        and a failed chunk is reported in its ChunkResult instead of raising.
+        """
+        raise NotImplementedError
+
+    def execute_stream(self, expression: str, data: dict = None, options: QueryOptions = None, method_options: MethodOptions = None, batch_size: int = None) -> AsyncIterator[Any]:
+        """Execute query for the given expression, yielding the rows as they arrive.
+
+        With a batch_size the rows are yielded in lists of at most that many rows.
+        """
+        raise NotImplementedError
+
+    def execute_pages(self, expression: str, data: dict = None, options: QueryOptions = None, method_options: MethodOptions = None, page_size: int = None, prefetch: int = None) -> AsyncIterator[List[Any]]:
+        """Execute the read expression page by page, yielding the rows of every page.
+
+        The page clause of the expression is replaced, or appended, for each page. The next
+        prefetch pages are requested while the current one is consumed and the iteration stops
+        after the first page with less than page_size rows.
+        """
+        raise NotImplementedError
+
+class ExpressionServiceDecorator(ExpressionService):
+    """Expression service that delegates every call to another expression service."""
+
+    def __init__(self, expression: ExpressionService):
+        self.inner = expression
+
+    async def model(self, expression: str) -> List[MetadataModel]:
+        return await self.inner.model(expression)
+
+    async def parameters(self, expression: str) -> List[MetadataParameter]:
+        return await self.inner.parameters(expression)
+
+    async def constraints(self, expression: str) -> MetadataConstraint:
+        return await self.inner.constraints(expression)
+
+    async def metadata(self, expression: str) -> Metadata:
+        return await self.inner.metadata(expression)
+
+    async def plan(self, expression: str, options: QueryOptions, method_options: MethodOptions = None) -> QueryPlan:
+        return await self.inner.plan(expression, options, method_options)
+
+    async def execute(self, expression: str, data: dict = None, options: QueryOptions = None, method_options: MethodOptions = None) -> dict:
+        return await self.inner.execute(expression, data, options, method_options)
+
+    async def execute_queued(self, expression: str, topic: str, data: dict = None, options: QueryOptions = None, method_options: MethodOptions = None) -> dict:
+        return await self.inner.execute_queued(expression, topic, data, options, method_options)
+
+    async def execute_many(self, expression: str, rows: List[dict], options: QueryOptions = None, method_options: MethodOptions = None) -> List[ChunkResult]:
+        return await self.inner.execute_many(expression, rows, options, method_options)
+
+    def execute_stream(self, expression: str, data: dict = None, options: QueryOptions = None, method_options: MethodOptions = None, batch_size: int = None) -> AsyncIterator[Any]:
+        return self.inner.execute_stream(expression, data, options, method_options, batch_size)
+
+    def execute_pages(self, expression: str, data: dict = None, options: QueryOptions = None, method_options: MethodOptions = None, page_size: int = None, prefetch: int = None) -> AsyncIterator[List[Any]]:
+        return self.inner.execute_pages(expression, data, options, method_options, page_size, prefetch)
+
 class GeneralService:
     """Interface for General Service."""
     async def version(self) -> Version:
@@ -154,6 +214,18 @@ class StageService:
         """
         raise NotImplementedError
 
+class Interceptor:
+    """Interface for the interceptors of the transport calls."""
+
+    async def intercept(self, request: TransportRequest, call_next: Callable[[TransportRequest], Awaitable[Any]]) -> Any:
+        """Handles a call, returning the decoded response or raising.
+
+        call_next sends the request through the rest of the chain, an interceptor can change
+        the request, the response or the exception, or answer without calling it. For a
+        streamed call the response is the async iterator of the items.
+        """
+        raise NotImplementedError
+
 class IOrm(ExpressionService):
     """Interface for Orm."""
 
@@ -171,3 +243,7 @@ class IOrm(ExpressionService):
     def get_stage(self) -> StageService:
         """Get the stage service."""
         raise NotImplementedError
+
+    async def close(self) -> None:
+        """Release the resources held by the client."""
+        raise NotImplementedError
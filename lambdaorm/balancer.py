@@ -0,0 +1,120 @@
+"""Client side load balancing across replicas of a LambdaORM service."""
+from typing import Any, Awaitable, Callable, List, Optional, Set
+import asyncio
+import random
+import time
+from lambdaorm.resilience import transient
+
+class Node:
+    """Replica of the service and the calls in flight to it."""
+    __slots__ = ('url', 'outstanding', 'calls', 'failures', 'healthy', 'check_at', 'checking')
+
+    def __init__(self, url: str):
+        self.url = url.rstrip('/')
+        self.outstanding = 0
+        self.calls = 0
+        self.failures = 0
+        self.healthy = True
+        self.check_at = 0.0
+        self.checking = False
+
+class LoadBalancer:
+    """Spreads the calls across the replicas of a service.
+
+    strategy 'p2c' sends every call to the one with less calls in flight of two random
+    healthy replicas and 'least' to the healthy replica with less calls in flight. A replica
+    is taken out after failure_threshold consecutive transient failures and checked with
+    the check function, ping by default, every check_interval seconds until it answers.
+    When no replica is healthy the calls are spread across all of them.
+    """
+    STRATEGIES = ('p2c', 'least')
+
+    def __init__(self, urls: List[str] = None, strategy: str = 'p2c', failure_threshold: int = 3,
+                 check_interval: float = 5.0, check_timeout: float = 2.0):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown strategy {strategy}, use one of {', '.join(self.STRATEGIES)}")
+        self.strategy = strategy
+        self.failure_threshold = failure_threshold
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self.check: Optional[Callable[[str], Awaitable[Any]]] = None
+        self.nodes: List[Node] = []
+        self.random = random.Random()
+        self._checks: Set[asyncio.Task] = set()
+        for url in urls or []:
+            self.add(url)
+
+    def add(self, url: str) -> None:
+        """Adds a replica, a url that was already added is ignored."""
+        node = Node(url)
+        if all(other.url != node.url for other in self.nodes):
+            self.nodes.append(node)
+
+    def remove(self, url: str) -> None:
+        """Removes a replica, the calls in flight to it complete."""
+        self.nodes = [node for node in self.nodes if node.url != url.rstrip('/')]
+
+    def acquire(self) -> Node:
+        """Returns the replica for a call, the caller must release it."""
+        if not self.nodes:
+            raise ValueError("The load balancer has no replicas")
+        self._schedule_checks()
+        candidates = [node for node in self.nodes if node.healthy] or self.nodes
+        if len(candidates) == 1:
+            node = candidates[0]
+        elif self.strategy == 'p2c':
+            first, second = self.random.sample(candidates, 2)
+            node = first if first.outstanding <= second.outstanding else second
+        else:
+            fewest = min(node.outstanding for node in candidates)
+            node = self.random.choice([node for node in candidates if node.outstanding == fewest])
+        node.outstanding += 1
+        node.calls += 1
+        return node
+
+    def release(self, node: Node, error: BaseException = None) -> None:
+        """Records the end of a call, error is the exception it raised."""
+        node.outstanding -= 1
+        if isinstance(error, asyncio.CancelledError):
+            # a cancelled call, such as the loser of a hedged read, says nothing about the replica
+            return
+        if error is None or not transient(error):
+            node.failures = 0
+            return
+        node.failures += 1
+        if node.healthy and node.failures >= self.failure_threshold:
+            node.healthy = False
+            node.check_at = time.monotonic() + self.check_interval
+
+    def _schedule_checks(self) -> None:
+        now = time.monotonic()
+        for node in self.nodes:
+            if not node.healthy and not node.checking and node.check_at <= now and self.check is not None:
+                node.checking = True
+                task = asyncio.ensure_future(self._check(node))
+                self._checks.add(task)
+                task.add_done_callback(self._checks.discard)
+
+    async def _check(self, node: Node) -> None:
+        try:
+            await asyncio.wait_for(self.check(node.url), self.check_timeout)
+        except Exception:  # pylint: disable=broad-except
+            node.check_at = time.monotonic() + self.check_interval
+        else:
+            node.healthy = True
+            node.failures = 0
+        finally:
+            node.checking = False
+
+    @property
+    def stats(self) -> dict:
+        """Returns the state of every replica."""
+        return {'nodes': [{'url': node.url, 'healthy': node.healthy, 'outstanding': node.outstanding,
+                           'calls': node.calls, 'failures': node.failures} for node in self.nodes]}
+
+    async def close(self) -> None:
+        """Cancels the health checks in progress."""
+        for task in list(self._checks):
+            task.cancel()
+        if self._checks:
+            await asyncio.gather(*self._checks, return_exceptions=True)
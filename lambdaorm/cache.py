@@ -0,0 +1,707 @@
+# pylint: disable=invalid-name
+"""Client side caches for the LambdaORM client."""
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+from collections import OrderedDict
+import asyncio
+import copy
+import json
+import os
+import pickle
+import re
+import time
+from lambdaorm.domain import (ChunkResult, DomainSchema, Entity, EntityMapping, EnumDomain, Mapping, Metadata,
+MetadataConstraint, MetadataModel, MetadataParameter, MethodOptions, QueryOptions, QueryPlan, Schema,
+SchemaSnapshot, Source, Stage, Version)
+from lambdaorm.application import ExpressionService, ExpressionServiceDecorator, SchemaService
+
+def normalize_expression(expression: str) -> str:
+    """Collapses the whitespace of an expression, keeping string literals untouched."""
+    result = []
+    quote = None
+    pending_space = False
+    for char in expression.strip():
+        if quote is not None:
+            result.append(char)
+            if char == quote and result[-2:-1] != ['\\']:
+                quote = None
+        elif char.isspace():
+            pending_space = True
+        else:
+            if pending_space:
+                result.append(' ')
+                pending_space = False
+            if char in ('"', "'", '`'):
+                quote = char
+            result.append(char)
+    return ''.join(result)
+
+_WRITE_ACTION = re.compile(r'\.\s*(insert|bulkInsert|update|updateAll|bulkUpdate|delete|deleteAll|bulkDelete|'
+                           r'upsert|bulkUpsert|merge|bulkMerge|truncate)\s*\(')
+
+def _outside_literals(expression: str) -> str:
+    """Returns the expression with the content of its string literals removed."""
+    result = []
+    quote = None
+    previous = ''
+    for char in expression:
+        if quote is not None:
+            if char == quote and previous != '\\':
+                quote = None
+                result.append(char)
+        else:
+            if char in ('"', "'", '`'):
+                quote = char
+            result.append(char)
+        previous = char
+    return ''.join(result)
+
+def is_write_expression(expression: str) -> bool:
+    """True if the expression inserts, updates or deletes rows."""
+    return _WRITE_ACTION.search(_outside_literals(expression)) is not None
+
+def data_key(data: Any) -> Optional[str]:
+    """Returns a canonical JSON text of the data of an expression, None if it is not JSON serializable."""
+    try:
+        return json.dumps(data, sort_keys=True, separators=(',', ':'))
+    except (TypeError, ValueError):
+        return None
+
+class LruCache:
+    """Bounded least recently used cache with hit, miss and eviction counters.
+
+    When a ttl is given the entries expire that many seconds after being stored.
+    """
+    def __init__(self, max_size: int = 256, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        # key -> (expires_at, value)
+        self._entries: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Returns the cached value and marks it as the most recently used."""
+        try:
+            expires_at, value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        if expires_at is not None and expires_at <= time.time():
+            del self._entries[key]
+            self._removed(key, value)
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Stores a value, evicting the least recently used entries above max_size."""
+        self._entries[key] = (time.time() + self.ttl if self.ttl is not None else None, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self.evict()
+
+    def evict(self) -> None:
+        """Removes the least recently used entry."""
+        old_key, (_, old_value) = self._entries.popitem(last=False)
+        self._removed(old_key, old_value)
+        self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Removes a value from the cache."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return default
+        self._removed(key, entry[1])
+        return entry[1]
+
+    def _removed(self, key: Hashable, value: Any) -> None:
+        """Called when an entry is expired, evicted or popped."""
+
+    def clear(self) -> None:
+        """Removes all the entries, the counters are kept."""
+        self._entries.clear()
+
+    @property
+    def hit_ratio(self) -> float:
+        """Fraction of the lookups answered by the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        """Returns the size and counters of the cache."""
+        return {'size': len(self._entries), 'maxSize': self.max_size, 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions, 'expirations': self.expirations}
+
+class SchemaVersionWatcher:
+    """Tracks the schema version, asking SchemaService.version at most once per interval.
+
+    Backends that do not implement the version endpoint report None, so caches keyed on
+    the version are never invalidated by them. When the version cannot be fetched the last
+    known one is kept and the next attempt waits for the interval too.
+    """
+    def __init__(self, schema: SchemaService, interval: float = 10):
+        self.schema = schema
+        self.interval = interval
+        self._version: Optional[str] = None
+        self._checked_at: Optional[float] = None
+        self._pending: Optional[asyncio.Future] = None
+
+    async def version(self) -> Optional[str]:
+        """Returns the current schema version."""
+        if self._checked_at is not None and time.monotonic() - self._checked_at < self.interval:
+            return self._version
+        if self._pending is None or self._pending.done():
+            self._pending = asyncio.ensure_future(self._fetch())
+        return await asyncio.shield(self._pending)
+
+    async def _fetch(self) -> Optional[str]:
+        try:
+            response = await self.schema.version()
+            self._version = getattr(response, 'version', response)
+        except NotImplementedError:
+            self._version = None
+        except Exception:  # pylint: disable=broad-except
+            # a failing version call must not fail the calls served from the cache
+            pass
+        self._checked_at = time.monotonic()
+        return self._version
+
+class VersionedCache(LruCache):
+    """LRU cache whose entries are only valid for one schema version."""
+    def __init__(self, max_size: int = 256, ttl: Optional[float] = None, version_interval: float = 10):
+        super().__init__(max_size, ttl)
+        self.version_interval = version_interval
+        self.version: Optional[str] = None
+
+    def sync_version(self, version: Optional[str]) -> None:
+        """Clears the cache when the schema version changes."""
+        if version != self.version:
+            self.clear()
+            self.version = version
+
+class PlanCache(VersionedCache):
+    """LRU cache of query plans keyed by normalized expression, stage and view."""
+    def __init__(self, max_size: int = 256, version_interval: float = 10):
+        super().__init__(max_size, version_interval=version_interval)
+
+    def key(self, expression: str, options: QueryOptions) -> tuple:
+        """Returns the cache key of a plan."""
+        if options is None:
+            return (normalize_expression(expression), None, None)
+        return (normalize_expression(expression), options.stage, options.view)
+
+class IntrospectionCache(VersionedCache):
+    """Cache of the model, parameters, constraints and metadata of expressions.
+
+    The entries expire after ttl seconds. When a path is given the cache is loaded from it on
+    creation, a file that cannot be read leaving it empty, and written back with save() or
+    flush(). After a miss, once save_interval seconds have passed since the last write, put()
+    writes it too, in the default executor when it runs on an event loop. The file is a pickle
+    and must only be shared between trusted processes.
+    """
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = 3600, version_interval: float = 10,
+                 path: Optional[str] = None, save_interval: float = 5):
+        super().__init__(max_size, ttl, version_interval)
+        self.path = path
+        self.save_interval = save_interval
+        self._saved_at = time.monotonic()
+        self._saving: Optional[asyncio.Future] = None
+        if path is not None:
+            self.load()
+
+    def key(self, method: str, expression: str) -> tuple:
+        """Returns the cache key of an introspection result."""
+        return (method, normalize_expression(expression))
+
+    def load(self) -> None:
+        """Loads the entries stored in path, skipping the expired ones."""
+        try:
+            with open(self.path, 'rb') as file:
+                stored = pickle.load(file)
+            version, entries = stored['version'], list(stored['entries'])
+        except Exception:  # pylint: disable=broad-except
+            # a missing, truncated or incompatible file, such as one pickled by another version, is a cold start
+            return
+        now = time.time()
+        self.version = version
+        for key, (expires_at, value) in entries:
+            if expires_at is None or expires_at > now:
+                self._entries[key] = (expires_at, value)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _snapshot(self) -> dict:
+        self._saved_at = time.monotonic()
+        return {'version': self.version, 'entries': list(self._entries.items())}
+
+    def _write(self, stored: dict) -> None:
+        import tempfile  # pylint: disable=import-outside-toplevel
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with tempfile.NamedTemporaryFile('wb', dir=directory, delete=False) as file:
+            pickle.dump(stored, file)
+        os.replace(file.name, self.path)
+
+    def save(self) -> None:
+        """Writes the entries to path, replacing the previous file atomically."""
+        if self.path is not None:
+            self._write(self._snapshot())
+
+    async def flush(self) -> None:
+        """Waits for a write started by put() and writes the entries to path in the default executor."""
+        if self.path is None:
+            return
+        if self._saving is not None and not self._saving.done():
+            await asyncio.wait([self._saving])
+        self._saving = asyncio.get_running_loop().run_in_executor(None, self._write, self._snapshot())
+        await self._saving
+
+    def put(self, key: Hashable, value: Any) -> None:
+        super().put(key, value)
+        if self.path is None or time.monotonic() - self._saved_at < self.save_interval:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.save()
+            return
+        # one write at a time, so that an older snapshot never replaces a newer file
+        if self._saving is None or self._saving.done():
+            self._saving = loop.run_in_executor(None, self._write, self._snapshot())
+            # a failed background write is retried after the next interval
+            self._saving.add_done_callback(lambda future: future.cancelled() or future.exception())
+
+class ResultCache(LruCache):
+    """Cache of the results of read expressions, keyed by normalized expression, data, stage and view.
+
+    Every result is indexed by the entities its expression reads, so that a write can evict
+    the results it may have changed, and every invalidation of an entity increments its
+    generation, so that a read that was in flight meanwhile is not stored. With max_bytes the
+    size of a result is estimated as the length of its JSON encoding and the least recently
+    used results are evicted to stay below it; without it the sizes are not measured and
+    stats() reports bytes as None. The results are stored and returned as deep
+    copies, so the callers can modify them; with copy_results False the same objects are
+    shared by every caller, which must then treat them as read only.
+    """
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = 60, max_bytes: Optional[int] = None,
+                 copy_results: bool = True):
+        super().__init__(max_size, ttl)
+        self.max_bytes = max_bytes
+        self.copy_results = copy_results
+        self.bytes = 0
+        self.invalidations = 0
+        self._by_entity: Dict[str, set] = {}
+        self._generations: Dict[str, int] = {}
+        self._cleared = 0
+
+    def key(self, expression: str, data_text: str, options: QueryOptions) -> tuple:
+        """Returns the cache key of a result, data_text is the canonical JSON of the data."""
+        if options is None:
+            return (normalize_expression(expression), data_text, None, None)
+        return (normalize_expression(expression), data_text, options.stage, options.view)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = super().get(key)
+        if entry is None:
+            return default
+        return copy.deepcopy(entry[0]) if self.copy_results else entry[0]
+
+    def generation(self, entities: frozenset) -> int:
+        """Returns a number that changes whenever a result reading any of the entities is invalidated."""
+        return self._cleared + sum(self._generations.get(entity, 0) for entity in entities)
+
+    def put(self, key: Hashable, value: Any, entities: frozenset = frozenset(), generation: Optional[int] = None) -> None:
+        """Stores a result, unless generation is given and its entities were invalidated since it was taken."""
+        if generation is not None and generation != self.generation(entities):
+            return
+        size = len(json.dumps(value, default=str)) if self.max_bytes is not None else 0
+        self.pop(key)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        super().put(key, (copy.deepcopy(value) if self.copy_results else value, size, entities))
+        self.bytes += size
+        for entity in entities:
+            self._by_entity.setdefault(entity, set()).add(key)
+        while self.max_bytes is not None and self.bytes > self.max_bytes:
+            self.evict()
+
+    def _removed(self, key: Hashable, value: Any) -> None:
+        _, size, entities = value
+        self.bytes -= size
+        for entity in entities:
+            keys = self._by_entity.get(entity)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_entity[entity]
+
+    def invalidate(self, entities: frozenset) -> int:
+        """Removes the results that read any of the entities and returns how many were removed."""
+        keys = set()
+        for entity in entities:
+            self._generations[entity] = self._generations.get(entity, 0) + 1
+            keys.update(self._by_entity.get(entity, ()))
+        for key in keys:
+            self.pop(key)
+        self.invalidations += len(keys)
+        return len(keys)
+
+    def clear(self) -> None:
+        super().clear()
+        self.bytes = 0
+        self._by_entity = {}
+        self._cleared += 1
+
+    def stats(self) -> dict:
+        return {**super().stats(), 'hitRatio': self.hit_ratio,
+                'bytes': self.bytes if self.max_bytes is not None else None, 'invalidations': self.invalidations}
+
+def metadata_entities(metadata: Metadata) -> frozenset:
+    """Returns the entities referenced by a metadata tree."""
+    entities = set()
+    pending = [metadata]
+    while pending:
+        node = pending.pop()
+        if node is None:
+            continue
+        if node.entity is not None:
+            entities.add(node.entity)
+        if node.children:
+            pending.extend(node.children)
+    return frozenset(entities)
+
+class PlanCacheExpressionService(ExpressionServiceDecorator):
+    """Expression service that serves plans from a PlanCache."""
+    def __init__(self, expression: ExpressionService, schema: SchemaService, cache: PlanCache):
+        super().__init__(expression)
+        self.cache = cache
+        self.watcher = SchemaVersionWatcher(schema, cache.version_interval)
+
+    async def plan(self, expression: str, options: QueryOptions, method_options: MethodOptions = None) -> QueryPlan:
+        self.cache.sync_version(await self.watcher.version())
+        key = self.cache.key(expression, options)
+        plan = self.cache.get(key)
+        if plan is None:
+            plan = await self.inner.plan(expression, options, method_options)
+            self.cache.put(key, plan)
+        return plan
+
+class IntrospectionCacheExpressionService(ExpressionServiceDecorator):
+    """Expression service that serves model, parameters, constraints and metadata from an IntrospectionCache."""
+    def __init__(self, expression: ExpressionService, schema: SchemaService, cache: IntrospectionCache):
+        super().__init__(expression)
+        self.cache = cache
+        self.watcher = SchemaVersionWatcher(schema, cache.version_interval)
+
+    async def _cached(self, method: str, expression: str, call: Callable[[str], Awaitable[Any]]) -> Any:
+        self.cache.sync_version(await self.watcher.version())
+        key = self.cache.key(method, expression)
+        result = self.cache.get(key)
+        if result is None:
+            result = await call(expression)
+            self.cache.put(key, result)
+        return result
+
+    async def model(self, expression: str) -> List[MetadataModel]:
+        return await self._cached('model', expression, self.inner.model)
+
+    async def parameters(self, expression: str) -> List[MetadataParameter]:
+        return await self._cached('parameters', expression, self.inner.parameters)
+
+    async def constraints(self, expression: str) -> MetadataConstraint:
+        return await self._cached('constraints', expression, self.inner.constraints)
+
+    async def metadata(self, expression: str) -> Metadata:
+        return await self._cached('metadata', expression, self.inner.metadata)
+
+class SnapshotSchemaService(SchemaService):
+    """Schema service answering from a local SchemaSnapshot.
+
+    The snapshot is loaded from the wrapped service on first use. Afterwards, once every
+    refresh_interval seconds, a lookup starts a background check of the schema version and the
+    snapshot is reloaded when it changed; lookups never wait for that refresh.
+    """
+    def __init__(self, schema: SchemaService, refresh_interval: float = 30):
+        self.inner = schema
+        self.refresh_interval = refresh_interval
+        self.snapshot: Optional[SchemaSnapshot] = None
+        self._checked_at: Optional[float] = None
+        self._pending: Optional[asyncio.Future] = None
+
+    async def current(self) -> SchemaSnapshot:
+        """Returns the current snapshot, loading it the first time."""
+        if self.snapshot is None:
+            if self._pending is None or self._pending.done():
+                self._pending = asyncio.ensure_future(self.refresh())
+            await asyncio.shield(self._pending)
+        elif time.monotonic() - self._checked_at >= self.refresh_interval:
+            if self._pending is None or self._pending.done():
+                self._pending = asyncio.ensure_future(self._refresh_in_background())
+        return self.snapshot
+
+    async def refresh(self) -> SchemaSnapshot:
+        """Reloads the snapshot if the schema version changed."""
+        try:
+            response = await self.inner.version()
+            version = getattr(response, 'version', response)
+        except NotImplementedError:
+            version = None
+        if self.snapshot is None or version != self.snapshot.version:
+            self.snapshot = SchemaSnapshot(await self.inner.schema(), version)
+        self._checked_at = time.monotonic()
+        return self.snapshot
+
+    async def _refresh_in_background(self) -> None:
+        try:
+            await self.refresh()
+        except Exception:  # pylint: disable=broad-except
+            # keep serving the previous snapshot, the next lookup after the interval retries
+            self._checked_at = time.monotonic()
+
+    async def version(self) -> Version:
+        return Version(version=(await self.current()).version)
+
+    async def schema(self) -> Schema:
+        return (await self.current()).schema
+
+    async def domain(self) -> DomainSchema:
+        return (await self.current()).schema.domain
+
+    async def sources(self) -> List[Source]:
+        return list((await self.current()).sources.values())
+
+    async def source(self, source: str) -> Optional[Source]:
+        return (await self.current()).source(source)
+
+    async def entities(self) -> List[Entity]:
+        return list((await self.current()).entities.values())
+
+    async def entity(self, entity: str) -> Optional[Entity]:
+        return (await self.current()).entity(entity)
+
+    async def enums(self) -> List[EnumDomain]:
+        return list((await self.current()).enums.values())
+
+    async def enum(self, _enum: str) -> Optional[EnumDomain]:
+        return (await self.current()).enum(_enum)
+
+    async def mappings(self) -> List[Mapping]:
+        return list((await self.current()).mappings.values())
+
+    async def mapping(self, mapping: str) -> Optional[Mapping]:
+        return (await self.current()).mapping(mapping)
+
+    async def entityMapping(self, mapping: str, entity: str) -> Optional[EntityMapping]:
+        return (await self.current()).entity_mapping(mapping, entity)
+
+    async def stages(self) -> List[Stage]:
+        return list((await self.current()).stages.values())
+
+    async def stage(self, stage: str) -> Optional[Stage]:
+        return (await self.current()).stage(stage)
+
+    async def views(self) -> List[str]:
+        return (await self.current()).views
+
+_MISSING = object()
+
+class ResultCacheExpressionService(ExpressionServiceDecorator):
+    """Expression service that serves the results of read expressions from a ResultCache.
+
+    The entities of an expression are taken from its metadata. A write evicts the cached
+    results that read any of its entities, or all of them when its entities are unknown.
+    """
+    def __init__(self, expression: ExpressionService, cache: ResultCache):
+        super().__init__(expression)
+        self.cache = cache
+        self._entities = LruCache(1024)
+
+    async def entities(self, expression: str) -> Optional[frozenset]:
+        """Returns the entities of an expression, None if its metadata is not available."""
+        key = normalize_expression(expression)
+        entities = self._entities.get(key)
+        if entities is None:
+            try:
+                entities = metadata_entities(await self.inner.metadata(expression))
+            except Exception:  # pylint: disable=broad-except
+                return None
+            self._entities.put(key, entities)
+        return entities
+
+    async def _invalidate(self, expression: str) -> None:
+        entities = await self.entities(expression)
+        if entities is None:
+            self.cache.clear()
+        else:
+            self.cache.invalidate(entities)
+
+    async def execute(self, expression: str, data: dict = None, options: QueryOptions = None, method_options: MethodOptions = None) -> dict:
+        if is_write_expression(expression):
+            result = await self.inner.execute(expression, data, options, method_options)
+            await self._invalidate(expression)
+            return result
+        data_text = data_key(data)
+        if data_text is None:
+            return await self.inner.execute(expression, data, options, method_options)
+        key = self.cache.key(expression, data_text, options)
+        result = self.cache.get(key, _MISSING)
+        if result is not _MISSING:
+            return result
+        entities = await self.entities(expression)
+        if entities is None:
+            return await self.inner.execute(expression, data, options, method_options)
+        # a write completed while the read is in flight makes its result stale
+        generation = self.cache.generation(entities)
+        result = await self.inner.execute(expression, data, options, method_options)
+        self.cache.put(key, result, entities, generation)
+        return result
+
+    async def execute_queued(self, expression: str, topic: str, data: dict = None, options: QueryOptions = None, method_options: MethodOptions = None) -> dict:
+        result = await self.inner.execute_queued(expression, topic, data, options, method_options)
+        if is_write_expression(expression):
+            await self._invalidate(expression)
+        return result
+
+    async def execute_many(self, expression: str, rows: List[dict], options: QueryOptions = None, method_options: MethodOptions = None) -> List[ChunkResult]:
+        results = await self.inner.execute_many(expression, rows, options, method_options)
+        if is_write_expression(expression):
+            await self._invalidate(expression)
+        return results
+
+class SingleFlight:
+    """Shares one in-flight call among the concurrent callers asking for the same key.
+
+    The first caller starts the call and the callers arriving before it completes wait for
+    the same result or exception. With copy_results the callers that joined receive a deep copy of
+    the result, so they can modify it without affecting each other.
+    """
+    def __init__(self, copy_results: bool = False):
+        self.copy_results = copy_results
+        self.calls = 0
+        self.shared = 0
+        self._flights: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Returns the result of call, sharing it with the concurrent callers of the same key."""
+        flight = self._flights.get(key)
+        if flight is None:
+            self.calls += 1
+            flight = self._flights[key] = asyncio.ensure_future(call())
+            flight.add_done_callback(lambda done: self._land(key, done))
+            # a cancelled caller must not cancel the call of the others
+            return await asyncio.shield(flight)
+        self.shared += 1
+        result = await asyncio.shield(flight)
+        return copy.deepcopy(result) if self.copy_results else result
+
+    def _land(self, key: Hashable, flight: asyncio.Future) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.cancelled():
+            # retrieve the exception so that it is not reported as never retrieved
+            flight.exception()
+
+    def stats(self) -> dict:
+        """Returns the calls started, the calls shared and the calls in flight."""
+        return {'calls': self.calls, 'shared': self.shared, 'inFlight': len(self._flights)}
+
+class SingleFlightExpressionService(ExpressionServiceDecorator):
+    """Expression service that coalesces identical concurrent introspection, plan and read calls.
+
+    execute is only coalesced for read expressions whose data is JSON serializable.
+    """
+    def __init__(self, expression: ExpressionService, flight: SingleFlight):
+        super().__init__(expression)
+        self.flight = flight
+
+    async def model(self, expression: str) -> List[MetadataModel]:
+        return await self.flight.do(('model', normalize_expression(expression)), lambda: self.inner.model(expression))
+
+    async def parameters(self, expression: str) -> List[MetadataParameter]:
+        return await self.flight.do(('parameters', normalize_expression(expression)),
+                                    lambda: self.inner.parameters(expression))
+
+    async def constraints(self, expression: str) -> MetadataConstraint:
+        return await self.flight.do(('constraints', normalize_expression(expression)),
+                                    lambda: self.inner.constraints(expression))
+
+    async def metadata(self, expression: str) -> Metadata:
+        return await self.flight.do(('metadata', normalize_expression(expression)),
+                                    lambda: self.inner.metadata(expression))
+
+    async def plan(self, expression: str, options: QueryOptions, method_options: MethodOptions = None) -> QueryPlan:
+        stage, view = (options.stage, options.view) if options is not None else (None, None)
+        return await self.flight.do(('plan', normalize_expression(expression), stage, view),
+                                    lambda: self.inner.plan(expression, options, method_options))
+
+    async def execute(self, expression: str, data: dict = None, options: QueryOptions = None, method_options: MethodOptions = None) -> dict:
+        data_text = data_key(data)
+        if data_text is None or is_write_expression(expression):
+            return await self.inner.execute(expression, data, options, method_options)
+        stage, view = (options.stage, options.view) if options is not None else (None, None)
+        return await self.flight.do(('execute', normalize_expression(expression), data_text, stage, view),
+                                    lambda: self.inner.execute(expression, data, options, method_options))
+
+class SingleFlightSchemaService(SchemaService):
+    """Schema service that coalesces identical concurrent calls."""
+    def __init__(self, schema: SchemaService, flight: SingleFlight):
+        self.inner = schema
+        self.flight = flight
+
+    async def _do(self, method: str, *args) -> Any:
+        return await self.flight.do(('schema.' + method, *args), lambda: getattr(self.inner, method)(*args))
+
+    async def version(self) -> Version:
+        return await self._do('version')
+
+    async def schema(self) -> Schema:
+        return await self._do('schema')
+
+    async def domain(self) -> DomainSchema:
+        return await self._do('domain')
+
+    async def sources(self) -> List[Source]:
+        return await self._do('sources')
+
+    async def source(self, source: str) -> Optional[Source]:
+        return await self._do('source', source)
+
+    async def entities(self) -> List[Entity]:
+        return await self._do('entities')
+
+    async def entity(self, entity: str) -> Optional[Entity]:
+        return await self._do('entity', entity)
+
+    async def enums(self) -> List[EnumDomain]:
+        return await self._do('enums')
+
+    async def enum(self, _enum: str) -> Optional[EnumDomain]:
+        return await self._do('enum', _enum)
+
+    async def mappings(self) -> List[Mapping]:
+        return await self._do('mappings')
+
+    async def mapping(self, mapping: str) -> Optional[Mapping]:
+        return await self._do('mapping', mapping)
+
+    async def entityMapping(self, mapping: str, entity: str) -> Optional[EntityMapping]:
+        return await self._do('entityMapping', mapping, entity)
+
+    async def stages(self) -> List[Stage]:
+        return await self._do('stages')
+
+    async def stage(self, stage: str) -> Optional[Stage]:
+        return await self._do('stage', stage)
+
+    async def views(self) -> List[str]:
+        return await self._do('views')
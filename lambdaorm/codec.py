@@ -0,0 +1,204 @@
+"""Compiled JSON decoders and encoders for the domain classes.
+
+The decoder and the encoder of a class are generated from its type hints the first time
+they are used: a single function that maps every attribute to its camelCase key, calling
+the functions of the nested classes directly.
+"""
+from typing import Any, Callable, Dict, List, Union, get_args, get_origin, get_type_hints
+from dataclasses import MISSING, dataclass, fields, is_dataclass
+from contextvars import ContextVar
+from enum import Enum
+import json
+import re
+import time
+
+_decoders: Dict[type, Callable[[dict], Any]] = {}
+_encoders: Dict[type, Callable[[Any], dict]] = {}
+# lambdaorm.metrics.Metrics of the client whose responses the current task decodes
+_metrics: ContextVar = ContextVar('lambdaorm_decode_metrics', default=None)
+
+def instrument(metrics: Any) -> None:
+    """Records the time spent in from_dict in metrics for the rest of the current task, None stops recording.
+
+    A client calls it before every call, so that the responses it decodes are recorded in
+    its own metrics and those of the clients without metrics are not recorded.
+    """
+    _metrics.set(metrics)
+
+def json_key(name: str) -> str:
+    """Returns the camelCase JSON key of an attribute, from_ is read from the key from."""
+    name = name.rstrip('_')
+    return re.sub(r'_([a-z0-9])', lambda match: match.group(1).upper(), name)
+
+def _unwrap_optional(hint: Any) -> Any:
+    if get_origin(hint) is Union:
+        args = [arg for arg in get_args(hint) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return hint
+
+def _is_model(hint: Any) -> bool:
+    return isinstance(hint, type) and is_dataclass(hint)
+
+def _is_enum(hint: Any) -> bool:
+    return isinstance(hint, type) and issubclass(hint, Enum)
+
+def _value_expression(hint: Any, namespace: dict) -> str:
+    """Returns the expression that converts the variable v to the type of the hint."""
+    hint = _unwrap_optional(hint)
+    if _is_model(hint) or _is_enum(hint):
+        name = f"_{hint.__name__}"
+        namespace[name] = hint
+        return f"{name}(v)" if _is_enum(hint) else f"_decode{name}(v)"
+    if get_origin(hint) in (list, List):
+        args = get_args(hint)
+        item = _unwrap_optional(args[0]) if args else Any
+        if _is_model(item) or _is_enum(item):
+            name = f"_{item.__name__}"
+            namespace[name] = item
+            call = f"{name}(x)" if _is_enum(item) else f"_decode{name}(x)"
+            return f"[{call} for x in v]"
+    return None
+
+def compile_decoder(cls: type) -> Callable[[dict], Any]:
+    """Generates the function that creates an instance of cls from a dictionary."""
+    decoder = _decoders.get(cls)
+    if decoder is not None:
+        return decoder
+    hints = get_type_hints(cls)
+    namespace = {'_cls': cls, '_new': object.__new__}
+    lines = ["def decode(data):", "    o = _new(_cls)"]
+    for field in fields(cls):
+        key = json_key(field.name)
+        default = None if field.default is MISSING else field.default
+        default_name = f"_default_{field.name}"
+        namespace[default_name] = default
+        convert = _value_expression(hints.get(field.name, Any), namespace)
+        if convert is None:
+            lines.append(f"    o.{field.name} = data.get({key!r}, {default_name})")
+        else:
+            lines.append(f"    v = data.get({key!r})")
+            lines.append(f"    o.{field.name} = {convert} if v is not None else {default_name}")
+    lines.append("    return o")
+    # the generated code only resolves its nested decoders when it runs, so recursive
+    # classes can reference their own decoder
+    exec("\n".join(lines), namespace)  # pylint: disable=exec-used
+    decoder = _decoders[cls] = namespace['decode']
+    for name, value in list(namespace.items()):
+        if name.startswith('_') and _is_model(value) and not name.startswith('_cls'):
+            namespace[f"_decode{name}"] = compile_decoder(value)
+    return decoder
+
+def _encode_expression(hint: Any, namespace: dict) -> str:
+    """Returns the expression that converts the variable v to a JSON value."""
+    hint = _unwrap_optional(hint)
+    if _is_enum(hint):
+        return "v.value"
+    if _is_model(hint):
+        name = f"_{hint.__name__}"
+        namespace[name] = hint
+        return f"_encode{name}(v)"
+    if get_origin(hint) in (list, List):
+        args = get_args(hint)
+        item = _unwrap_optional(args[0]) if args else Any
+        if _is_enum(item):
+            return "[x.value for x in v]"
+        if _is_model(item):
+            name = f"_{item.__name__}"
+            namespace[name] = item
+            return f"[_encode{name}(x) for x in v]"
+        if item is Any:
+            return "_encode_any(v)"
+        return None
+    if hint is Any:
+        return "_encode_any(v)"
+    return None
+
+def encode_any(value: Any) -> Any:
+    """Converts a value of unknown type to a JSON value, returning plain values as they are."""
+    encoder = _encoders.get(type(value))
+    if encoder is not None:
+        return encoder(value)
+    if isinstance(value, list):
+        return [encode_any(item) for item in value] if any(_needs_encoding(item) for item in value) else value
+    if isinstance(value, Enum):
+        return value.value
+    if is_dataclass(value) and not isinstance(value, type):
+        return compile_encoder(type(value))(value)
+    return value
+
+def _needs_encoding(value: Any) -> bool:
+    return isinstance(value, (list, Enum)) or (is_dataclass(value) and not isinstance(value, type))
+
+def compile_encoder(cls: type) -> Callable[[Any], dict]:
+    """Generates the function that converts an instance of cls to a dictionary.
+
+    The keys are camelCase, None attributes are skipped and values that are already plain
+    JSON values are shared with the instance instead of copied.
+    """
+    encoder = _encoders.get(cls)
+    if encoder is not None:
+        return encoder
+    hints = get_type_hints(cls)
+    namespace = {'_encode_any': encode_any}
+    lines = ["def encode(o):", "    d = {}"]
+    for field in fields(cls):
+        convert = _encode_expression(hints.get(field.name, Any), namespace)
+        lines.append(f"    v = o.{field.name}")
+        lines.append("    if v is not None:")
+        lines.append(f"        d[{json_key(field.name)!r}] = {convert or 'v'}")
+    lines.append("    return d")
+    exec("\n".join(lines), namespace)  # pylint: disable=exec-used
+    encoder = _encoders[cls] = namespace['encode']
+    for name, value in list(namespace.items()):
+        if name.startswith('_') and _is_model(value):
+            namespace[f"_encode{name}"] = compile_encoder(value)
+    return encoder
+
+def to_dict(self: Any, encode_json: bool = False) -> dict:  # pylint: disable=unused-argument
+    """Converts the instance to a dictionary with camelCase keys, skipping the None attributes."""
+    return (_encoders.get(type(self)) or compile_encoder(type(self)))(self)
+
+def from_dict(cls: type, data: Union[dict, List[dict]], infer_missing: bool = False) -> Any:  # pylint: disable=unused-argument
+    """Creates an instance of cls from a dictionary, or a list of instances from a list of dictionaries."""
+    decoder = _decoders.get(cls) or compile_decoder(cls)
+    metrics = _metrics.get()
+    if metrics is None:
+        return _decode(decoder, data)
+    start = time.perf_counter()
+    result = _decode(decoder, data)
+    metrics.observe('lambdaorm_model_decode_seconds', (cls.__name__,), time.perf_counter() - start)
+    return result
+
+def _decode(decoder: Callable[[dict], Any], data: Union[dict, List[dict]]) -> Any:
+    if isinstance(data, list):
+        return [decoder(item) for item in data]
+    if data is None:
+        return None
+    return decoder(data)
+
+def to_json(self: Any, **kwargs) -> str:
+    """Serializes the instance to JSON, the keyword arguments are passed to json.dumps."""
+    return json.dumps(to_dict(self), **kwargs)
+
+def from_json(cls: type, data: Union[str, bytes], **kwargs) -> Any:
+    """Creates an instance of cls from JSON, the keyword arguments are passed to json.loads."""
+    return from_dict(cls, json.loads(data, **kwargs))
+
+def json_model(cls: type = None, *, slots: bool = False) -> type:
+    """Class decorator for the domain classes: a dataclass with compiled camelCase from_dict and to_dict.
+
+    Nothing is generated for JSON until the class is first decoded or encoded.
+    dataclass_json_config keeps the camelCase keys for code that passes the classes to the
+    generic functions of dataclasses_json.
+    """
+    def wrap(cls: type) -> type:
+        if '__dataclass_fields__' not in cls.__dict__:
+            cls = dataclass(cls, slots=slots)
+        cls.from_dict = classmethod(from_dict)
+        cls.from_json = classmethod(from_json)
+        cls.to_dict = to_dict
+        cls.to_json = to_json
+        cls.dataclass_json_config = {'letter_case': json_key}
+        return cls
+    return wrap if cls is None else wrap(cls)
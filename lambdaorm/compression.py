@@ -0,0 +1,76 @@
+"""Compression of the bodies of the REST calls.
+
+The client asks for gzip or deflate responses with Accept-Encoding and decodes them as
+they arrive. With a Compression level the request bodies above a size threshold, such as
+bulk inserts, are gzipped and sent with Content-Encoding: gzip, which the service must
+accept. It does not import asyncio, so that the synchronous client can use it.
+"""
+from typing import Dict, Optional, Tuple
+import gzip
+import zlib
+from lambdaorm.domain import MethodOptions
+
+ACCEPT_ENCODING = 'gzip, deflate'
+
+class Decoder:
+    """Incremental decoder of a gzip or deflate body."""
+    def __init__(self, encoding: str):
+        if encoding in ('gzip', 'x-gzip'):
+            self._zlib = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == 'deflate':
+            self._zlib = zlib.decompressobj()
+        else:
+            raise ValueError(f"Unsupported content encoding {encoding}")
+        self._first = encoding == 'deflate'
+
+    def feed(self, data: bytes, final: bool = False) -> bytes:
+        """Returns the decoded bytes of the next part of the body."""
+        if self._first and data:
+            self._first = False
+            try:
+                return self.feed(data, final)
+            except zlib.error:
+                # deflate should be zlib wrapped but some servers send it raw
+                self._zlib = zlib.decompressobj(-zlib.MAX_WBITS)
+        content = self._zlib.decompress(data)
+        return content + self._zlib.flush() if final else content
+
+def decoder(encoding: Optional[str]) -> Optional[Decoder]:
+    """Returns the decoder of a Content-Encoding, None when the body is not encoded."""
+    encoding = (encoding or '').strip().lower()
+    if encoding in ('', 'identity'):
+        return None
+    return Decoder(encoding)
+
+def decode(body: bytes, encoding: Optional[str]) -> bytes:
+    """Returns a whole body decoded by its Content-Encoding."""
+    body_decoder = decoder(encoding)
+    return body if body_decoder is None or not body else body_decoder.feed(body, True)
+
+class Compression:
+    """Compression of the REST calls.
+
+    Request bodies of at least threshold bytes are gzipped at level, from 1, the fastest, to
+    9, the smallest; level 0 sends them as they are. The compressionLevel and
+    compressionThreshold fields of MethodOptions override them per call. With accept the
+    responses are requested compressed.
+    """
+    def __init__(self, level: int = 6, threshold: int = 16384, accept: bool = True):
+        self.level = level
+        self.threshold = threshold
+        self.accept = accept
+        self.headers: Dict[str, str] = {'Accept-Encoding': ACCEPT_ENCODING} if accept else {}
+
+    def compress(self, content: bytes, options: MethodOptions = None) -> Tuple[bytes, Optional[str]]:
+        """Returns the content to send and its Content-Encoding, None when it is not compressed."""
+        level, threshold = self.level, self.threshold
+        if options is not None:
+            if options.compressionLevel is not None:
+                level = options.compressionLevel
+            if options.compressionThreshold is not None:
+                threshold = options.compressionThreshold
+        if not level or len(content) < threshold:
+            return content, None
+        return gzip.compress(content, level, mtime=0), 'gzip'
+
+DEFAULT_COMPRESSION = Compression(level=0)
@@ -0,0 +1,21 @@
+"""Shared fixtures for the lambdaorm tests"""
+import os
+import pytest
+from lambdaorm.stub import StubServer, install_fake_cli
+
+@pytest.fixture
+def stub_server() -> StubServer:
+    """Stub LambdaORM service, started inside the test event loop"""
+    return StubServer()
+
+@pytest.fixture
+def fake_cli(tmp_path, monkeypatch) -> str:
+    """Stand-in lambdaorm command on the PATH, returns the workspace to use with it
+
+    Commands print their arguments and data, read from the -d option or the file it names.
+    The expression slow takes 0.3 seconds. In worker mode every request is answered with
+    itself.
+    """
+    install_fake_cli(str(tmp_path))
+    monkeypatch.setenv('PATH', f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    return str(tmp_path)
@@ -0,0 +1,124 @@
+"""Hedged reads, to cut the tail latency of the expression service.
+
+When a read has not been answered within the latency that percentile of its recent calls
+stayed under, the same read is sent a second time and the first answer wins, the other
+call is cancelled. With a load balancer the second call goes to the replica with less
+calls in flight, usually another one. A budget keeps the extra calls to a small fraction.
+"""
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+from collections import deque
+import asyncio
+import time
+from lambdaorm import metrics
+from lambdaorm.application import ExpressionService, ExpressionServiceDecorator
+from lambdaorm.cache import is_write_expression
+from lambdaorm.domain import Metadata, MethodOptions, QueryOptions, QueryPlan
+
+class HedgePolicy:
+    """When to send a second call for a slow read.
+
+    A read is hedged after the percentile of the latencies of the last window calls of the
+    same method, at least min_delay seconds, once min_samples of them were observed. Every
+    call earns budget hedges, up to max_tokens, and every hedge spends one, so budget 0.05
+    sends at most about 5% more calls. The latency percentile is recomputed every
+    refresh observations.
+    """
+    def __init__(self, percentile: float = 0.95, min_delay: float = 0.005, budget: float = 0.05,
+                 window: int = 1000, min_samples: int = 20, max_tokens: float = 10, refresh: int = 20):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.budget = budget
+        self.window = window
+        self.min_samples = min_samples
+        self.max_tokens = max_tokens
+        self.refresh = refresh
+        self.tokens = 0.0
+        self.calls = 0
+        self.hedged = 0
+        self.won = 0
+        self.denied = 0
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._delays: Dict[str, float] = {}
+        self._observed: Dict[str, int] = {}
+
+    def delay(self, method: str) -> Optional[float]:
+        """Returns the seconds after which a call of the method is hedged, None while there are too few samples."""
+        self.calls += 1
+        self.tokens = min(self.max_tokens, self.tokens + self.budget)
+        return self._delays.get(method)
+
+    def observe(self, method: str, latency: float) -> None:
+        """Records the latency of a call of the method."""
+        latencies = self._latencies.get(method)
+        if latencies is None:
+            latencies = self._latencies[method] = deque(maxlen=self.window)
+        latencies.append(latency)
+        observed = self._observed[method] = self._observed.get(method, 0) + 1
+        if len(latencies) >= self.min_samples and (observed >= self.refresh or method not in self._delays):
+            self._observed[method] = 0
+            self._delays[method] = max(self.min_delay, metrics.percentile(sorted(latencies), self.percentile))
+
+    def spend(self) -> bool:
+        """Takes a hedge from the budget, False if it is exhausted."""
+        if self.tokens < 1:
+            self.denied += 1
+            return False
+        self.tokens -= 1
+        self.hedged += 1
+        return True
+
+    async def call(self, method: str, send: Callable[[], Awaitable[Any]]) -> Any:
+        """Returns the result of send, calling it a second time if the first call is slow."""
+        delay = self.delay(method)
+        start = time.perf_counter()
+        if delay is None:
+            result = await send()
+            self.observe(method, time.perf_counter() - start)
+            return result
+        primary = asyncio.ensure_future(send())
+        tasks: List[asyncio.Future] = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and self.spend():
+                tasks.append(asyncio.ensure_future(send()))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in tasks:
+                    if task in done and not task.cancelled() and task.exception() is None:
+                        if task is not primary:
+                            self.won += 1
+                        self.observe(method, time.perf_counter() - start)
+                        return task.result()
+            # both calls failed, the error of the first one is raised
+            return primary.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    # retrieve the exception of the loser so that it is not reported as never retrieved
+                    task.exception()
+
+    @property
+    def stats(self) -> dict:
+        """Returns the hedged calls, those answered first by the hedge and those denied by the budget."""
+        return {'calls': self.calls, 'hedged': self.hedged, 'won': self.won, 'denied': self.denied,
+                'delays': dict(self._delays)}
+
+class HedgedExpressionService(ExpressionServiceDecorator):
+    """Expression service hedging the plan and metadata calls and the execution of read expressions."""
+    def __init__(self, expression: ExpressionService, policy: HedgePolicy):
+        super().__init__(expression)
+        self.policy = policy
+
+    async def metadata(self, expression: str) -> Metadata:
+        return await self.policy.call('metadata', lambda: self.inner.metadata(expression))
+
+    async def plan(self, expression: str, options: QueryOptions, method_options: MethodOptions = None) -> QueryPlan:
+        return await self.policy.call('plan', lambda: self.inner.plan(expression, options, method_options))
+
+    async def execute(self, expression: str, data: dict = None, options: QueryOptions = None, method_options: MethodOptions = None) -> dict:
+        if is_write_expression(expression):
+            return await self.inner.execute(expression, data, options, method_options)
+        return await self.policy.call('execute', lambda: self.inner.execute(expression, data, options, method_options))
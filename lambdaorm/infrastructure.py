@@ -1,21 +1,193 @@
 # pylint: disable=invalid-name
 """Infrastructure layer for the LambdaORM REST API."""
-from typing import List, Any, Optional
+from typing import List, Any, Optional, Callable, Awaitable, AsyncIterator, Iterator, Tuple, Union
 from urllib.parse import urlparse
+from collections import deque
+from contextlib import contextmanager
+import asyncio
 import subprocess
 import json
 import os
-import requests
+import time
 from lambdaorm.domain import (CliCommandArgs, DomainSchema, Entity, EntityMapping, Metadata,
 MetadataConstraint, MetadataModel, MetadataParameter, MethodOptions, QueryOptions,
-QueryPlan, Schema, SchemaConfig, Source, Stage, Version, Ping, Health, EnumDomain, Mapping)
-from lambdaorm.application import ( ExpressionService, GeneralService, IOrm,
+QueryPlan, Schema, SchemaConfig, Source, Stage, Version, Ping, Health, EnumDomain, Mapping, ChunkResult,
+TransportRequest)
+from lambdaorm.application import ( ExpressionService, GeneralService, Interceptor, IOrm,
 SchemaService, StageService)
+from lambdaorm.transport import AsyncHttpClient, HttpError, JsonArrayParser, CHUNK_SIZE
+from lambdaorm.process import CliWorker, ProcessPool, kill
+from lambdaorm.metrics import Metrics, endpoint_label
+from lambdaorm.resilience import NO_RETRY, CircuitBreaker, RetryPolicy
+from lambdaorm.balancer import LoadBalancer
+from lambdaorm.compression import DEFAULT_COMPRESSION, Compression
+from lambdaorm.hedging import HedgePolicy, HedgedExpressionService
+from lambdaorm import codec
+from lambdaorm.cache import (IntrospectionCache, IntrospectionCacheExpressionService, PlanCache,
+PlanCacheExpressionService, ResultCache, ResultCacheExpressionService, SingleFlight,
+SingleFlightExpressionService, SingleFlightSchemaService, SnapshotSchemaService)
+# the synchronous client lives in its own module so that it can be imported without asyncio
+from lambdaorm.sync import (SyncRestHelper, ExpressionSyncRestService, GeneralSyncRestService,  # pylint: disable=unused-import
+SchemaSyncRestService, StageSyncRestService, SyncOrm)
+
+class ChunkHelper:
+    """Helper class to execute an expression over a large list of rows in chunks."""
+    DEFAULT_CHUNK = 1000
+    DEFAULT_CONCURRENCY = 4
+
+    def solve_chunk(self, options: QueryOptions, method_options: MethodOptions) -> int:
+        """Solves the chunk size, MethodOptions.chunk takes precedence over QueryOptions.chunkSize."""
+        if method_options is not None and method_options.chunk:
+            return method_options.chunk
+        if options is not None and options.chunkSize:
+            return options.chunkSize
+        return self.DEFAULT_CHUNK
+
+    def solve_concurrency(self, method_options: MethodOptions) -> int:
+        """Solves the number of chunks that can be in flight at the same time."""
+        if method_options is not None and method_options.concurrency:
+            return method_options.concurrency
+        return self.DEFAULT_CONCURRENCY
+
+    async def execute_many(self, execute: Callable[[List[dict]], Awaitable[Any]], rows: List[dict],
+                           options: QueryOptions = None, method_options: MethodOptions = None) -> List[ChunkResult]:
+        """Executes every chunk of rows with bounded concurrency."""
+        chunk = self.solve_chunk(options, method_options)
+        semaphore = asyncio.Semaphore(self.solve_concurrency(method_options))
+
+        async def run(index: int, offset: int) -> ChunkResult:
+            data = rows[offset:offset + chunk]
+            async with semaphore:
+                try:
+                    return ChunkResult(index, offset, len(data), result=await execute(data))
+                except Exception as error:  # pylint: disable=broad-except
+                    return ChunkResult(index, offset, len(data), error=error)
+
+        return await asyncio.gather(*[run(index, offset) for index, offset in enumerate(range(0, len(rows), chunk))])
+
+class PageHelper:
+    """Helper class to read the result of an expression page by page."""
+    DEFAULT_PAGE_SIZE = 100
+    DEFAULT_PREFETCH = 2
+
+    def rewrite(self, expression: str, page: int, size: int) -> str:
+        """Replaces the top level page clause of the expression, or appends one."""
+        depth = 0
+        quote = None
+        start = None
+        index = 0
+        while index < len(expression):
+            char = expression[index]
+            if quote is not None:
+                if char == '\\':
+                    index += 1
+                elif char == quote:
+                    quote = None
+            elif char in ('"', "'", '`'):
+                quote = char
+            elif char == '(':
+                depth += 1
+            elif char == ')':
+                depth -= 1
+                if depth == 0 and start is not None:
+                    return f"{expression[:start]}.page({page},{size}){expression[index + 1:]}"
+            elif depth == 0 and expression.startswith('.page(', index):
+                start = index
+                index += len('.page')
+                continue
+            index += 1
+        return f"{expression.rstrip()}.page({page},{size})"
+
+    async def pages(self, execute: Callable[[str], Awaitable[List[Any]]], expression: str,
+                    page_size: int = None, prefetch: int = None) -> AsyncIterator[List[Any]]:
+        """Yields the pages of the result, fetching the next prefetch pages while the current one is consumed.
+
+        Stops after the first page with less than page_size rows.
+        """
+        size = page_size or self.DEFAULT_PAGE_SIZE
+        ahead = self.DEFAULT_PREFETCH if prefetch is None else prefetch
+        pending = deque()
+        next_page = 1
+        try:
+            while True:
+                while len(pending) <= ahead:
+                    pending.append(asyncio.ensure_future(execute(self.rewrite(expression, next_page, size))))
+                    next_page += 1
+                rows = await pending.popleft()
+                if rows:
+                    yield rows
+                if rows is None or len(rows) < size:
+                    return
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+class StreamHelper:
+    """Helper class for streamed results."""
+
+    @staticmethod
+    async def batches(items: AsyncIterator[Any], size: int) -> AsyncIterator[List[Any]]:
+        """Groups the items in lists of at most size items."""
+        batch = []
+        async for item in items:
+            batch.append(item)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    @staticmethod
+    def solve(items: AsyncIterator[Any], batch_size: int = None) -> AsyncIterator[Any]:
+        """Returns the items, grouped in batches when a batch size is given."""
+        return StreamHelper.batches(items, batch_size) if batch_size else items
+
+class InterceptorChain:
+    """Ordered interceptors around the transport calls of a client.
+
+    The first interceptor is the outermost one: it sees the request first and the response
+    last. Without interceptors the request is sent directly.
+    """
+    def __init__(self, interceptors: List[Interceptor] = None):
+        self.interceptors = list(interceptors or [])
+
+    async def call(self, request: TransportRequest, send: Callable[[TransportRequest], Awaitable[Any]]) -> Any:
+        """Passes the request through the interceptors, send performs the call."""
+        if not self.interceptors:
+            return await send(request)
+        return await self._next(0, send)(request)
+
+    def _next(self, index: int, send: Callable[[TransportRequest], Awaitable[Any]]) -> Callable[[TransportRequest], Awaitable[Any]]:
+        if index == len(self.interceptors):
+            return send
+        interceptor = self.interceptors[index]
+        call_next = self._next(index + 1, send)
+        return lambda request: interceptor.intercept(request, call_next)
 
 class RestHelper:
-    """Helper class for Client REST API."""
-    def __init__(self, url: str):
+    """Helper class for Client REST API.
+
+    Every call passes through the interceptors before it is sent. A response that is not
+    2xx raises HttpError. The failed idempotent calls are retried by the retry policy and,
+    with a circuit breaker, the calls to an endpoint that keeps failing fail fast. With a
+    load balancer every attempt goes to one of its replicas instead of url. With metrics
+    every attempt records its latency, payload sizes, errors and the time spent parsing the
+    JSON response. The responses are requested gzip or deflate encoded and the request
+    bodies are compressed by compression, by default only when MethodOptions asks for it.
+    """
+    def __init__(self, url: str, client: AsyncHttpClient = None, metrics: Metrics = None,
+                 interceptors: List[Interceptor] = None, retry: RetryPolicy = None, breaker: CircuitBreaker = None,
+                 balancer: LoadBalancer = None, compression: Compression = None):
         self.url = url
+        self.balancer = balancer
+        self.client = client if client is not None else AsyncHttpClient()
+        self.metrics = metrics
+        self.chain = InterceptorChain(interceptors)
+        self.retry = retry if retry is not None else NO_RETRY
+        self.breaker = breaker
+        self.compression = compression if compression is not None else DEFAULT_COMPRESSION
 
     def solve_method_options(self, options: MethodOptions) -> MethodOptions:
         """Solves the method options."""
@@ -24,59 +196,188 @@ class RestHelper:
         if options.timeout is None:
             options.timeout = 10
         return options
-   
-    def post(self, path: str, body: dict, options: MethodOptions=None)-> dict:
+
+    def encode(self, request: TransportRequest) -> Tuple[Optional[bytes], dict]:
+        """Returns the content and the headers of a request."""
+        if request.method == 'GET':
+            return None, {**self.compression.headers, **request.headers}
+        content, encoding = self.compression.compress(json.dumps(request.body).encode('utf-8'), request.options)
+        headers = {'Content-Type': 'application/json', **self.compression.headers, **request.headers}
+        if encoding is not None:
+            headers['Content-Encoding'] = encoding
+        return content, headers
+
+    async def deliver(self, request: TransportRequest) -> Any:
+        """Sends a request by the retry policy, through the circuit breaker."""
+        policy = self.retry.solve(request.options)
+        # the deadline cuts the timeout even when the call is not retried
+        if self.breaker is None and policy.retries == 0 and policy.deadline is None:
+            return await self.send(request)
+        return await self.retry.call(request, self.send, self.breaker, self.retried if self.metrics is not None else None)
+
+    def retried(self, request: TransportRequest) -> None:
+        """Counts a retry of a request."""
+        self.metrics.add('lambdaorm_request_retries_total', ('rest', request.method, endpoint_label(request.endpoint)))
+
+    async def send(self, request: TransportRequest) -> Any:
+        """Sends a request to the service, or to a replica chosen by the load balancer."""
+        if self.balancer is None:
+            return await self.exchange(self.url, request)
+        node = self.balancer.acquire()
+        try:
+            result = await self.exchange(node.url, request)
+        except BaseException as error:
+            self.balancer.release(node, error)
+            raise
+        self.balancer.release(node)
+        return result
+
+    async def exchange(self, base: str, request: TransportRequest) -> Any:
+        """Sends a request to the service at base and returns its decoded JSON response."""
+        content, headers = self.encode(request)
+        url = base + request.endpoint
+        timeout = request.options.timeout
+        idempotent = self.retry.solve(request.options).idempotent(request)
+        if self.metrics is None:
+            response = await self.client.request(request.method, url, content, headers, timeout, idempotent)
+            if not response.ok:
+                raise HttpError(response)
+            return response.json()
+        call = self.metrics.start('rest', request.method, endpoint_label(request.endpoint), len(content) if content else 0)
+        try:
+            response = await self.client.request(request.method, url, content, headers, timeout, idempotent)
+            if not response.ok:
+                raise HttpError(response)
+        except BaseException as error:
+            call.failed(error)
+            raise
+        call.done(response.size)
+        start = time.perf_counter()
+        result = response.json()
+        self.metrics.observe('lambdaorm_json_decode_seconds', call.labels, time.perf_counter() - start)
+        return result
+
+    async def check(self, base: str, options: MethodOptions = None) -> dict:
+        """GET /ping request to the service at base, through the interceptors but without retries."""
+        options = self.solve_method_options(options)
+        codec.instrument(self.metrics)
+        return await self.chain.call(TransportRequest('rest', 'GET', '/ping', None, options),
+                                     lambda request: self.exchange(base, request))
+
+    async def post(self, path: str, body: dict, options: MethodOptions=None)-> dict:
         """POST request to the REST API."""
         options = self.solve_method_options(options)
-        return requests.post(self.url + path, json=body, timeout= options.timeout).json()
-    
-    def get(self, path: str,options: MethodOptions=None)-> dict:
+        codec.instrument(self.metrics)
+        return await self.chain.call(TransportRequest('rest', 'POST', path, body, options), self.deliver)
+
+    async def get(self, path: str,options: MethodOptions=None)-> dict:
         """GET request to the REST API."""
         options = self.solve_method_options(options)
-        return requests.get(self.url + path, timeout= options.timeout).json()
+        codec.instrument(self.metrics)
+        return await self.chain.call(TransportRequest('rest', 'GET', path, None, options), self.deliver)
+
+    async def post_stream(self, path: str, body: dict, options: MethodOptions=None)-> AsyncIterator[Any]:
+        """POST request to the REST API yielding the items of the JSON array response as they arrive."""
+        options = self.solve_method_options(options)
+        items = await self.chain.call(TransportRequest('rest', 'POST', path, body, options), self.open_stream)
+        async for item in items:
+            yield item
+
+    async def open_stream(self, request: TransportRequest) -> AsyncIterator[Any]:
+        """Returns the items of the response of a request, the request is sent when they are read."""
+        return self.stream(request)
+
+    async def stream(self, request: TransportRequest) -> AsyncIterator[Any]:
+        """Sends a request yielding the items of the JSON array response as they arrive."""
+        content, headers = self.encode(request)
+        node = self.balancer.acquire() if self.balancer is not None else None
+        url = (node.url if node is not None else self.url) + request.endpoint
+        parser = JsonArrayParser()
+        call = self.metrics.start('rest', request.method, endpoint_label(request.endpoint), len(content)) if self.metrics is not None else None
+        received = 0
+        def count(size: int) -> None:
+            nonlocal received
+            received += size
+        failure = None
+        try:
+            # the bytes received are counted before they are decoded
+            async for chunk in self.client.stream(request.method, url, content, headers, request.options.timeout,
+                                                  count if call is not None else None,
+                                                  self.retry.solve(request.options).idempotent(request)):
+                for item in parser.feed(chunk):
+                    yield item
+            for item in parser.feed(b'', True):
+                yield item
+        except GeneratorExit:
+            # the consumer stopped reading, the call did not fail
+            if call is not None:
+                call.done(received)
+            raise
+        except BaseException as error:
+            failure = error
+            if call is not None:
+                call.failed(error)
+            raise
+        finally:
+            if node is not None:
+                self.balancer.release(node, failure)
+        if call is not None:
+            call.done(received)
 
 class ExpressionRestService(ExpressionService):
     """Client for the ORM REST API."""
-    def __init__(self, url: str):
-        self.rest = RestHelper(url)
+    def __init__(self, url: str, client: AsyncHttpClient = None, metrics: Metrics = None, helper: RestHelper = None):
+        self.rest = helper if helper is not None else RestHelper(url, client, metrics)
+        self.chunks = ChunkHelper()
+        self.pages = PageHelper()
         
     async def model(self, expression: str) -> List[MetadataModel]:
         body = {'expression': expression}
-        response = self.rest.post('/model',body)
+        response = await self.rest.post('/model',body)
         return MetadataModel.from_dict(response)
     
     async def parameters(self, expression: str) -> List[MetadataParameter]:
         body = {'expression': expression}
-        response = self.rest.post('/parameters',body)
+        response = await self.rest.post('/parameters',body)
         return MetadataParameter.from_dict(response)
 
     async def constraints(self, expression: str) -> MetadataConstraint:
         body = {'expression': expression}
-        response = self.rest.post('/constraints',body)
+        response = await self.rest.post('/constraints',body)
         return MetadataConstraint.from_dict(response)
 
     async def metadata(self, expression: str) -> Metadata:
         body = {'expression': expression}
-        response = self.rest.post('/metadata',body)
+        response = await self.rest.post('/metadata',body)
         return Metadata.from_dict(response)
 
     async def plan(self,expression:str, options:QueryOptions,method_options: MethodOptions=None) -> QueryPlan:
-        body = {'expression': expression, 'options': options.to_dict()}
-        response =  self.rest.post('/plan',body,method_options)
+        body = {'expression': expression, 'options': options.to_dict() if options is not None else None}
+        response =  await self.rest.post('/plan',body,method_options)
         return QueryPlan.from_dict(response)
     
     async def execute(self,expression:str,data:dict=None, options:QueryOptions=None,method_options: MethodOptions=None) -> dict:
-        body = {'expression': expression, 'data': data, 'options': options.to_dict()}
-        return self.rest.post('/execute',body,method_options)
+        body = {'expression': expression, 'data': data, 'options': options.to_dict() if options is not None else None}
+        return await self.rest.post('/execute',body,method_options)
     
     async def execute_queued(self,expression:str,topic:str,data:dict=None, options:QueryOptions=None,method_options: MethodOptions=None) -> dict:
-        body = {'expression': expression,'topic':topic, 'data': data, 'options': options.to_dict()}
-        return self.rest.post('/execute-queued',body,method_options)
+        body = {'expression': expression,'topic':topic, 'data': data, 'options': options.to_dict() if options is not None else None}
+        return await self.rest.post('/execute-queued',body,method_options)
+
+    async def execute_many(self,expression:str,rows:List[dict], options:QueryOptions=None,method_options: MethodOptions=None) -> List[ChunkResult]:
+        return await self.chunks.execute_many(lambda chunk: self.execute(expression, chunk, options, method_options), rows, options, method_options)
+
+    def execute_stream(self,expression:str,data:dict=None, options:QueryOptions=None,method_options: MethodOptions=None, batch_size:int=None) -> AsyncIterator[Any]:
+        body = {'expression': expression, 'data': data, 'options': options.to_dict() if options is not None else None}
+        return StreamHelper.solve(self.rest.post_stream('/execute',body,method_options), batch_size)
+
+    def execute_pages(self,expression:str,data:dict=None, options:QueryOptions=None,method_options: MethodOptions=None, page_size:int=None, prefetch:int=None) -> AsyncIterator[List[Any]]:
+        return self.pages.pages(lambda page: self.execute(page, data, options, method_options), expression, page_size, prefetch)
 
 class GeneralRestService(GeneralService):
     """Interface for General Service."""
-    def __init__(self, url: str):
-        self.rest = RestHelper(url)
+    def __init__(self, url: str, client: AsyncHttpClient = None, metrics: Metrics = None, helper: RestHelper = None):
+        self.rest = helper if helper is not None else RestHelper(url, client, metrics)
      
     async def version(self) -> Version:
         response =  await self.rest.get('/version')
@@ -95,8 +396,8 @@ class GeneralRestService(GeneralService):
 
 class SchemaRestService(SchemaService):
     """Service for interacting with schema-related operations."""
-    def __init__(self, url: str):
-        self.rest = RestHelper(url)
+    def __init__(self, url: str, client: AsyncHttpClient = None, metrics: Metrics = None, helper: RestHelper = None):
+        self.rest = helper if helper is not None else RestHelper(url, client, metrics)
 
     async def version(self) -> Version:
         response =  await self.rest.get('/schema/version')
@@ -160,8 +461,8 @@ class SchemaRestService(SchemaService):
 
 class StageRestService(StageService):
     """Service for interacting with schema-related operations."""
-    def __init__(self, url: str):
-        self.rest = RestHelper(url)
+    def __init__(self, url: str, client: AsyncHttpClient = None, metrics: Metrics = None, helper: RestHelper = None):
+        self.rest = helper if helper is not None else RestHelper(url, client, metrics)
 
     async def exists(self, stage: str) -> bool:
         return await self.rest.get('/stages/'+stage+'/exists')
@@ -172,16 +473,35 @@ class StageRestService(StageService):
         return SchemaConfig.from_dict(response)
 
     async def import_(self, stage: str, data: SchemaConfig) -> None:
-        response =  await self.rest.post('/stages/'+stage+'/import',data)
-        return QueryPlan.from_dict(response)
+        await self.rest.post('/stages/'+stage+'/import', data.to_dict())
 
 class RestClientOrm(IOrm):
-    """Client for the ORM REST API."""
-    def __init__(self, url: str):
-        self.expression = ExpressionRestService(url)
-        self.general = GeneralRestService(url)
-        self.schema = SchemaRestService(url)
-        self.stage = StageRestService(url)
+    """Client for the ORM REST API.
+
+    url can be a list of the urls of replicas of the service, the calls are then spread
+    across them by the load balancer, a LoadBalancer with its defaults if not given, which
+    checks the health of the replicas with ping, sent through the interceptors. The urls are
+    added to the replicas the balancer already has. max_connections limits the connections
+    open to each of them when no client is given.
+    """
+    def __init__(self, url: Union[str, List[str]], client: AsyncHttpClient = None, metrics: Metrics = None,
+                 interceptors: List[Interceptor] = None, retry: RetryPolicy = None, breaker: CircuitBreaker = None,
+                 balancer: LoadBalancer = None, compression: Compression = None, max_connections: int = 10):
+        self.client = client if client is not None else AsyncHttpClient(max_connections)
+        self.balancer = None
+        if balancer is not None and not isinstance(url, (list, tuple)):
+            raise ValueError("A load balancer needs the list of the urls of the replicas")
+        if isinstance(url, (list, tuple)):
+            self.balancer = balancer if balancer is not None else LoadBalancer()
+            for replica in url:
+                self.balancer.add(replica)
+            self.balancer.check = self._ping_replica
+            url = None
+        self.rest = RestHelper(url, self.client, metrics, interceptors, retry, breaker, self.balancer, compression)
+        self.expression = ExpressionRestService(url, helper=self.rest)
+        self.general = GeneralRestService(url, helper=self.rest)
+        self.schema = SchemaRestService(url, helper=self.rest)
+        self.stage = StageRestService(url, helper=self.rest)
 
     @property
     def get_general(self) -> GeneralService:
@@ -216,13 +536,46 @@ class RestClientOrm(IOrm):
     async def execute_queued(self, expression: str, topic: str, data: dict = None, options: QueryOptions = None, method_options: MethodOptions = None) -> dict:
         return await self.expression.execute_queued(expression, topic, data, options, method_options)
 
+    async def execute_many(self, expression: str, rows: List[dict], options: QueryOptions = None, method_options: MethodOptions = None) -> List[ChunkResult]:
+        return await self.expression.execute_many(expression, rows, options, method_options)
+
+    def execute_stream(self, expression: str, data: dict = None, options: QueryOptions = None, method_options: MethodOptions = None, batch_size: int = None) -> AsyncIterator[Any]:
+        return self.expression.execute_stream(expression, data, options, method_options, batch_size)
+
+    def execute_pages(self, expression: str, data: dict = None, options: QueryOptions = None, method_options: MethodOptions = None, page_size: int = None, prefetch: int = None) -> AsyncIterator[List[Any]]:
+        return self.expression.execute_pages(expression, data, options, method_options, page_size, prefetch)
 
+    async def _ping_replica(self, url: str) -> Ping:
+        """Pings a replica of the service."""
+        return Ping.from_dict(await self.rest.check(url))
 
+    async def close(self) -> None:
+        if self.balancer is not None:
+            await self.balancer.close()
+        await self.client.close()
 
 class CliCLientHelper:
-    """Helper class for Client CLI"""
-    def __init__(self, workspace: str):
+    """Helper class for Client CLI
+
+    With a worker the commands are sent to a long-lived CLI process instead of starting
+    the CLI for every call. Otherwise every call runs the CLI through the process pool,
+    without a shell. Every command passes through the interceptors before it runs and with
+    metrics it is measured like a REST call.
+    """
+    INLINE_DATA_LIMIT = 32 * 1024
+
+    def __init__(self, workspace: str, worker: CliWorker = None, pool: ProcessPool = None, metrics: Metrics = None,
+                 interceptors: List[Interceptor] = None):
         self.workspace = workspace
+        self.worker = worker
+        self.pool = pool if pool is not None else ProcessPool()
+        self.metrics = metrics
+        self.chain = InterceptorChain(interceptors)
+
+    @staticmethod
+    def create_worker(workspace: str) -> CliWorker:
+        """Creates the worker process of a workspace."""
+        return CliWorker(['lambdaorm', 'worker', '-w', workspace], workspace)
 
     def solve_method_options(self, options: MethodOptions) -> MethodOptions:
         """Solves the method options."""
@@ -232,28 +585,139 @@ class CliCLientHelper:
             options.timeout = 10
         return options
     
-    def command(self, command: str,args:CliCommandArgs=None,options: MethodOptions = None) -> dict:
-        """Executes a command."""        
-        cmd = f"lambdaorm {command} -w {self.workspace}"
+    def build_args(self, command: str, args: CliCommandArgs = None, options: MethodOptions = None,
+                   data: str = None) -> List[str]:
+        """Builds the argument list of a command, data is the value of the -d option."""
+        argv = ['lambdaorm', command, '-w', self.workspace]
         if args is not None:
-            cmd += f" -q {args.expression}"
-            if args.data is not None:
-                cmd += f" -d {args.data}"
-            if args.options is not None:
-                if args.options.stage is not None:
-                    cmd += f" -s {args.options.stage}"
+            if args.expression is not None:
+                argv += ['-q', args.expression]
+            if data is not None:
+                argv += ['-d', data]
+            if args.options is not None and args.options.stage is not None:
+                argv += ['-s', args.options.stage]
         options = self.solve_method_options(options)
         if options.environmentFile is not None:
-            cmd += f" -e {options.environmentFile}"            
-        result = subprocess.check_output(cmd, shell=True, cwd=self.workspace).decode('utf-8')
-        if result is None:
-            return None
-        return json.loads(result)
+            argv += ['-e', options.environmentFile]
+        return argv
+
+    @contextmanager
+    def data_argument(self, args: CliCommandArgs = None) -> Iterator[Tuple[Optional[str], int]]:
+        """Yields the value of the -d option, the data as JSON or the path of a file holding it, and its JSON length.
+
+        Data longer than INLINE_DATA_LIMIT characters is written to a temporary file, removed
+        when the command finishes, to stay below the size limit of a command line argument.
+        """
+        if args is None or args.data is None:
+            yield None, 0
+            return
+        data = json.dumps(args.data)
+        if len(data) <= self.INLINE_DATA_LIMIT:
+            yield data, len(data)
+            return
+        import tempfile  # pylint: disable=import-outside-toplevel
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', suffix='.json', delete=False) as file:
+            file.write(data)
+        try:
+            yield file.name, len(data)
+        finally:
+            os.remove(file.name)
+
+    def build_request(self, args: CliCommandArgs = None, options: MethodOptions = None) -> dict:
+        """Builds the payload of a worker request."""
+        payload = args.to_dict() if args is not None else {}
+        options = self.solve_method_options(options)
+        if options.environmentFile is not None:
+            payload['environmentFile'] = options.environmentFile
+        return payload
+
+    async def command(self, command: str,args:CliCommandArgs=None,options: MethodOptions = None) -> dict:
+        """Executes a command."""
+        options = self.solve_method_options(options)
+        request = TransportRequest('cli', 'exec' if self.worker is None else 'worker', command, args, options)
+        codec.instrument(self.metrics)
+        return await self.chain.call(request, self.send)
+
+    async def send(self, request: TransportRequest) -> Any:
+        """Runs the command of a request and returns its decoded JSON output."""
+        command, args, options = request.endpoint, request.body, request.options
+        timeout = options.timeout
+        if self.worker is not None:
+            payload = self.build_request(args, options)
+            if self.metrics is None:
+                return await self.worker.request(command, payload, timeout)
+            call = self.metrics.start('cli', 'worker', command, len(json.dumps(payload)))
+            try:
+                result = await self.worker.request(command, payload, timeout)
+            except BaseException as error:
+                call.failed(error)
+                raise
+            call.done(len(json.dumps(result)))
+            return result
+        with self.data_argument(args) as (data, size):
+            argv = self.build_args(command, args, options, data)
+            call = self.metrics.start('cli', 'exec', command, size) if self.metrics is not None else None
+            try:
+                output = await self.pool.run(argv, self.workspace, timeout)
+            except BaseException as error:
+                if call is not None:
+                    call.failed(error)
+                raise
+        if call is None:
+            return json.loads(output) if output.strip() else None
+        call.done(len(output))
+        start = time.perf_counter()
+        result = json.loads(output) if output.strip() else None
+        self.metrics.observe('lambdaorm_json_decode_seconds', call.labels, time.perf_counter() - start)
+        return result
+
+    async def stream(self, command: str,args:CliCommandArgs=None,options: MethodOptions = None) -> AsyncIterator[Any]:
+        """Executes a command yielding the items of the JSON array it writes as they are printed."""
+        options = self.solve_method_options(options)
+        items = await self.chain.call(TransportRequest('cli', 'exec', command, args, options), self.open_stream)
+        async for item in items:
+            yield item
+
+    async def open_stream(self, request: TransportRequest) -> AsyncIterator[Any]:
+        """Returns the items written by the command of a request, it runs when they are read."""
+        return self.run_stream(request)
+
+    async def run_stream(self, request: TransportRequest) -> AsyncIterator[Any]:
+        """Runs the command of a request yielding the items of the JSON array it writes.
+
+        As with run, the command is killed and asyncio.TimeoutError raised when it has not
+        finished timeout seconds after it got a slot.
+        """
+        command, args, options = request.endpoint, request.body, request.options
+        with self.data_argument(args) as (data, _):
+            argv = self.build_args(command, args, options, data)
+            async with self.pool.slot():
+                loop = asyncio.get_running_loop()
+                deadline = loop.time() + options.timeout if options.timeout is not None else None
+                def remaining() -> Optional[float]:
+                    return max(0, deadline - loop.time()) if deadline is not None else None
+                process = await self.pool.start(argv, self.workspace)
+                parser = JsonArrayParser()
+                try:
+                    while chunk := await asyncio.wait_for(process.stdout.read(CHUNK_SIZE), remaining()):
+                        for item in parser.feed(chunk):
+                            yield item
+                    if await asyncio.wait_for(process.wait(), remaining()) != 0:
+                        raise subprocess.CalledProcessError(process.returncode, argv)
+                    for item in parser.feed(b'', True):
+                        yield item
+                finally:
+                    if process.returncode is None:
+                        kill(process)
+                        await process.wait()
 
 class ExpressionCliService(ExpressionService):
     """Client for the ORM CLI API."""
-    def __init__(self, workspace: str):
-        self.cli = CliCLientHelper(workspace)
+    def __init__(self, workspace: str, worker: CliWorker = None, pool: ProcessPool = None, metrics: Metrics = None,
+                 helper: CliCLientHelper = None):
+        self.cli = helper if helper is not None else CliCLientHelper(workspace, worker, pool, metrics)
+        self.chunks = ChunkHelper()
+        self.pages = PageHelper()
         
     async def model(self, expression: str) -> List[MetadataModel]:
         response = await self.cli.command('model',CliCommandArgs(expression))
@@ -265,27 +729,37 @@ class ExpressionCliService(ExpressionService):
 
     async def constraints(self, expression: str) -> MetadataConstraint:
         response = await self.cli.command('constraints',CliCommandArgs(expression))
-        return MetadataParameter.from_dict(response)
+        return MetadataConstraint.from_dict(response)
 
     async def metadata(self, expression: str) -> Metadata:
         response = await self.cli.command('metadata',CliCommandArgs(expression))
-        return MetadataParameter.from_dict(response)
+        return Metadata.from_dict(response)
 
     async def plan(self,expression:str, options:QueryOptions,method_options: MethodOptions=None) -> QueryPlan:
         response = await self.cli.command('plan',CliCommandArgs(expression,options=options),method_options)
         return QueryPlan.from_dict(response)
     
     async def execute(self,expression:str,data:dict=None, options:QueryOptions=None,method_options: MethodOptions=None) -> dict:
-        response = await self.cli.command('execute',CliCommandArgs(expression, data=data, options=options),method_options)
-        return QueryPlan.from_dict(response)
+        return await self.cli.command('execute',CliCommandArgs(expression, data=data, options=options),method_options)
     
     async def execute_queued(self,expression:str,topic:str,data:dict=None, options:QueryOptions=None,method_options: MethodOptions=None) -> dict:
         raise NotImplementedError
+
+    async def execute_many(self,expression:str,rows:List[dict], options:QueryOptions=None,method_options: MethodOptions=None) -> List[ChunkResult]:
+        return await self.chunks.execute_many(lambda chunk: self.execute(expression, chunk, options, method_options), rows, options, method_options)
+
+    def execute_stream(self,expression:str,data:dict=None, options:QueryOptions=None,method_options: MethodOptions=None, batch_size:int=None) -> AsyncIterator[Any]:
+        rows = self.cli.stream('execute',CliCommandArgs(expression, data=data, options=options),method_options)
+        return StreamHelper.solve(rows, batch_size)
+
+    def execute_pages(self,expression:str,data:dict=None, options:QueryOptions=None,method_options: MethodOptions=None, page_size:int=None, prefetch:int=None) -> AsyncIterator[List[Any]]:
+        return self.pages.pages(lambda page: self.execute(page, data, options, method_options), expression, page_size, prefetch)
     
 class GeneralCliService(GeneralService):
     """Interface for General Service."""
-    def __init__(self, workspace: str):
-        self.cli = CliCLientHelper(workspace)
+    def __init__(self, workspace: str, worker: CliWorker = None, pool: ProcessPool = None, metrics: Metrics = None,
+                 helper: CliCLientHelper = None):
+        self.cli = helper if helper is not None else CliCLientHelper(workspace, worker, pool, metrics)
      
     async def version(self) -> Version:
         raise NotImplementedError
@@ -301,8 +775,9 @@ class GeneralCliService(GeneralService):
     
 class SchemaCliService(SchemaService):
     """Service for interacting with schema-related operations."""
-    def __init__(self, workspace: str):
-        self.cli = CliCLientHelper(workspace)
+    def __init__(self, workspace: str, worker: CliWorker = None, pool: ProcessPool = None, metrics: Metrics = None,
+                 helper: CliCLientHelper = None):
+        self.cli = helper if helper is not None else CliCLientHelper(workspace, worker, pool, metrics)
 
     async def version(self) -> Version:
         raise NotImplementedError
@@ -351,26 +826,36 @@ class SchemaCliService(SchemaService):
     
 class StageCliService(StageService):
     """Service for interacting with schema-related operations."""
-    def __init__(self, workspace: str):
-        self.cli = CliCLientHelper(workspace)
+    def __init__(self, workspace: str, worker: CliWorker = None, pool: ProcessPool = None, metrics: Metrics = None,
+                 helper: CliCLientHelper = None):
+        self.cli = helper if helper is not None else CliCLientHelper(workspace, worker, pool, metrics)
 
     async def exists(self, stage: str) -> bool:
         raise NotImplementedError
 
     async def export(self, stage: str) -> SchemaConfig:
-        response = await self.cli.command('export',CliCommandArgs(options={"stage":stage} ))
+        response = await self.cli.command('export',CliCommandArgs(options=QueryOptions(stage=stage)))
         return SchemaConfig.from_dict(response)
 
     async def import_(self, stage: str, data: SchemaConfig) -> None:
-        await self.cli.command('import_',CliCommandArgs(data=data, options={"stage":stage} ))
+        await self.cli.command('import',CliCommandArgs(data=data.to_dict(), options=QueryOptions(stage=stage)))
 
 class CliClientOrm(IOrm):
-    """Client for the ORM CLI API."""
-    def __init__(self, workspace: str):
-        self.expression = ExpressionCliService(workspace)
-        self.general = GeneralCliService(workspace)
-        self.schema = SchemaCliService(workspace)
-        self.stage = StageCliService(workspace)
+    """Client for the ORM CLI API.
+
+    With worker the services share one long-lived CLI process for the workspace, otherwise
+    they share a pool running at most max_processes CLI processes at a time, by default one
+    per CPU.
+    """
+    def __init__(self, workspace: str, worker: bool = False, max_processes: int = None, metrics: Metrics = None,
+                 interceptors: List[Interceptor] = None):
+        self.worker = CliCLientHelper.create_worker(workspace) if worker else None
+        self.pool = ProcessPool(max_processes)
+        self.cli = CliCLientHelper(workspace, self.worker, self.pool, metrics, interceptors)
+        self.expression = ExpressionCliService(workspace, helper=self.cli)
+        self.general = GeneralCliService(workspace, helper=self.cli)
+        self.schema = SchemaCliService(workspace, helper=self.cli)
+        self.stage = StageCliService(workspace, helper=self.cli)
 
     @property
     def get_general(self) -> GeneralService:
@@ -405,16 +890,70 @@ class CliClientOrm(IOrm):
     async def execute_queued(self, expression: str, topic: str, data: dict = None, options: QueryOptions = None, method_options: MethodOptions = None) -> dict:
         return await self.expression.execute_queued(expression, topic, data, options, method_options)
 
+    async def execute_many(self, expression: str, rows: List[dict], options: QueryOptions = None, method_options: MethodOptions = None) -> List[ChunkResult]:
+        return await self.expression.execute_many(expression, rows, options, method_options)
+
+    def execute_stream(self, expression: str, data: dict = None, options: QueryOptions = None, method_options: MethodOptions = None, batch_size: int = None) -> AsyncIterator[Any]:
+        return self.expression.execute_stream(expression, data, options, method_options, batch_size)
+
+    def execute_pages(self, expression: str, data: dict = None, options: QueryOptions = None, method_options: MethodOptions = None, page_size: int = None, prefetch: int = None) -> AsyncIterator[List[Any]]:
+        return self.expression.execute_pages(expression, data, options, method_options, page_size, prefetch)
+
+    async def close(self) -> None:
+        if self.worker is not None:
+            await self.worker.close()
+
 class OrmBuilder():
     """Factory for the ORM."""
 
-    def build(self, workspace:str= os.getcwd()) -> IOrm:
-        """Builds the ORM."""
-        if self._is_url(workspace):
-            return RestClientOrm(workspace)
+    def build(self, workspace: Union[str, List[str]] = os.getcwd(), plan_cache: PlanCache = None,
+              introspection_cache: IntrospectionCache = None, schema_snapshot_interval: float = None,
+              cli_worker: bool = False, cli_processes: int = None, single_flight: SingleFlight = None,
+              result_cache: ResultCache = None, metrics: Metrics = None,
+              interceptors: List[Interceptor] = None, retry_policy: RetryPolicy = None,
+              circuit_breaker: CircuitBreaker = None, load_balancer: LoadBalancer = None,
+              hedge_policy: HedgePolicy = None, compression: Compression = None,
+              max_connections: int = 10) -> IOrm:
+        """Builds the ORM.
+
+        workspace is the url of the service, a list of urls of its replicas, spread by
+        load_balancer, or the path of a local workspace run by the CLI.
+        schema_snapshot_interval enables serving the schema service from a local snapshot,
+        checked for a new schema version at most once per that many seconds. cli_worker keeps
+        one CLI process running for a local workspace instead of starting one per call, and
+        cli_processes limits the CLI processes running at a time when it is not used.
+        single_flight coalesces identical concurrent calls before they reach the service.
+        result_cache serves repeated reads and is invalidated by the writes of this client.
+        metrics records the transport calls and, for the whole process, the time spent in from_dict.
+        interceptors wrap every transport call, the first one outermost. retry_policy retries
+        the failed idempotent REST calls and circuit_breaker fails fast the calls to a REST
+        endpoint that keeps failing. hedge_policy sends a second call for the plan, metadata
+        and read executions that are slower than usual, the first answer wins. compression
+        gzips the REST request bodies above its threshold, the responses are always requested
+        compressed. max_connections limits the keep-alive connections open to the service, or
+        to each of its replicas, and the REST calls in flight to it.
+        """
+        if isinstance(workspace, (list, tuple)) or self._is_url(workspace):
+            orm = RestClientOrm(workspace, metrics=metrics, interceptors=interceptors, retry=retry_policy,
+                                breaker=circuit_breaker, balancer=load_balancer, compression=compression,
+                                max_connections=max_connections)
         else:
-            return CliClientOrm(workspace)
-        
+            orm = CliClientOrm(workspace, cli_worker, cli_processes, metrics, interceptors)
+        if hedge_policy is not None:
+            orm.expression = HedgedExpressionService(orm.expression, hedge_policy)
+        if single_flight is not None:
+            orm.expression = SingleFlightExpressionService(orm.expression, single_flight)
+            orm.schema = SingleFlightSchemaService(orm.schema, single_flight)
+        if plan_cache is not None:
+            orm.expression = PlanCacheExpressionService(orm.expression, orm.schema, plan_cache)
+        if introspection_cache is not None:
+            orm.expression = IntrospectionCacheExpressionService(orm.expression, orm.schema, introspection_cache)
+        if schema_snapshot_interval is not None:
+            orm.schema = SnapshotSchemaService(orm.schema, schema_snapshot_interval)
+        if result_cache is not None:
+            orm.expression = ResultCacheExpressionService(orm.expression, result_cache)
+        return orm
+
     def _is_url(self,value:str) -> bool:
         """Checks if the value is a valid URL."""
         try:
@@ -425,8 +964,17 @@ class OrmBuilder():
 
 class Orm(IOrm):
     """ORM API."""
-    def __init__(self, workspace:str=None):
-        self._orm = OrmBuilder().build(workspace)
+    def __init__(self, workspace: Union[str, List[str]] = None, plan_cache: PlanCache = None,
+                 introspection_cache: IntrospectionCache = None, schema_snapshot_interval: float = None,
+                 cli_worker: bool = False, cli_processes: int = None, single_flight: SingleFlight = None,
+                 result_cache: ResultCache = None, metrics: Metrics = None, interceptors: List[Interceptor] = None,
+                 retry_policy: RetryPolicy = None, circuit_breaker: CircuitBreaker = None,
+                 load_balancer: LoadBalancer = None, hedge_policy: HedgePolicy = None,
+                 compression: Compression = None, max_connections: int = 10):
+        self._orm = OrmBuilder().build(workspace, plan_cache, introspection_cache, schema_snapshot_interval,
+                                       cli_worker, cli_processes, single_flight, result_cache, metrics,
+                                       interceptors, retry_policy, circuit_breaker, load_balancer, hedge_policy,
+                                       compression, max_connections)
 
     @property
     def get_general(self) -> GeneralService:
@@ -459,4 +1007,16 @@ class Orm(IOrm):
         return await self._orm.expression.execute(expression, data, options, method_options)
 
     async def execute_queued(self, expression: str, topic: str, data: dict = None, options: QueryOptions = None, method_options: MethodOptions = None) -> dict:
-        return await self._orm.expression.execute_queued(expression, topic, data, options, method_options)
\ No newline at end of file
+        return await self._orm.expression.execute_queued(expression, topic, data, options, method_options)
+
+    async def execute_many(self, expression: str, rows: List[dict], options: QueryOptions = None, method_options: MethodOptions = None) -> List[ChunkResult]:
+        return await self._orm.expression.execute_many(expression, rows, options, method_options)
+
+    def execute_stream(self, expression: str, data: dict = None, options: QueryOptions = None, method_options: MethodOptions = None, batch_size: int = None) -> AsyncIterator[Any]:
+        return self._orm.expression.execute_stream(expression, data, options, method_options, batch_size)
+
+    def execute_pages(self, expression: str, data: dict = None, options: QueryOptions = None, method_options: MethodOptions = None, page_size: int = None, prefetch: int = None) -> AsyncIterator[List[Any]]:
+        return self._orm.expression.execute_pages(expression, data, options, method_options, page_size, prefetch)
+
+    async def close(self) -> None:
+        await self._orm.close()
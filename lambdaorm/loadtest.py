@@ -0,0 +1,189 @@
+"""Load generator for a LambdaORM service or workspace.
+
+Runs a weighted mix of calls with a fixed number of concurrent callers for a given time,
+through a client built by OrmBuilder, and reports the latency percentiles, the throughput
+and the error rate of every call.
+
+    python -m lambdaorm.loadtest http://localhost:9291 --mix mix.json --concurrency 20 --duration 30
+    python -m lambdaorm.loadtest --stub --duration 10
+
+The mix is a JSON list of calls, each one picked with a probability proportional to its
+weight:
+
+    [{"call": "execute", "expression": "Orders.filter(p => p.id == id)", "data": {"id": 1},
+      "options": {"stage": "default"}, "weight": 8},
+     {"call": "plan", "expression": "Orders", "options": {"stage": "default"}, "weight": 1},
+     {"call": "schema.entity", "args": ["Orders"], "weight": 1}]
+
+call is execute, plan, model, parameters, constraints or metadata, which take expression,
+data and options, or a method of the schema, general or stage service, which takes args.
+With --stub the calls go to a stub service started in another process, so the tool runs
+without a LambdaORM service.
+"""
+from typing import Any, Awaitable, Callable, Dict, List
+from collections import Counter
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import subprocess
+import sys
+import time
+from lambdaorm.application import IOrm
+from lambdaorm.domain import QueryOptions
+from lambdaorm.infrastructure import OrmBuilder
+from lambdaorm.metrics import percentile
+
+EXPRESSION = "Orders.filter(p=>p.customerId==customerId).include(p=>p.details).order(p=>p.orderDate).page(1,1)"
+DEFAULT_MIX = [
+    {'call': 'execute', 'expression': EXPRESSION, 'data': {'customerId': 'CENTC'}, 'options': {'stage': 'default'}, 'weight': 7},
+    {'call': 'plan', 'expression': EXPRESSION, 'options': {'stage': 'default'}, 'weight': 2},
+    {'call': 'schema.entities', 'weight': 1},
+]
+EXPRESSION_CALLS = ('execute', 'plan', 'model', 'parameters', 'constraints', 'metadata')
+SERVICES = {'schema': 'get_schema', 'general': 'get_general', 'stage': 'get_stage'}
+
+def bind(orm: IOrm, entry: Dict[str, Any]) -> Callable[[], Awaitable[Any]]:
+    """Returns the function making the call described by a mix entry."""
+    call = entry['call']
+    if call in EXPRESSION_CALLS:
+        expression = entry['expression']
+        options = QueryOptions.from_dict(entry['options']) if entry.get('options') is not None else None
+        if call == 'execute':
+            return lambda: orm.execute(expression, entry.get('data'), options)
+        if call == 'plan':
+            return lambda: orm.plan(expression, options)
+        method = getattr(orm, call)
+        return lambda: method(expression)
+    service, _, name = call.partition('.')
+    if service not in SERVICES or not name:
+        raise ValueError(f"Unknown call {call}")
+    method = getattr(getattr(orm, SERVICES[service]), name)
+    args = entry.get('args', [])
+    return lambda: method(*args)
+
+class Recorder:
+    """Latencies of the successful calls and errors of the failed ones, per call."""
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, Counter] = {}
+
+    def success(self, call: str, latency: float) -> None:
+        """Records a call that returned."""
+        self.latencies.setdefault(call, []).append(latency)
+
+    def failure(self, call: str, error: BaseException) -> None:
+        """Records a call that raised."""
+        self.errors.setdefault(call, Counter())[type(error).__name__] += 1
+
+    def summary(self, latencies: List[float], errors: Counter, elapsed: float) -> dict:
+        """Returns the statistics of the calls, latencies in milliseconds."""
+        latencies = sorted(latencies)
+        failed = sum(errors.values())
+        count = len(latencies) + failed
+        result = {'count': count, 'errors': failed, 'errorRate': failed / count if count else 0,
+                  'callsPerSecond': count / elapsed}
+        if latencies:
+            result.update({'meanMs': statistics.fmean(latencies) * 1000, 'p50Ms': percentile(latencies, 0.5) * 1000,
+                           'p95Ms': percentile(latencies, 0.95) * 1000, 'p99Ms': percentile(latencies, 0.99) * 1000,
+                           'maxMs': latencies[-1] * 1000})
+        if errors:
+            result['errorTypes'] = dict(errors)
+        return result
+
+    def report(self, elapsed: float) -> dict:
+        """Returns the statistics of every call and of all of them together."""
+        calls = sorted(set(self.latencies) | set(self.errors))
+        total_latencies = [latency for latencies in self.latencies.values() for latency in latencies]
+        total_errors = sum(self.errors.values(), Counter())
+        return {'durationSeconds': elapsed,
+                'calls': {call: self.summary(self.latencies.get(call, []), self.errors.get(call, Counter()), elapsed)
+                          for call in calls},
+                'total': self.summary(total_latencies, total_errors, elapsed)}
+
+async def run(orm: IOrm, mix: List[Dict[str, Any]], concurrency: int, duration: float, seed: int = None) -> dict:
+    """Runs the mix with concurrency callers for duration seconds and returns the report."""
+    calls = [(entry['call'], bind(orm, entry)) for entry in mix]
+    weights = [entry.get('weight', 1) for entry in mix]
+    randomizer = random.Random(seed)
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration
+
+    async def caller() -> None:
+        while time.perf_counter() < deadline:
+            name, call = randomizer.choices(calls, weights)[0]
+            start = time.perf_counter()
+            try:
+                await call()
+            except Exception as error:  # pylint: disable=broad-except
+                recorder.failure(name, error)
+            else:
+                recorder.success(name, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[caller() for _ in range(concurrency)])
+    return recorder.report(time.perf_counter() - start)
+
+def start_stub(entities: int, rows: int, delay: float) -> subprocess.Popen:
+    """Starts a stub service in another process, its url is the first line of its output."""
+    return subprocess.Popen([sys.executable, '-m', 'lambdaorm.stub', '--entities', str(entities), '--rows', str(rows),
+                             '--delay', str(delay)], stdout=subprocess.PIPE, text=True)
+
+def print_report(report: dict) -> None:
+    """Prints the report as a table."""
+    print(f"{'call':24} {'calls':>8} {'calls/s':>9} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, values in [*report['calls'].items(), ('total', report['total'])]:
+        latency = ' '.join(f"{values[key]:9.2f}" if key in values else f"{'-':>9}" for key in ('p50Ms', 'p95Ms', 'p99Ms', 'maxMs'))
+        print(f"{name:24} {values['count']:8} {values['callsPerSecond']:9.1f} {values['errorRate']:7.1%} {latency}")
+        for error, count in values.get('errorTypes', {}).items():
+            print(f"{'':24} {count:8} {error}")
+
+async def load(args: argparse.Namespace, target: str, mix: List[Dict[str, Any]]) -> dict:
+    """Builds the client for the target and runs the load test."""
+    orm = OrmBuilder().build(target, cli_worker=args.cli_worker, cli_processes=args.cli_processes)
+    try:
+        return await run(orm, mix, args.concurrency, args.duration, args.seed)
+    finally:
+        await orm.close()
+
+def main() -> None:
+    """Runs the load test from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('target', nargs='?', help='url of the service or path of the workspace')
+    parser.add_argument('--stub', action='store_true', help='start a stub service and use it as target')
+    parser.add_argument('--mix', help='JSON file with the calls to make')
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=10, help='seconds')
+    parser.add_argument('--seed', type=int, help='seed of the choice of calls')
+    parser.add_argument('--cli-worker', action='store_true', help='keep one CLI process running for a workspace')
+    parser.add_argument('--cli-processes', type=int, help='CLI processes running at a time for a workspace')
+    parser.add_argument('--stub-entities', type=int, default=50)
+    parser.add_argument('--stub-rows', type=int, default=100)
+    parser.add_argument('--stub-delay', type=float, default=0, help='seconds the stub waits before every response')
+    parser.add_argument('--output', help='file to write the report to as JSON')
+    args = parser.parse_args()
+    if (args.target is None) == (not args.stub):
+        parser.error('give either a target or --stub')
+    mix = DEFAULT_MIX
+    if args.mix:
+        with open(args.mix, encoding='utf-8') as file:
+            mix = json.load(file)
+    stub = start_stub(args.stub_entities, args.stub_rows, args.stub_delay) if args.stub else None
+    try:
+        target = stub.stdout.readline().strip() if stub is not None else args.target
+        if not target:
+            parser.error('the stub service did not start')
+        report = asyncio.run(load(args, target, mix))
+    finally:
+        if stub is not None:
+            stub.terminate()
+            stub.wait()
+    report.update({'target': 'stub' if stub is not None else target, 'concurrency': args.concurrency})
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""Client side instrumentation of the LambdaORM client.
+
+A Metrics registry records the latency, payload sizes, errors and in-flight calls of the
+transports, and the time spent decoding JSON and building the domain models. It can be
+exported as a dictionary or in the Prometheus text format. The client only measures when
+a registry is given, so disabled metrics cost a single attribute check per call.
+"""
+from typing import Dict, List, Tuple
+from bisect import bisect_left
+import time
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+_CALL = ('backend', 'method', 'endpoint')
+# name -> (type, help, label names, buckets)
+DEFINITIONS = {
+    'lambdaorm_request_seconds': ('histogram', 'Latency of the transport calls.', _CALL, LATENCY_BUCKETS),
+    'lambdaorm_request_sent_bytes': ('histogram', 'Size of the request payloads as sent.', _CALL, SIZE_BUCKETS),
+    'lambdaorm_response_received_bytes': ('histogram', 'Size of the response payloads as received.', _CALL, SIZE_BUCKETS),
+    'lambdaorm_request_errors_total': ('counter', 'Transport calls that raised.', _CALL + ('error',), None),
+    'lambdaorm_request_retries_total': ('counter', 'Transport calls retried after a transient error.', _CALL, None),
+    'lambdaorm_requests_in_flight': ('gauge', 'Transport calls waiting for a response.', _CALL, None),
+    'lambdaorm_json_decode_seconds': ('histogram', 'Time spent parsing the JSON responses.', _CALL, LATENCY_BUCKETS),
+    'lambdaorm_model_decode_seconds': ('histogram', 'Time spent in from_dict.', ('model',), LATENCY_BUCKETS),
+}
+
+# path segments that are part of an endpoint rather than a name
+_ACTIONS = {'version', 'exists', 'export', 'import'}
+
+def endpoint_label(path: str) -> str:
+    """Returns the endpoint of a REST path, replacing the names in it so that the label is bounded."""
+    parts = [part for part in path.split('/') if part]
+    if not parts:
+        return '/'
+    return '/' + '/'.join([parts[0]] + [part if part in _ACTIONS else '{name}' for part in parts[1:]])
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Returns the value below which the given fraction of the sorted values fall."""
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+class Call:
+    """Measurement of one transport call, created by Metrics.start."""
+    __slots__ = ('metrics', 'labels', 'start')
+
+    def __init__(self, metrics: 'Metrics', labels: Tuple[str, ...]):
+        self.metrics = metrics
+        self.labels = labels
+        self.start = time.perf_counter()
+
+    def done(self, received: int) -> None:
+        """Records a completed call and the size of its response."""
+        self.metrics.add('lambdaorm_requests_in_flight', self.labels, -1)
+        self.metrics.observe('lambdaorm_request_seconds', self.labels, time.perf_counter() - self.start)
+        self.metrics.observe('lambdaorm_response_received_bytes', self.labels, received)
+
+    def failed(self, error: BaseException) -> None:
+        """Records a call that raised."""
+        self.metrics.add('lambdaorm_requests_in_flight', self.labels, -1)
+        self.metrics.observe('lambdaorm_request_seconds', self.labels, time.perf_counter() - self.start)
+        self.metrics.add('lambdaorm_request_errors_total', self.labels + (type(error).__name__,))
+
+class Metrics:
+    """Registry of the client metrics.
+
+    Histograms keep per bucket counts, their sum and count; counters and gauges a value.
+    Every series is identified by the tuple of its label values.
+    """
+    def __init__(self):
+        self._histograms: Dict[str, Dict[tuple, list]] = {}
+        self._values: Dict[str, Dict[tuple, float]] = {}
+
+    def observe(self, name: str, labels: tuple, value: float) -> None:
+        """Adds an observation to a histogram."""
+        series = self._histograms.setdefault(name, {})
+        entry = series.get(labels)
+        buckets = DEFINITIONS[name][3]
+        if entry is None:
+            # [counts per bucket (the last one is +Inf), sum, count]
+            entry = series[labels] = [[0] * (len(buckets) + 1), 0.0, 0]
+        entry[0][bisect_left(buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def add(self, name: str, labels: tuple, amount: float = 1) -> None:
+        """Adds an amount to a counter or a gauge."""
+        series = self._values.setdefault(name, {})
+        series[labels] = series.get(labels, 0) + amount
+
+    def start(self, backend: str, method: str, endpoint: str, sent: int) -> Call:
+        """Records the start of a transport call sending sent bytes."""
+        labels = (backend, method, endpoint)
+        self.add('lambdaorm_requests_in_flight', labels)
+        self.observe('lambdaorm_request_sent_bytes', labels, sent)
+        return Call(self, labels)
+
+    def snapshot(self) -> dict:
+        """Returns the current value of every series, histogram buckets are cumulative."""
+        result = {}
+        for name, series in self._histograms.items():
+            label_names = DEFINITIONS[name][2]
+            buckets = DEFINITIONS[name][3]
+            samples = []
+            for labels, (counts, total, count) in series.items():
+                cumulative = []
+                running = 0
+                for bound, bucket_count in zip(buckets + (float('inf'),), counts):
+                    running += bucket_count
+                    cumulative.append([bound, running])
+                samples.append({'labels': dict(zip(label_names, labels)), 'count': count, 'sum': total,
+                                'buckets': cumulative})
+            result[name] = samples
+        for name, series in self._values.items():
+            label_names = DEFINITIONS[name][2]
+            result[name] = [{'labels': dict(zip(label_names, labels)), 'value': value}
+                            for labels, value in series.items()]
+        return result
+
+    def prometheus(self) -> str:
+        """Returns the metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        snapshot = self.snapshot()
+        for name, (kind, help_text, _, _) in DEFINITIONS.items():
+            samples = snapshot.get(name)
+            if not samples:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample in samples:
+                if kind == 'histogram':
+                    for bound, count in sample['buckets']:
+                        le = '+Inf' if bound == float('inf') else repr(float(bound))
+                        lines.append(f"{name}_bucket{_labels({**sample['labels'], 'le': le})} {count}")
+                    lines.append(f"{name}_sum{_labels(sample['labels'])} {sample['sum']!r}")
+                    lines.append(f"{name}_count{_labels(sample['labels'])} {sample['count']}")
+                else:
+                    lines.append(f"{name}{_labels(sample['labels'])} {sample['value']!r}")
+        return '\n'.join(lines) + '\n' if lines else ''
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    escaped = (f'{name}="{_escape(str(value))}"' for name, value in labels.items())
+    return '{' + ','.join(escaped) + '}'
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
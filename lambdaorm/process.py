@@ -0,0 +1,187 @@
+"""Asyncio subprocess transport used by the LambdaORM CLI client."""
+from typing import Any, Dict, List, Optional
+import asyncio
+import itertools
+import json
+import os
+import signal
+import subprocess
+
+# longest JSON line accepted from a worker
+MAX_LINE = 256 * 1024 * 1024
+
+class CliError(Exception):
+    """Raised when the CLI reports an error or exits while answering a request."""
+
+def kill(process: asyncio.subprocess.Process) -> None:
+    """Kills a process started in its own session together with the processes it started."""
+    try:
+        if hasattr(os, 'killpg'):
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+
+class ProcessPool:
+    """Runs CLI commands as asyncio subprocesses, at most max_processes at a time.
+
+    Calls above the limit wait for a free slot in arrival order. Every process is started in
+    its own session so that a timeout kills the CLI and its children. Like AsyncHttpClient,
+    the limit is bound to the running event loop.
+    """
+    def __init__(self, max_processes: Optional[int] = None):
+        self.max_processes = max_processes or os.cpu_count() or 1
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def slot(self) -> asyncio.Semaphore:
+        """Returns the semaphore limiting the running processes."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._semaphore = asyncio.Semaphore(self.max_processes)
+            self._loop = loop
+        return self._semaphore
+
+    async def start(self, argv: List[str], cwd: Optional[str] = None) -> asyncio.subprocess.Process:
+        """Starts a command writing to a pipe, the caller must hold a slot."""
+        # the command must not read or block on the stdin of the application
+        return await asyncio.create_subprocess_exec(*argv, stdin=asyncio.subprocess.DEVNULL,
+                                                    stdout=asyncio.subprocess.PIPE, cwd=cwd, start_new_session=True)
+
+    async def run(self, argv: List[str], cwd: Optional[str] = None, timeout: Optional[float] = None) -> bytes:
+        """Runs a command and returns its output, killing it after timeout seconds.
+
+        The timeout starts once the command has a slot. A nonzero exit code raises
+        CalledProcessError and an expired timeout raises asyncio.TimeoutError.
+        """
+        async with self.slot():
+            process = await self.start(argv, cwd)
+            try:
+                output, _ = await asyncio.wait_for(process.communicate(), timeout)
+            finally:
+                if process.returncode is None:
+                    kill(process)
+                    await process.wait()
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, argv, output)
+        return output
+
+class CliWorker:
+    """Long-lived CLI process answering JSON-line requests over stdin and stdout.
+
+    Every request is written as one line {"id": n, "command": ..., ...} and answered by one
+    line {"id": n, "result": ...} or {"id": n, "error": "message"}, so several requests can
+    be in flight at once. When the process exits the requests waiting for it fail with
+    CliError and the next request starts a new process. Like AsyncHttpClient, the process is
+    bound to the running event loop and replaced when the loop changes.
+    """
+    def __init__(self, argv: List[str], cwd: Optional[str] = None):
+        self.argv = argv
+        self.cwd = cwd
+        self.starts = 0
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._starting: Optional[asyncio.Future] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+
+    async def _ensure(self) -> asyncio.subprocess.Process:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._discard()
+            self._loop = loop
+        if self._process is not None:
+            return self._process
+        # concurrent first requests share the start of a single process
+        if self._starting is None or self._starting.done():
+            self._starting = asyncio.ensure_future(self._start())
+        return await asyncio.shield(self._starting)
+
+    async def _start(self) -> asyncio.subprocess.Process:
+        process = await asyncio.create_subprocess_exec(
+            *self.argv, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, cwd=self.cwd, limit=MAX_LINE)
+        self.starts += 1
+        self._process = process
+        # keep a reference, the event loop only holds tasks weakly
+        self._reader = asyncio.ensure_future(self._read(process))
+        return process
+
+    async def _read(self, process: asyncio.subprocess.Process) -> None:
+        """Resolves the pending requests with the lines written by the process until it exits."""
+        try:
+            while line := await process.stdout.readline():
+                self._resolve(line)
+        except ValueError:
+            # a line longer than MAX_LINE, the stream can not be resynchronized
+            process.kill()
+        code = await process.wait()
+        if self._process is process:
+            self._process = None
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(CliError(f"CLI worker exited with code {code}"))
+
+    def _resolve(self, line: bytes) -> None:
+        try:
+            response = json.loads(line)
+        except ValueError:
+            # not a response, e.g. a log line of the CLI
+            return
+        future = self._pending.get(response.get('id')) if isinstance(response, dict) else None
+        if future is None or future.done():
+            return
+        if response.get('error') is not None:
+            future.set_exception(CliError(response['error']))
+        else:
+            future.set_result(response.get('result'))
+
+    async def request(self, command: str, payload: Dict[str, Any], timeout: Optional[float] = None) -> Any:
+        """Sends a request to the worker and waits at most timeout seconds for its result."""
+        process = await self._ensure()
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            line = json.dumps({'id': request_id, 'command': command, **payload}) + '\n'
+            process.stdin.write(line.encode('utf-8'))
+            try:
+                await process.stdin.drain()
+            except ConnectionError as error:
+                raise CliError("CLI worker exited") from error
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    def _discard(self) -> None:
+        if self._process is not None and self._process.returncode is None:
+            try:
+                self._process.kill()
+            except (ProcessLookupError, RuntimeError):
+                pass
+        if self._reader is not None and not self._reader.done():
+            try:
+                self._reader.cancel()
+            except RuntimeError:
+                # the event loop of the task is already closed
+                pass
+        self._process = None
+        self._reader = None
+        self._starting = None
+        self._pending = {}
+
+    async def close(self) -> None:
+        """Stops the worker process and waits for the reading of its output to end."""
+        process, reader = self._process, self._reader
+        self._process = None
+        self._reader = None
+        if process is not None and process.returncode is None:
+            process.stdin.close()
+            try:
+                await asyncio.wait_for(process.wait(), 5)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+        if reader is not None and reader.get_loop() is asyncio.get_running_loop():
+            await asyncio.gather(reader, return_exceptions=True)
@@ -0,0 +1,179 @@
+"""Retries and circuit breaking for the REST transport.
+
+A RetryPolicy retries the idempotent calls that failed with a transient error, waiting an
+exponential backoff with full jitter between the attempts. A CircuitBreaker stops sending
+calls to an endpoint that keeps failing, so that a service that is down is not hammered
+by every caller.
+"""
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+import asyncio
+import copy
+import dataclasses
+import random
+import time
+from lambdaorm.cache import is_write_expression
+from lambdaorm.domain import MethodOptions, TransportRequest
+from lambdaorm.metrics import endpoint_label
+from lambdaorm.transport import HttpError
+
+# POST endpoints that do not change the data
+READ_ENDPOINTS = {'/model', '/parameters', '/constraints', '/metadata', '/plan'}
+
+class CircuitOpenError(Exception):
+    """Raised without sending the call when the circuit of its endpoint is open."""
+    def __init__(self, endpoint: str):
+        super().__init__(f"Circuit open for {endpoint}")
+        self.endpoint = endpoint
+
+def transient(error: BaseException) -> bool:
+    """True for the errors that a later attempt may not get: connection errors, timeouts, 5xx and 429."""
+    if isinstance(error, HttpError):
+        return error.status >= 500 or error.status == 429
+    return isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError, asyncio.IncompleteReadError))
+
+class CircuitBreaker:
+    """Per endpoint circuit breaker.
+
+    After failure_threshold consecutive transient failures of an endpoint its circuit opens
+    and its calls fail with CircuitOpenError, without being sent, for reset_timeout seconds.
+    Then a single call is let through: its success closes the circuit and its failure opens
+    it again. The endpoints are REST paths with the names replaced, as in the metrics.
+    """
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.opened = 0
+        self.rejected = 0
+        self._failures: Dict[str, int] = {}
+        self._open: Dict[str, float] = {}
+        self._probing: Set[str] = set()
+
+    def before(self, endpoint: str) -> None:
+        """Raises CircuitOpenError if a call to the endpoint must not be sent."""
+        opened = self._open.get(endpoint)
+        if opened is None:
+            return
+        if endpoint in self._probing or time.monotonic() - opened < self.reset_timeout:
+            self.rejected += 1
+            raise CircuitOpenError(endpoint)
+        self._probing.add(endpoint)
+
+    def success(self, endpoint: str) -> None:
+        """Records a call that reached the service, closing the circuit."""
+        self._failures.pop(endpoint, None)
+        self._open.pop(endpoint, None)
+        self._probing.discard(endpoint)
+
+    def failure(self, endpoint: str) -> None:
+        """Records a transient failure, opening the circuit at the threshold or after a failed probe."""
+        self._probing.discard(endpoint)
+        if endpoint in self._open:
+            self._open[endpoint] = time.monotonic()
+            return
+        failures = self._failures[endpoint] = self._failures.get(endpoint, 0) + 1
+        if failures >= self.failure_threshold:
+            self._open[endpoint] = time.monotonic()
+            self.opened += 1
+
+    def abandon(self, endpoint: str) -> None:
+        """Records a call that was cancelled, a probe can be sent again."""
+        self._probing.discard(endpoint)
+
+    @property
+    def stats(self) -> dict:
+        """Returns the open endpoints and how often circuits opened and rejected calls."""
+        return {'open': sorted(self._open), 'opened': self.opened, 'rejected': self.rejected}
+
+class RetryPolicy:
+    """Retries of the calls that failed with a transient error.
+
+    A call is retried at most retries times, waiting a random time between 0 and
+    backoff * 2 ** n seconds, at most max_backoff, before the retry n (counted from 0).
+    With a deadline no attempt starts deadline seconds after the first one and the timeout
+    of every attempt is cut to the time left. Only idempotent calls are retried: GET
+    requests, the introspection and plan calls and the execution of read expressions, and
+    every call with retry_writes. The fields of MethodOptions override the policy per call.
+    """
+    def __init__(self, retries: int = 2, backoff: float = 0.1, max_backoff: float = 2.0,
+                 deadline: Optional[float] = None, retry_writes: bool = False):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.deadline = deadline
+        self.retry_writes = retry_writes
+        self.random = random.Random()
+
+    def solve(self, options: Optional[MethodOptions]) -> 'RetryPolicy':
+        """Returns the policy of a call, with the retry fields of its options."""
+        if options is None or (options.retries is None and options.backoff is None and options.deadline is None
+                               and options.retryWrites is None):
+            return self
+        policy = copy.copy(self)
+        if options.retries is not None:
+            policy.retries = options.retries
+        if options.backoff is not None:
+            policy.backoff = options.backoff
+        if options.deadline is not None:
+            policy.deadline = options.deadline
+        if options.retryWrites is not None:
+            policy.retry_writes = options.retryWrites
+        return policy
+
+    def delay(self, retry: int) -> float:
+        """Returns the time to wait before a retry."""
+        return self.random.uniform(0, min(self.max_backoff, self.backoff * 2 ** retry))
+
+    def idempotent(self, request: TransportRequest) -> bool:
+        """True if the request can be retried."""
+        if self.retry_writes or request.method == 'GET' or request.endpoint in READ_ENDPOINTS:
+            return True
+        if request.endpoint == '/execute' and isinstance(request.body, dict):
+            return not is_write_expression(request.body.get('expression') or '')
+        return False
+
+    async def call(self, request: TransportRequest, send: Callable[[TransportRequest], Awaitable[Any]],
+                   breaker: CircuitBreaker = None, retried: Callable[[TransportRequest], None] = None) -> Any:
+        """Sends the request, retrying it by the policy of its options.
+
+        Every attempt passes the circuit breaker, if given, and retried is called before every retry.
+        """
+        policy = self.solve(request.options)
+        retries = policy.retries if policy.idempotent(request) else 0
+        endpoint = endpoint_label(request.endpoint)
+        timeout = request.options.timeout if request.options is not None else None
+        start = time.monotonic()
+        retry = 0
+        while True:
+            attempt = request
+            if policy.deadline is not None:
+                left = max(policy.deadline - (time.monotonic() - start), 0)
+                options = copy.copy(request.options) if request.options is not None else MethodOptions(None)
+                options.timeout = min(timeout, left) if timeout else left
+                attempt = dataclasses.replace(request, options=options)
+            if breaker is not None:
+                breaker.before(endpoint)
+            try:
+                result = await send(attempt)
+            except Exception as error:  # pylint: disable=broad-except
+                failed = transient(error)
+                if breaker is not None:
+                    (breaker.failure if failed else breaker.success)(endpoint)
+                if not failed or retry >= retries:
+                    raise
+                wait = policy.delay(retry)
+                if policy.deadline is not None and time.monotonic() - start + wait >= policy.deadline:
+                    raise
+            except BaseException:
+                if breaker is not None:
+                    breaker.abandon(endpoint)
+                raise
+            else:
+                if breaker is not None:
+                    breaker.success(endpoint)
+                return result
+            retry += 1
+            if retried is not None:
+                retried(request)
+            await asyncio.sleep(wait)
+
+NO_RETRY = RetryPolicy(retries=0)
@@ -0,0 +1,283 @@
+"""Offline stand-ins for a LambdaORM service, used by the tests, the benchmarks and the load generator.
+
+StubServer is a keep-alive HTTP server answering canned JSON, install_fake_cli writes a
+lambdaorm command that echoes its arguments, and the payload functions build synthetic
+schemas, metadata and query plans of a given size.
+
+The stub service can also be run on its own, answering every ORM endpoint:
+
+    python -m lambdaorm.stub --port 9291 --entities 50
+"""
+from typing import Any, Dict, List
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import sys
+import zlib
+
+class StubServer:
+    """Minimal keep-alive HTTP server answering every request after a delay.
+
+    A path in routes is answered with its JSON value and a path in chunked with its chunks,
+    using chunked transfer encoding; any other path with {"requests": n}, n being the number
+    of requests received. While the list of a path in statuses is not empty, the requests
+    to the path are answered with the status popped from it and an error message. Unless
+    record is False, the path and the decoded body of every request are kept in requests
+    and its headers in headers. With compress the responses are gzipped for the clients
+    accepting it.
+    """
+    def __init__(self, delay: float = 0, routes: Dict[str, Any] = None, record: bool = True, compress: bool = False):
+        self.delay = delay
+        self.record = record
+        self.compress = compress
+        self.connections = 0
+        self.count = 0
+        self.requests = []
+        self.headers = []
+        self.routes = routes if routes is not None else {}
+        self.chunked = {}
+        self.statuses: Dict[str, List[int]] = {}
+        self.server = None
+        self._handlers: Dict[asyncio.Task, asyncio.StreamWriter] = {}
+        self._encoded: Dict[str, bytes] = {}
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Starts listening and returns the base url"""
+        self.server = await asyncio.start_server(self._handle, host, port)
+        port = self.server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        """Stops listening and closes the open connections"""
+        self.server.close()
+        await self.server.wait_closed()
+        for writer in self._handlers.values():
+            writer.close()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+
+    def _content(self, path: str, number: int) -> bytes:
+        if path not in self.routes:
+            return json.dumps({'requests': number}).encode()
+        # the canned responses can be large, encode them once
+        content = self._encoded.get(path)
+        if content is None:
+            content = self._encoded[path] = json.dumps(self.routes[path]).encode()
+        return content
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        task = asyncio.current_task()
+        self._handlers[task] = writer
+        try:
+            await self._serve(reader, writer)
+        except ConnectionError:
+            pass
+        finally:
+            del self._handlers[task]
+            writer.close()
+
+    async def _serve(self, reader, writer):
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            headers = {}
+            while (line := await reader.readline()) not in (b'\r\n', b''):
+                name, _, value = line.decode().partition(':')
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+            path = request_line.decode().split(' ')[1]
+            self.count += 1
+            number = self.count
+            if self.record:
+                if headers.get('content-encoding') == 'gzip':
+                    body = gzip.decompress(body)
+                self.requests.append((path, json.loads(body) if body else None))
+                self.headers.append(headers)
+            compressed = self.compress and 'gzip' in headers.get('accept-encoding', '')
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            if self.statuses.get(path):
+                status = self.statuses[path].pop(0)
+                content = json.dumps({'message': 'stub error'}).encode()
+                writer.write(f'HTTP/1.1 {status} Error\r\nContent-Type: application/json\r\n'.encode()
+                             + f'Content-Length: {len(content)}\r\n\r\n'.encode() + content)
+            elif path in self.chunked:
+                compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if compressed else None
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nTransfer-Encoding: chunked\r\n'
+                             + (b'Content-Encoding: gzip\r\n\r\n' if compressed else b'\r\n'))
+                for chunk in [*self.chunked[path], b''] if compressed else self.chunked[path]:
+                    if compressor is not None:
+                        chunk = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH if chunk else zlib.Z_FINISH)
+                    writer.write(f'{len(chunk):x}\r\n'.encode() + chunk + b'\r\n')
+                    await writer.drain()
+                writer.write(b'0\r\n\r\n')
+            else:
+                content = self._content(path, number)
+                if compressed:
+                    content = gzip.compress(content, mtime=0)
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                             + (b'Content-Encoding: gzip\r\n' if compressed else b'')
+                             + f'Content-Length: {len(content)}\r\n\r\n'.encode() + content)
+            await writer.drain()
+
+FAKE_CLI = """
+import json, os, sys, time
+if sys.argv[1] == 'worker':
+    for line in sys.stdin:
+        request = json.loads(line)
+        if request.get('expression') == 'crash':
+            os._exit(3)
+        if request.get('expression') == 'fail':
+            response = {'id': request['id'], 'error': 'invalid expression'}
+        else:
+            response = {'id': request['id'], 'result': dict(request, pid=os.getpid())}
+        print(json.dumps(response), flush=True)
+else:
+    if 'slow' in sys.argv:
+        time.sleep(0.3)
+    data = sys.argv[sys.argv.index('-d') + 1] if '-d' in sys.argv else None
+    if data is not None and os.path.isfile(data):
+        with open(data, encoding='utf-8') as file:
+            data = file.read()
+    data = json.loads(data) if data is not None else None
+    print(json.dumps({'command': sys.argv[1], 'argv': sys.argv[2:], 'data': data, 'pid': os.getpid()}))
+"""
+
+def install_fake_cli(directory: str) -> str:
+    """Writes a fake lambdaorm command in directory and returns its path.
+
+    Commands print their arguments and data, read from the -d option or the file it names.
+    The expression slow takes 0.3 seconds. In worker mode every request is answered with
+    itself, the expression fail with an error and crash exits the worker. The directory
+    must be added to PATH for the client to find the command.
+    """
+    path = os.path.join(directory, 'lambdaorm')
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(f"#!{sys.executable}\n{FAKE_CLI}")
+    os.chmod(path, 0o755)
+    return path
+
+def schema_payload(entities: int, properties: int = 15) -> dict:
+    """Builds the dictionary of a schema with the given number of entities."""
+    names = [f"Entity{i}" for i in range(entities)]
+    return {
+        'version': '1.0.0',
+        'domain': {
+            'version': '1.0.0',
+            'entities': [{
+                'name': name,
+                'primaryKey': ['id'],
+                'uniqueKey': ['code'],
+                'required': ['id', 'code'],
+                'indexes': [{'name': 'code', 'fields': ['code']}],
+                'properties': [{'name': f"field{p}", 'type': 'string', 'length': 80} for p in range(properties)],
+                'relations': [{'name': 'parent', 'type': 'manyToOne', 'from': 'parentId',
+                               'entity': names[i - 1], 'to': 'id', 'target': 'children'}],
+                'dependents': [{'entity': names[(i + 1) % entities],
+                                'relation': {'name': 'child', 'type': 'oneToMany', 'from': 'id',
+                                             'entity': name, 'to': 'parentId'}}],
+            } for i, name in enumerate(names)],
+            'enums': []
+        },
+        'infrastructure': {
+            'mappings': [{'name': 'default', 'entities': [{
+                'name': name, 'mapping': name.upper(),
+                'properties': [{'mapping': f"FIELD_{p}"} for p in range(properties)]
+            } for name in names]}],
+            'sources': [{'name': 'main', 'dialect': 'PostgreSQL', 'mapping': 'default'}],
+            'stages': [{'name': 'default', 'sources': [{'name': 'main'}]}],
+            'views': [{'name': 'default', 'entities': []}]
+        },
+        'application': {'start': [], 'listeners': [], 'end': []}
+    }
+
+def metadata_payload(depth: int = 3, width: int = 3) -> dict:
+    """Builds a metadata tree like the ones returned for a query with includes."""
+    node = {
+        'classtype': 'Sentence', 'pos': {'ln': 1, 'col': 1}, 'name': 'select', 'type': 'any',
+        'entity': 'Orders', 'clause': 'select', 'alias': 'o', 'isRoot': depth == 3,
+        'columns': [{'name': f"field{i}", 'propertyType': 'string', 'length': 80} for i in range(8)],
+        'parameters': [{'name': 'id', 'type': 'integer'}],
+        'constraints': [{'message': 'required', 'condition': 'isNotNull(id)'}],
+        'relation': {'name': 'details', 'type': 'oneToMany', 'from': 'id', 'entity': 'OrderDetails', 'to': 'orderId'}
+    }
+    if depth > 0:
+        node['children'] = [metadata_payload(depth - 1, width) for _ in range(width)]
+    return node
+
+def plan_payload(depth: int = 3, width: int = 3) -> dict:
+    """Builds a query plan tree."""
+    node = {'entity': 'Orders', 'dialect': 'PostgreSQL', 'source': 'main', 'sentence': 'SELECT o.id FROM Orders o'}
+    if depth > 0:
+        node['children'] = [plan_payload(depth - 1, width) for _ in range(width)]
+    return node
+
+def rows_payload(rows: int) -> List[dict]:
+    """Builds the result of a query returning the given number of rows."""
+    return [{'id': i, 'code': f"C{i:06}", 'name': f"Name {i}", 'price': i * 1.5} for i in range(rows)]
+
+def stub_routes(entities: int = 50, rows: int = 100) -> Dict[str, Any]:
+    """Returns the routes of a StubServer answering every ORM endpoint with synthetic payloads."""
+    schema = schema_payload(entities)
+    domain = schema['domain']
+    infrastructure = schema['infrastructure']
+    mapping = infrastructure['mappings'][0]
+    routes = {
+        '/version': {'version': '1.0.0'},
+        '/ping': {'message': 'pong', 'time': '2024-01-01T00:00:00Z'},
+        '/health': {'message': 'ok', 'time': '2024-01-01T00:00:00Z', 'uptime': 1},
+        '/metrics': {},
+        '/model': [{'name': column['name'], 'type': column['propertyType']} for column in metadata_payload()['columns']],
+        '/parameters': [{'name': 'id', 'type': 'integer'}],
+        '/constraints': {'entity': 'Orders', 'constraints': [{'message': 'required', 'condition': 'isNotNull(id)'}]},
+        '/metadata': metadata_payload(),
+        '/plan': plan_payload(),
+        '/execute': rows_payload(rows),
+        '/execute-queued': {'queued': True},
+        '/schema/version': {'version': schema['version']},
+        '/schema': schema,
+        '/domain': domain,
+        '/entities': domain['entities'],
+        '/enums': domain['enums'],
+        '/sources': infrastructure['sources'],
+        '/mappings': infrastructure['mappings'],
+        '/stages/': infrastructure['stages'],
+        '/views': [view['name'] for view in infrastructure['views']],
+    }
+    for entity in domain['entities']:
+        routes['/entities/' + entity['name']] = entity
+    for entity in mapping['entities']:
+        routes[f"/mappings/{mapping['name']}/{entity['name']}"] = entity
+    for collection, key in (('sources', '/sources/'), ('mappings', '/mappings/'), ('stages', '/stages/')):
+        for item in infrastructure[collection]:
+            routes[key + item['name']] = item
+    return routes
+
+async def serve(host: str, port: int, delay: float = 0, entities: int = 50, rows: int = 100) -> None:
+    """Runs a stub service answering every ORM endpoint until cancelled, printing its url."""
+    server = StubServer(delay, stub_routes(entities, rows), record=False)
+    print(await server.start(host, port), flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+def main() -> None:
+    """Runs the stub service from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=0, help='0 picks a free port')
+    parser.add_argument('--delay', type=float, default=0, help='seconds to wait before every response')
+    parser.add_argument('--entities', type=int, default=50)
+    parser.add_argument('--rows', type=int, default=100, help='rows returned by execute')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.delay, args.entities, args.rows))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
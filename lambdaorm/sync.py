@@ -0,0 +1,276 @@
+# pylint: disable=invalid-name
+"""Synchronous client for the LambdaORM REST API.
+
+It only depends on requests, which is imported when the first session is created, and
+does not import asyncio.
+"""
+from typing import TYPE_CHECKING, List, Any, Optional
+import json
+from lambdaorm.compression import DEFAULT_COMPRESSION, Compression
+from lambdaorm.domain import (DomainSchema, Entity, EntityMapping, EnumDomain, Health, Mapping, Metadata,
+MetadataConstraint, MetadataModel, MetadataParameter, MethodOptions, Ping, QueryOptions, QueryPlan,
+Schema, SchemaConfig, Source, Stage, Version)
+if TYPE_CHECKING:
+    import requests
+
+class SyncRestHelper:
+    """Helper class for the synchronous Client REST API.
+
+    All the requests go through one requests.Session whose connection pool is shared by
+    every thread using the helper. Like the asynchronous client, a response that is not 2xx
+    raises, here requests.HTTPError. requests asks for compressed responses and decodes them,
+    the request bodies are compressed by compression, by default only when MethodOptions
+    asks for it.
+    """
+    def __init__(self, url: str, session: 'requests.Session' = None, pool_size: int = 10,
+                 compression: Compression = None):
+        self.url = url
+        self.session = session if session is not None else self.create_session(pool_size)
+        self.compression = compression if compression is not None else DEFAULT_COMPRESSION
+
+    @staticmethod
+    def create_session(pool_size: int = 10) -> 'requests.Session':
+        """Creates a session with a keep-alive connection pool of the given size."""
+        # requests is only imported by the synchronous client
+        import requests  # pylint: disable=import-outside-toplevel,redefined-outer-name
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def solve_method_options(self, options: MethodOptions) -> MethodOptions:
+        """Solves the method options."""
+        if options is None:
+            options = MethodOptions(10)
+        if options.timeout is None:
+            options.timeout = 10
+        return options
+
+    def post(self, path: str, body: dict, options: MethodOptions=None)-> dict:
+        """POST request to the REST API."""
+        options = self.solve_method_options(options)
+        content, encoding = self.compression.compress(json.dumps(body).encode('utf-8'), options)
+        headers = {'Content-Type': 'application/json'}
+        if encoding is not None:
+            headers['Content-Encoding'] = encoding
+        response = self.session.post(self.url + path, data=content, headers=headers, timeout= options.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def get(self, path: str,options: MethodOptions=None)-> dict:
+        """GET request to the REST API."""
+        options = self.solve_method_options(options)
+        response = self.session.get(self.url + path, timeout= options.timeout)
+        response.raise_for_status()
+        return response.json()
+
+class ExpressionSyncRestService:
+    """Synchronous client for the expression endpoints of the ORM REST API."""
+    def __init__(self, url: str, session: 'requests.Session' = None, compression: Compression = None):
+        self.rest = SyncRestHelper(url, session, compression=compression)
+
+    def model(self, expression: str) -> List[MetadataModel]:
+        """Returns the model for the given expression."""
+        response = self.rest.post('/model',{'expression': expression})
+        return MetadataModel.from_dict(response)
+
+    def parameters(self, expression: str) -> List[MetadataParameter]:
+        """Returns the parameters for the given expression."""
+        response = self.rest.post('/parameters',{'expression': expression})
+        return MetadataParameter.from_dict(response)
+
+    def constraints(self, expression: str) -> MetadataConstraint:
+        """Returns the constraints for the given expression."""
+        response = self.rest.post('/constraints',{'expression': expression})
+        return MetadataConstraint.from_dict(response)
+
+    def metadata(self, expression: str) -> Metadata:
+        """Returns the metadata for the given expression."""
+        response = self.rest.post('/metadata',{'expression': expression})
+        return Metadata.from_dict(response)
+
+    def plan(self,expression:str, options:QueryOptions,method_options: MethodOptions=None) -> QueryPlan:
+        """Returns the query plan for the given expression."""
+        body = {'expression': expression, 'options': options.to_dict() if options is not None else None}
+        response = self.rest.post('/plan',body,method_options)
+        return QueryPlan.from_dict(response)
+
+    def execute(self,expression:str,data:dict=None, options:QueryOptions=None,method_options: MethodOptions=None) -> dict:
+        """Execute query for the given expression."""
+        body = {'expression': expression, 'data': data, 'options': options.to_dict() if options is not None else None}
+        return self.rest.post('/execute',body,method_options)
+
+    def execute_queued(self,expression:str,topic:str,data:dict=None, options:QueryOptions=None,method_options: MethodOptions=None) -> dict:
+        """Queue execute query for the given expression."""
+        body = {'expression': expression,'topic':topic, 'data': data, 'options': options.to_dict() if options is not None else None}
+        return self.rest.post('/execute-queued',body,method_options)
+
+class GeneralSyncRestService:
+    """Synchronous client for the general endpoints of the ORM REST API."""
+    def __init__(self, url: str, session: 'requests.Session' = None):
+        self.rest = SyncRestHelper(url, session)
+
+    def version(self) -> Version:
+        """Returns the version of the service."""
+        return Version.from_dict(self.rest.get('/version'))
+
+    def ping(self) -> Ping:
+        """Returns the ping of the service."""
+        return Ping.from_dict(self.rest.get('/ping'))
+
+    def health(self) -> Health:
+        """Returns the health of the service."""
+        return Health.from_dict(self.rest.get('/health'))
+
+    def metrics(self) -> Any:
+        """Returns the metrics of the service."""
+        return self.rest.get('/metrics')
+
+class SchemaSyncRestService:
+    """Synchronous client for the schema endpoints of the ORM REST API."""
+    def __init__(self, url: str, session: 'requests.Session' = None):
+        self.rest = SyncRestHelper(url, session)
+
+    def version(self) -> Version:
+        """Get the version information."""
+        return Version.from_dict(self.rest.get('/schema/version'))
+
+    def schema(self) -> Schema:
+        """Get the full schema."""
+        return Schema.from_dict(self.rest.get('/schema'))
+
+    def domain(self) -> DomainSchema:
+        """Get the domain schema."""
+        return DomainSchema.from_dict(self.rest.get('/domain'))
+
+    def sources(self) -> List[Source]:
+        """Get a list of sources."""
+        return Source.from_dict(self.rest.get('/sources'))
+
+    def source(self, source: str) -> Optional[Source]:
+        """Get information about a specific source."""
+        return Source.from_dict(self.rest.get('/sources/'+source))
+
+    def entities(self) -> List[Entity]:
+        """Get a list of entities."""
+        return Entity.from_dict(self.rest.get('/entities'))
+
+    def entity(self, entity: str) -> Optional[Entity]:
+        """Get information about a specific entity."""
+        return Entity.from_dict(self.rest.get('/entities/'+entity))
+
+    def enums(self) -> List[EnumDomain]:
+        """Get a list of enums."""
+        return EnumDomain.from_dict(self.rest.get('/enums'))
+
+    def enum(self, _enum: str) -> Optional[EnumDomain]:
+        """Get information about a specific enum."""
+        return EnumDomain.from_dict(self.rest.get('/enums/'+_enum))
+
+    def mappings(self) -> List[Mapping]:
+        """Get a list of mappings."""
+        return Mapping.from_dict(self.rest.get('/mappings'))
+
+    def mapping(self, mapping: str) -> Optional[Mapping]:
+        """Get information about a specific mapping."""
+        return Mapping.from_dict(self.rest.get('/mappings/'+mapping))
+
+    def entityMapping(self, mapping: str, entity: str) -> Optional[EntityMapping]:
+        """Get information about a specific entity mapping."""
+        return EntityMapping.from_dict(self.rest.get('/mappings/'+mapping+'/'+entity))
+
+    def stages(self) -> List[Stage]:
+        """Get a list of stages."""
+        return Stage.from_dict(self.rest.get('/stages/'))
+
+    def stage(self, stage: str) -> Optional[Stage]:
+        """Get information about a specific stage."""
+        return Stage.from_dict(self.rest.get('/stages/'+stage))
+
+    def views(self) -> List[str]:
+        """Get a list of views."""
+        return self.rest.get('/views')
+
+class StageSyncRestService:
+    """Synchronous client for the stage endpoints of the ORM REST API."""
+    def __init__(self, url: str, session: 'requests.Session' = None, compression: Compression = None):
+        self.rest = SyncRestHelper(url, session, compression=compression)
+
+    def exists(self, stage: str) -> bool:
+        """Check if a stage exists."""
+        return self.rest.get('/stages/'+stage+'/exists')
+
+    def export(self, stage: str) -> SchemaConfig:
+        """Export the configuration of a stage."""
+        return SchemaConfig.from_dict(self.rest.get('/stages/'+stage+'/export'))
+
+    def import_(self, stage: str, data: SchemaConfig) -> None:
+        """Import the configuration into a stage."""
+        self.rest.post('/stages/'+stage+'/import', data.to_dict())
+
+class SyncOrm:
+    """Synchronous ORM API over a pooled keep-alive session.
+
+    The instance can be shared by the threads of a ThreadPoolExecutor. compression gzips
+    the request bodies above its threshold.
+    """
+    def __init__(self, url: str, pool_size: int = 10, compression: Compression = None):
+        self.session = SyncRestHelper.create_session(pool_size)
+        self.expression = ExpressionSyncRestService(url, self.session, compression)
+        self.general = GeneralSyncRestService(url, self.session)
+        self.schema = SchemaSyncRestService(url, self.session)
+        self.stage = StageSyncRestService(url, self.session, compression)
+
+    def __enter__(self) -> "SyncOrm":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def get_general(self) -> GeneralSyncRestService:
+        """Get the general service."""
+        return self.general
+
+    @property
+    def get_schema(self) -> SchemaSyncRestService:
+        """Get the schema service."""
+        return self.schema
+
+    @property
+    def get_stage(self) -> StageSyncRestService:
+        """Get the stage service."""
+        return self.stage
+
+    def model(self, expression: str) -> List[MetadataModel]:
+        """Returns the model for the given expression."""
+        return self.expression.model(expression)
+
+    def parameters(self, expression: str) -> List[MetadataParameter]:
+        """Returns the parameters for the given expression."""
+        return self.expression.parameters(expression)
+
+    def constraints(self, expression: str) -> MetadataConstraint:
+        """Returns the constraints for the given expression."""
+        return self.expression.constraints(expression)
+
+    def metadata(self, expression: str) -> Metadata:
+        """Returns the metadata for the given expression."""
+        return self.expression.metadata(expression)
+
+    def plan(self, expression: str, options: QueryOptions, method_options: MethodOptions = None) -> QueryPlan:
+        """Returns the query plan for the given expression."""
+        return self.expression.plan(expression, options, method_options)
+
+    def execute(self, expression: str, data: dict = None, options: QueryOptions = None, method_options: MethodOptions = None) -> dict:
+        """Execute query for the given expression."""
+        return self.expression.execute(expression, data, options, method_options)
+
+    def execute_queued(self, expression: str, topic: str, data: dict = None, options: QueryOptions = None, method_options: MethodOptions = None) -> dict:
+        """Queue execute query for the given expression."""
+        return self.expression.execute_queued(expression, topic, data, options, method_options)
+
+    def close(self) -> None:
+        """Closes the pooled connections."""
+        self.session.close()
@@ -0,0 +1,115 @@
+"""Tests for the load balancing across replicas of the service"""
+import asyncio
+import pytest
+from lambdaorm.application import Interceptor
+from lambdaorm.balancer import LoadBalancer
+from lambdaorm.infrastructure import Orm
+from lambdaorm.resilience import RetryPolicy
+from lambdaorm.stub import StubServer
+from lambdaorm.transport import HttpError
+
+async def start(servers):
+    return [await server.start() for server in servers]
+
+async def stop(orm, servers):
+    await orm.close()
+    for server in servers:
+        await server.stop()
+
+def test_calls_spread_across_replicas():
+    """Concurrent calls reach every replica and none is left outstanding"""
+    servers = [StubServer(delay=0.01) for _ in range(3)]
+    balancer = LoadBalancer()
+    async def run():
+        orm = Orm(await start(servers), load_balancer=balancer)
+        await asyncio.gather(*[orm.execute('Orders') for _ in range(60)])
+        await stop(orm, servers)
+    asyncio.run(run())
+    assert all(server.requests for server in servers)
+    assert sum(len(server.requests) for server in servers) == 60
+    assert all(node['outstanding'] == 0 and node['healthy'] for node in balancer.stats['nodes'])
+
+def test_least_outstanding_prefers_fast_replica():
+    """With least outstanding requests a slow replica gets fewer calls"""
+    fast, slow = StubServer(), StubServer(delay=0.1)
+    async def run():
+        orm = Orm(await start([fast, slow]), load_balancer=LoadBalancer(strategy='least'))
+        semaphore = asyncio.Semaphore(4)
+        async def call():
+            async with semaphore:
+                await orm.execute('Orders')
+        await asyncio.gather(*[call() for _ in range(40)])
+        await stop(orm, [fast, slow])
+    asyncio.run(run())
+    assert len(fast.requests) > 3 * len(slow.requests)
+
+def test_failed_replica_taken_out_and_brought_back():
+    """A replica failing repeatedly stops receiving calls until its ping succeeds"""
+    healthy, failing = StubServer(), StubServer()
+    failing.statuses['/execute'] = [503] * 3
+    failing.statuses['/ping'] = [503]
+    balancer = LoadBalancer(strategy='least', failure_threshold=3, check_interval=0.05)
+    async def run():
+        orm = Orm(await start([healthy, failing]), load_balancer=balancer,
+                  retry_policy=RetryPolicy(retries=5, backoff=0.001))
+        for _ in range(40):
+            await orm.execute('Orders')
+        down = [node['healthy'] for node in balancer.stats['nodes']]
+        failed_calls = len(failing.requests)
+        for _ in range(20):
+            await asyncio.sleep(0.06)
+            await orm.execute('Orders')
+            if all(node['healthy'] for node in balancer.stats['nodes']):
+                break
+        for _ in range(40):
+            await orm.execute('Orders')
+        up = [node['healthy'] for node in balancer.stats['nodes']]
+        await stop(orm, [healthy, failing])
+        return down, failed_calls, up
+    down, failed_calls, up = asyncio.run(run())
+    assert down == [True, False] and failed_calls == 3
+    assert up == [True, True]
+    paths = [path for path, _ in failing.requests]
+    assert paths.count('/ping') == 2 and paths[-1] == '/execute'
+
+def test_unknown_strategy_rejected():
+    """Only the known strategies are accepted"""
+    with pytest.raises(ValueError):
+        LoadBalancer(strategy='random')
+
+def test_ping_sent_through_interceptors():
+    """The health checks of a replica pass through the interceptors with the headers of the client"""
+    failing = StubServer()
+    failing.statuses['/execute'] = [503]
+    seen = []
+    class Tag(Interceptor):
+        async def intercept(self, request, call_next):
+            seen.append(request.endpoint)
+            request.headers['X-Tag'] = 'replica'
+            return await call_next(request)
+    balancer = LoadBalancer(failure_threshold=1, check_interval=0.01)
+    async def run():
+        orm = Orm(await start([failing]), load_balancer=balancer, interceptors=[Tag()])
+        with pytest.raises(HttpError):
+            await orm.execute('Orders')
+        for _ in range(50):
+            await asyncio.sleep(0.02)
+            await orm.execute('Orders')
+            if all(node['healthy'] for node in balancer.stats['nodes']):
+                break
+        await stop(orm, [failing])
+    asyncio.run(run())
+    [ping] = [headers for (path, _), headers in zip(failing.requests, failing.headers) if path == '/ping']
+    assert ping['x-tag'] == 'replica' and ping['accept-encoding'] == 'gzip, deflate'
+    assert '/ping' in seen
+
+def test_replica_urls_not_added_twice():
+    """The urls already known to the balancer are not added again"""
+    balancer = LoadBalancer(['http://a:1', 'http://b:1/'])
+    Orm(['http://b:1', 'http://c:1'], load_balancer=balancer)
+    assert [node['url'] for node in balancer.stats['nodes']] == ['http://a:1', 'http://b:1', 'http://c:1']
+
+def test_balancer_with_single_url_rejected():
+    """A load balancer given with a single url is an error instead of being ignored"""
+    with pytest.raises(ValueError):
+        Orm('http://a:1', load_balancer=LoadBalancer())
@@ -0,0 +1,318 @@
+"""Tests for the client side caches"""
+import asyncio
+import pickle
+import threading
+from lambdaorm.application import ExpressionService, SchemaService
+from lambdaorm.cache import (IntrospectionCache, IntrospectionCacheExpressionService, PlanCache,
+PlanCacheExpressionService, ResultCache, ResultCacheExpressionService, SingleFlight, SnapshotSchemaService,
+is_write_expression, normalize_expression)
+from lambdaorm.domain import Metadata, QueryOptions, Schema
+from lambdaorm.infrastructure import Orm
+
+class FakeExpressionService(ExpressionService):
+    """Expression service counting the calls it receives"""
+    def __init__(self):
+        self.calls = 0
+
+    async def plan(self, expression, options, method_options=None):
+        self.calls += 1
+        return {'expression': expression, 'stage': options.stage}
+
+    async def metadata(self, expression):
+        self.calls += 1
+        return {'expression': expression}
+
+class FakeSchemaService(SchemaService):
+    """Schema service reporting a version that can be changed"""
+    def __init__(self, version='1'):
+        self.current = version
+
+    async def version(self):
+        return self.current
+
+def test_normalize_expression_keeps_literals():
+    """Whitespace is collapsed outside string literals only"""
+    assert normalize_expression(" Orders.filter(p =>  p.name ==  'a  b')\n") == "Orders.filter(p => p.name == 'a  b')"
+
+def test_plan_cache_hits_and_evictions():
+    """Plans are cached by normalized expression, stage and view"""
+    inner = FakeExpressionService()
+    cache = PlanCache(max_size=2)
+    service = PlanCacheExpressionService(inner, FakeSchemaService(), cache)
+    async def run():
+        await service.plan('Orders', QueryOptions(stage='default'))
+        await service.plan(' Orders ', QueryOptions(stage='default'))
+        await service.plan('Orders', QueryOptions(stage='other'))
+        await service.plan('Customers', QueryOptions(stage='default'))
+    asyncio.run(run())
+    assert inner.calls == 3
+    assert cache.stats() == {'size': 2, 'maxSize': 2, 'hits': 1, 'misses': 3, 'evictions': 1, 'expirations': 0}
+
+def test_plan_cache_invalidated_by_schema_version():
+    """A new schema version clears the cached plans"""
+    inner = FakeExpressionService()
+    schema = FakeSchemaService()
+    service = PlanCacheExpressionService(inner, schema, PlanCache(version_interval=0))
+    async def run():
+        await service.plan('Orders', QueryOptions(stage='default'))
+        await service.plan('Orders', QueryOptions(stage='default'))
+        schema.current = '2'
+        await service.plan('Orders', QueryOptions(stage='default'))
+    asyncio.run(run())
+    assert inner.calls == 2
+
+class FailingSchemaService(FakeSchemaService):
+    """Schema service whose version call fails after the first one"""
+    def __init__(self):
+        super().__init__()
+        self.version_calls = 0
+
+    async def version(self):
+        self.version_calls += 1
+        if self.version_calls > 1:
+            raise ConnectionError('service down')
+        return self.current
+
+def test_plan_cache_served_while_version_fails():
+    """A failing version call keeps the last version and is retried once per interval"""
+    inner = FakeExpressionService()
+    schema = FailingSchemaService()
+    cache = PlanCache(version_interval=0.05)
+    service = PlanCacheExpressionService(inner, schema, cache)
+    async def run():
+        await service.plan('Orders', QueryOptions(stage='default'))
+        await asyncio.sleep(0.06)
+        for _ in range(5):
+            await service.plan('Orders', QueryOptions(stage='default'))
+    asyncio.run(run())
+    assert inner.calls == 1
+    assert schema.version_calls == 2
+    assert cache.version == '1'
+
+def test_introspection_cache_expires_entries(monkeypatch):
+    """Entries older than the ttl are fetched again"""
+    inner = FakeExpressionService()
+    service = IntrospectionCacheExpressionService(inner, FakeSchemaService(), IntrospectionCache(ttl=60))
+    now = [1000.0]
+    monkeypatch.setattr('lambdaorm.cache.time.time', lambda: now[0])
+    async def run():
+        await service.metadata('Orders')
+        await service.metadata('Orders')
+        now[0] += 61
+        await service.metadata('Orders')
+    asyncio.run(run())
+    assert inner.calls == 2
+    assert service.cache.expirations == 1
+
+def test_introspection_cache_warm_start_from_disk(tmp_path):
+    """A cache loaded from disk answers without calling the service"""
+    path = str(tmp_path / 'introspection.cache')
+    first = FakeExpressionService()
+    cache = IntrospectionCache(path=path)
+    asyncio.run(IntrospectionCacheExpressionService(first, FakeSchemaService(), cache).metadata('Orders'))
+    cache.save()
+    second = FakeExpressionService()
+    service = IntrospectionCacheExpressionService(second, FakeSchemaService(), IntrospectionCache(path=path))
+    assert asyncio.run(service.metadata('Orders')) == {'expression': 'Orders'}
+    assert second.calls == 0
+    stale = IntrospectionCacheExpressionService(second, FakeSchemaService('2'), IntrospectionCache(path=path))
+    asyncio.run(stale.metadata('Orders'))
+    assert second.calls == 1
+
+def test_introspection_cache_ignores_unreadable_file(tmp_path):
+    """A truncated, malformed or unimportable cache file is a cold start"""
+    path = tmp_path / 'introspection.cache'
+    unimportable = b'cmissing_module\nMetadata\n.'
+    for content in [b'\x80\x04', pickle.dumps([1, 2]), pickle.dumps({'version': '1', 'entries': 3}),
+                    pickle.dumps(frozenset()), unimportable]:
+        path.write_bytes(content)
+        assert len(IntrospectionCache(path=str(path))._entries) == 0
+
+def test_introspection_cache_writes_off_the_loop(tmp_path):
+    """put() writes the file in the executor on a running loop, flush() waits for it"""
+    path = str(tmp_path / 'introspection.cache')
+    cache = IntrospectionCache(path=path, save_interval=0)
+    threads = []
+    write = cache._write
+    def record(stored):
+        threads.append(threading.get_ident())
+        write(stored)
+    cache._write = record
+    async def run():
+        await IntrospectionCacheExpressionService(FakeExpressionService(), FakeSchemaService(), cache).metadata('Orders')
+        await cache.flush()
+    asyncio.run(run())
+    assert threads and threading.get_ident() not in threads
+    assert IntrospectionCache(path=path).get(cache.key('metadata', 'Orders')) == {'expression': 'Orders'}
+
+SCHEMA = {
+    'version': '1',
+    'domain': {'entities': [{'name': 'Orders'}, {'name': 'Customers'}],
+               'enums': [{'name': 'Status', 'values': [{'name': 'open', 'value': 1}]}]},
+    'infrastructure': {'mappings': [{'name': 'default', 'entities': [{'name': 'Orders', 'mapping': 'TBL_ORDERS'}]}],
+                       'sources': [{'name': 'main', 'dialect': 'PostgreSQL'}],
+                       'stages': [{'name': 'default', 'sources': [{'name': 'main'}]}],
+                       'views': [{'name': 'default'}]}
+}
+
+class SnapshotSourceService(FakeSchemaService):
+    """Schema service counting the full schema downloads"""
+    def __init__(self, version='1'):
+        super().__init__(version)
+        self.downloads = 0
+
+    async def schema(self):
+        self.downloads += 1
+        return Schema.from_dict(SCHEMA)
+
+def test_snapshot_serves_lookups_locally():
+    """Schema lookups are answered from a single download"""
+    source = SnapshotSourceService()
+    service = SnapshotSchemaService(source)
+    async def run():
+        return (await service.entity('Orders'), await service.entity('Missing'), await service.enum('Status'),
+                await service.entityMapping('default', 'Orders'), await service.stage('default'),
+                await service.source('main'), await service.views())
+    entity, missing, enum, entity_mapping, stage, source_, views = asyncio.run(run())
+    assert source.downloads == 1
+    assert entity.name == 'Orders' and missing is None
+    assert enum.values[0].name == 'open'
+    assert entity_mapping.mapping == 'TBL_ORDERS'
+    assert stage.sources[0].name == 'main' and source_.dialect == 'PostgreSQL'
+    assert views == ['default']
+
+def test_snapshot_refreshed_on_new_version():
+    """The snapshot is reloaded in the background when the schema version changes"""
+    source = SnapshotSourceService()
+    service = SnapshotSchemaService(source, refresh_interval=0)
+    async def run():
+        await service.entity('Orders')
+        await service.entity('Orders')
+        await asyncio.sleep(0)
+        source.current = '2'
+        await service.entity('Orders')
+        await asyncio.sleep(0.01)
+        return await service.version()
+    version = asyncio.run(run())
+    assert source.downloads == 2
+    assert version.version == '2'
+
+def test_write_expressions_detected():
+    """Write actions are found outside string literals only"""
+    assert is_write_expression('Orders.insert()')
+    assert is_write_expression('Orders.filter(p => p.id == id).update({name: name})')
+    assert is_write_expression('Orders.bulkInsert().include(p => p.details)')
+    assert not is_write_expression('Orders.filter(p => p.name == ".delete(")')
+    assert not is_write_expression('Orders.map(p => p.updated)')
+
+def test_single_flight_coalesces_concurrent_calls(stub_server):
+    """Identical concurrent reads share one request, writes are never coalesced"""
+    async def run():
+        stub_server.delay = 0.05
+        orm = Orm(await stub_server.start(), single_flight=SingleFlight(copy_results=True))
+        reads = await asyncio.gather(*[orm.execute('Orders.filter(p => p.id > id)', {'id': 1}) for _ in range(5)])
+        await asyncio.gather(*[orm.plan('Orders', QueryOptions(stage='default')) for _ in range(5)])
+        await asyncio.gather(*[orm.get_schema.entity('Orders') for _ in range(5)])
+        await asyncio.gather(*[orm.execute('Orders.insert()', {'id': 1}) for _ in range(3)])
+        await orm.close()
+        await stub_server.stop()
+        return reads
+    reads = asyncio.run(run())
+    paths = [path for path, _ in stub_server.requests]
+    assert paths.count('/execute') == 4
+    assert paths.count('/plan') == 1
+    assert len(paths) == 6
+    assert all(read == reads[0] for read in reads)
+    assert len({id(read) for read in reads}) == 5
+
+class FakeExecuteService(ExpressionService):
+    """Expression service whose metadata names the entities before the first dot and the included ones"""
+    def __init__(self):
+        self.executed = []
+
+    async def metadata(self, expression):
+        includes = [Metadata(entity='Customers')] if 'include' in expression else None
+        return Metadata(entity=expression.split('.')[0], children=includes)
+
+    async def execute(self, expression, data=None, options=None, method_options=None):
+        self.executed.append(expression)
+        return [{'row': len(self.executed)}]
+
+def test_result_cache_invalidated_by_writes_to_its_entities():
+    """A write evicts the cached reads of the entities it touches only"""
+    inner = FakeExecuteService()
+    cache = ResultCache(max_bytes=10000)
+    service = ResultCacheExpressionService(inner, cache)
+    async def run():
+        for _ in range(2):
+            await service.execute('Orders.filter(p => p.id == id)', {'id': 1})
+            await service.execute('Orders.include(p => p.customer)')
+            await service.execute('Customers')
+        await service.execute('Customers.insert()', {'name': 'a'})
+        await service.execute('Orders.filter(p => p.id == id)', {'id': 1})
+        await service.execute('Orders.include(p => p.customer)')
+        await service.execute('Customers')
+        await service.execute('Orders.filter(p => p.id == id)', {'id': 2})
+    asyncio.run(run())
+    assert inner.executed == ['Orders.filter(p => p.id == id)', 'Orders.include(p => p.customer)', 'Customers',
+                              'Customers.insert()', 'Orders.include(p => p.customer)', 'Customers',
+                              'Orders.filter(p => p.id == id)']
+    stats = cache.stats()
+    assert stats['invalidations'] == 2
+    assert stats['hitRatio'] == 4 / 10
+    assert stats['bytes'] == 4 * len('[{"row": 1}]')
+
+class SlowReadService(FakeExecuteService):
+    """Expression service whose reads take a while and may return None"""
+    async def execute(self, expression, data=None, options=None, method_options=None):
+        if not is_write_expression(expression):
+            await asyncio.sleep(0.05)
+        self.executed.append(expression)
+        return None if expression == 'Empty' else [{'row': len(self.executed)}]
+
+def test_result_cache_skips_reads_overtaken_by_writes():
+    """A read in flight while a write invalidates its entities is not stored"""
+    inner = SlowReadService()
+    service = ResultCacheExpressionService(inner, ResultCache())
+    async def run():
+        await service.entities('Orders')
+        read = asyncio.ensure_future(service.execute('Orders'))
+        await asyncio.sleep(0.01)
+        await service.execute('Orders.insert()', {'id': 1})
+        stale = await read
+        return stale, await service.execute('Orders')
+    stale, fresh = asyncio.run(run())
+    assert inner.executed == ['Orders.insert()', 'Orders', 'Orders']
+    assert stale == [{'row': 2}] and fresh == [{'row': 3}]
+
+def test_result_cache_returns_copies_and_caches_none():
+    """Callers can modify the cached results and None results are cached too"""
+    inner = SlowReadService()
+    service = ResultCacheExpressionService(inner, ResultCache())
+    async def run():
+        first = await service.execute('Orders')
+        first.append('changed')
+        second = await service.execute('Orders')
+        second[0]['row'] = 'changed'
+        empty = [await service.execute('Empty') for _ in range(2)]
+        return await service.execute('Orders'), empty
+    third, empty = asyncio.run(run())
+    assert third == [{'row': 1}]
+    assert empty == [None, None]
+    assert inner.executed == ['Orders', 'Empty']
+
+def test_result_cache_bounded_by_bytes():
+    """The least recently used results are evicted above max_bytes"""
+    cache = ResultCache(max_bytes=100)
+    for i in range(5):
+        cache.put(('Orders', str(i), None, None), ['x' * 30], frozenset(['Orders']))
+    assert len(cache) == 2 and cache.bytes <= 100
+    assert cache.get(('Orders', '4', None, None)) == ['x' * 30]
+    assert cache.invalidate(frozenset(['Orders'])) == 2 and cache.bytes == 0
+
+def test_result_cache_bytes_not_measured_without_limit():
+    """Without max_bytes the stats do not report a size that was never measured"""
+    cache = ResultCache()
+    cache.put(('Orders', None, None, None), [{'row': 1}], frozenset(['Orders']))
+    stats = cache.stats()
+    assert stats['size'] == 1 and stats['bytes'] is None
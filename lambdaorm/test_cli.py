@@ -0,0 +1,97 @@
+"""Tests for the CLI backend"""
+import asyncio
+import os
+import time
+import pytest
+from lambdaorm.domain import MethodOptions, QueryOptions
+from lambdaorm.infrastructure import Orm
+from lambdaorm.process import CliError
+
+def test_worker_serves_calls_from_one_process(fake_cli):
+    """Sequential and concurrent calls are answered by a single worker process"""
+    async def run():
+        orm = Orm(fake_cli, cli_worker=True)
+        first = await orm.execute('Orders', {'id': 1}, QueryOptions(stage='default'))
+        others = await asyncio.gather(*[orm.execute(f"Orders.page({i},10)") for i in range(5)])
+        reader = orm._orm.worker._reader  # pylint: disable=protected-access
+        assert reader is not None and not reader.done()
+        await orm.close()
+        # the task reading the output of the worker is awaited by close
+        assert reader.done() and asyncio.all_tasks() == {asyncio.current_task()}
+        return first, others
+    first, others = asyncio.run(run())
+    assert first['command'] == 'execute' and first['data'] == {'id': 1}
+    assert first['options'] == {'stage': 'default'}
+    assert [other['expression'] for other in others] == [f"Orders.page({i},10)" for i in range(5)]
+    assert {other['pid'] for other in others} == {first['pid']}
+
+def test_worker_restarted_after_crash(fake_cli):
+    """A crash fails the call in flight and the next call starts a new worker"""
+    async def run():
+        orm = Orm(fake_cli, cli_worker=True)
+        before = await orm.execute('Orders')
+        with pytest.raises(CliError):
+            await orm.execute('crash')
+        with pytest.raises(CliError, match='invalid expression'):
+            await orm.execute('fail')
+        after = await orm.execute('Orders')
+        await orm.close()
+        return before, after
+    before, after = asyncio.run(run())
+    assert before['pid'] != after['pid']
+
+def test_commands_run_concurrently_up_to_the_pool_size(fake_cli):
+    """Concurrent commands overlap, at most cli_processes at a time"""
+    async def run(processes):
+        orm = Orm(fake_cli, cli_processes=processes)
+        start = time.perf_counter()
+        results = await asyncio.gather(*[orm.execute('slow') for _ in range(4)])
+        return results, time.perf_counter() - start
+    results, parallel = asyncio.run(run(4))
+    _, bounded = asyncio.run(run(2))
+    assert len({result['pid'] for result in results}) == 4
+    # every command sleeps 0.3 seconds, with 2 processes they run in two rounds
+    assert bounded >= 0.6
+    assert parallel < bounded - 0.15
+
+def test_command_killed_on_timeout(fake_cli):
+    """A command running longer than MethodOptions.timeout is killed"""
+    async def run():
+        orm = Orm(fake_cli)
+        start = time.perf_counter()
+        with pytest.raises(asyncio.TimeoutError):
+            await orm.execute('slow', method_options=MethodOptions(timeout=0.05))
+        return time.perf_counter() - start
+    assert asyncio.run(run()) < 0.3
+
+def test_stream_killed_on_timeout(fake_cli):
+    """A streamed command running longer than MethodOptions.timeout is killed"""
+    async def run():
+        orm = Orm(fake_cli)
+        start = time.perf_counter()
+        with pytest.raises(asyncio.TimeoutError):
+            async for _ in orm.execute_stream('slow', method_options=MethodOptions(timeout=0.05)):
+                pass
+        elapsed = time.perf_counter() - start
+        rows = [row async for row in orm.execute_stream('Orders', method_options=MethodOptions(timeout=5))]
+        return elapsed, rows
+    elapsed, rows = asyncio.run(run())
+    assert elapsed < 0.3
+    assert rows[0]['command'] == 'execute'
+
+def test_arguments_passed_without_shell(fake_cli):
+    """Expressions and data reach the CLI unchanged, data encoded as JSON"""
+    expression = 'Orders.filter(p => p.name == "a b" && p.note != \'$(x); `y`\')'
+    data = {'name': "O'Brien \"Jr\"", 'ids': [1, 2]}
+    result = asyncio.run(Orm(fake_cli).execute(expression, data, QueryOptions(stage='default')))
+    assert result['argv'][result['argv'].index('-q') + 1] == expression
+    assert result['data'] == data
+    assert result['argv'][-2:] == ['-s', 'default']
+
+def test_large_data_sent_through_a_temporary_file(fake_cli):
+    """Data above the inline limit is written to a file removed after the command"""
+    rows = [{'id': i, 'name': 'x' * 100} for i in range(5000)]
+    result = asyncio.run(Orm(fake_cli).execute('Orders.bulkInsert()', rows))
+    path = result['argv'][result['argv'].index('-d') + 1]
+    assert result['data'] == rows
+    assert not os.path.exists(path)
@@ -0,0 +1,59 @@
+"""Tests for the compiled decoders and encoders"""
+import json
+import pickle
+from lambdaorm.domain import (Metadata, MetadataParameter, QueryOptions, QueryPlan, Relation, RelationType, Schema,
+SchemaConfig, SchemaConfigEntity)
+from lambdaorm.codec import json_key
+
+def test_json_key():
+    """Attributes are read from their camelCase key"""
+    assert json_key('property_type') == 'propertyType'
+    assert json_key('primaryKey') == 'primaryKey'
+    assert json_key('from_') == 'from'
+
+def test_decode_nested_models():
+    """Nested models, enums and recursive lists are decoded"""
+    metadata = Metadata.from_dict({
+        'classtype': 'Sentence', 'pos': {'ln': 1, 'col': 4}, 'entity': 'Orders',
+        'relation': {'name': 'customer', 'type': 'manyToOne', 'from': 'customerId'},
+        'children': [{'name': 'filter', 'columns': [{'name': 'id', 'propertyType': 'integer'}]}]
+    })
+    assert metadata.pos.col == 4
+    assert metadata.relation.type is RelationType.manyToOne
+    assert metadata.relation.from_ == 'customerId'
+    assert metadata.children[0].columns[0].property_type == 'integer'
+    assert metadata.children[0].children is None
+    assert isinstance(metadata.relation, Relation)
+
+def test_decode_lists_and_schema():
+    """A list of dictionaries is decoded as a list of instances"""
+    parameters = MetadataParameter.from_dict([{'name': 'id', 'type': 'integer'}, {'name': 'name'}])
+    assert [parameter.name for parameter in parameters] == ['id', 'name']
+    schema = Schema.from_dict({'domain': {'entities': [{'name': 'Orders', 'primaryKey': ['id']}]},
+                               'application': {'start': [{'name': 'sync', 'expression': 'Orders'}]}})
+    assert schema.domain.entities[0].primaryKey == ['id']
+    assert schema.application.start[0].expression == 'Orders'
+
+def test_tree_models_are_slotted():
+    """Metadata and QueryPlan nodes have no instance dictionary and still pickle"""
+    plan = QueryPlan.from_dict({'entity': 'Orders', 'children': [{'entity': 'Details'}]})
+    assert not hasattr(plan, '__dict__')
+    assert not hasattr(Metadata.from_dict({'name': 'Orders'}), '__dict__')
+    assert pickle.loads(pickle.dumps(plan)) == plan
+
+def test_encode_round_trip():
+    """to_dict writes camelCase keys, skips None attributes and reads back to an equal instance"""
+    data = {'classtype': 'Sentence', 'entity': 'Orders',
+            'relation': {'name': 'customer', 'type': 'manyToOne', 'from': 'customerId'},
+            'children': [{'name': 'filter', 'columns': [{'name': 'id', 'propertyType': 'integer'}]}]}
+    metadata = Metadata.from_dict(data)
+    assert metadata.to_dict() == data
+    assert Metadata.from_dict(metadata.to_dict()) == metadata
+    assert QueryOptions(stage='default', chunk_size=10).to_dict() == {'stage': 'default', 'chunkSize': 10}
+
+def test_encode_shares_plain_values():
+    """Lists of plain values are not copied"""
+    rows = [{'id': 1}, {'id': 2}]
+    config = SchemaConfig(entities=[SchemaConfigEntity(entity='Orders', rows=rows)])
+    assert config.to_dict()['entities'][0]['rows'] is rows
+    assert json.loads(config.to_json()) == {'entities': [{'entity': 'Orders', 'rows': rows}]}
@@ -0,0 +1,100 @@
+"""Tests for the compression of the REST bodies"""
+import asyncio
+import gzip
+import json
+import zlib
+import pytest
+from lambdaorm.compression import Compression, decoder
+from lambdaorm.domain import MethodOptions, QueryOptions
+from lambdaorm.infrastructure import Orm
+from lambdaorm.metrics import Metrics
+from lambdaorm.stub import StubServer, stub_routes
+from lambdaorm.sync import SyncOrm
+
+ROWS = [{'id': i, 'name': f"Product {i}"} for i in range(200)]
+
+@pytest.mark.parametrize('encoding,compress', [
+    ('gzip', gzip.compress),
+    ('deflate', zlib.compress),
+    ('deflate', lambda content: zlib.compress(content)[2:-4]),
+])
+def test_decoder_decodes_in_parts(encoding, compress):
+    """gzip, zlib wrapped and raw deflate bodies are decoded as they arrive"""
+    content = json.dumps(ROWS).encode()
+    encoded = compress(content)
+    body_decoder = decoder(encoding)
+    decoded = b''.join(body_decoder.feed(encoded[i:i + 100]) for i in range(0, len(encoded), 100))
+    assert decoded + body_decoder.feed(b'', True) == content
+    assert decoder('identity') is None and decoder(None) is None
+
+def test_responses_requested_and_decoded():
+    """The client accepts gzip and deflate and decodes the compressed schema and streamed rows"""
+    server = StubServer(routes=stub_routes(entities=20), compress=True)
+    content = json.dumps(ROWS).encode()
+    server.chunked['/execute'] = [content[i:i + 500] for i in range(0, len(content), 500)]
+    async def run():
+        orm = Orm(await server.start())
+        schema = await orm.get_schema.schema()
+        rows = [row async for row in orm.execute_stream('Products', options=QueryOptions(stage='default'))]
+        await orm.close()
+        await server.stop()
+        return schema, rows
+    schema, rows = asyncio.run(run())
+    assert len(schema.domain.entities) == 20
+    assert rows == ROWS
+    assert all(headers['accept-encoding'] == 'gzip, deflate' for headers in server.headers)
+
+def test_metrics_count_bytes_on_the_wire():
+    """The received bytes are those of the compressed responses, buffered and streamed"""
+    metrics = Metrics()
+    content = json.dumps(ROWS).encode()
+    server = StubServer(routes={'/schema': stub_routes(entities=20)['/schema']}, compress=True)
+    server.chunked['/execute'] = [content[i:i + 500] for i in range(0, len(content), 500)]
+    async def run():
+        orm = Orm(await server.start(), metrics=metrics)
+        await orm.get_schema.schema()
+        rows = [row async for row in orm.execute_stream('Products')]
+        await orm.close()
+        await server.stop()
+        return rows
+    assert asyncio.run(run()) == ROWS
+    received = {sample['labels']['endpoint']: sample['sum']
+                for sample in metrics.snapshot()['lambdaorm_response_received_bytes']}
+    assert received['/schema'] * 4 < len(json.dumps(stub_routes(entities=20)['/schema']))
+    assert received['/execute'] * 4 < len(content)
+
+def test_large_request_bodies_compressed(stub_server):
+    """Bodies above the threshold are gzipped, the small ones and those of level 0 calls are not"""
+    async def run():
+        orm = Orm(await stub_server.start(), compression=Compression(level=6, threshold=1024))
+        await orm.execute('Products.bulkInsert()', ROWS)
+        await orm.execute('Products.filter(p => p.id == id)', {'id': 1})
+        await orm.execute('Products.bulkInsert()', ROWS, method_options=MethodOptions(compression_level=0))
+        await orm.close()
+        await stub_server.stop()
+    asyncio.run(run())
+    assert [headers.get('content-encoding') for headers in stub_server.headers] == ['gzip', None, None]
+    assert int(stub_server.headers[0]['content-length']) * 4 < int(stub_server.headers[2]['content-length'])
+    assert stub_server.requests[0][1]['data'] == ROWS
+
+def test_request_compression_per_call(stub_server):
+    """MethodOptions compresses the body of a call of a client without compression"""
+    async def run():
+        orm = Orm(await stub_server.start())
+        await orm.execute('Products.bulkInsert()', ROWS, method_options=MethodOptions(compression_level=1, compression_threshold=1024))
+        await orm.execute('Products.bulkInsert()', ROWS)
+        await orm.close()
+        await stub_server.stop()
+    asyncio.run(run())
+    assert [headers.get('content-encoding') for headers in stub_server.headers] == ['gzip', None]
+
+def test_sync_client_compresses_requests(stub_server):
+    """The synchronous client gzips the bodies above the threshold"""
+    async def run():
+        url = await stub_server.start()
+        with SyncOrm(url, compression=Compression(threshold=1024)) as orm:
+            await asyncio.to_thread(orm.execute, 'Products.bulkInsert()', ROWS)
+        await stub_server.stop()
+    asyncio.run(run())
+    assert stub_server.headers[0]['content-encoding'] == 'gzip'
+    assert stub_server.requests[0][1]['data'] == ROWS
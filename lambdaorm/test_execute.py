@@ -1,5 +1,101 @@
 """Test module for lambdaorm"""
+import asyncio
+import json
+import os
+from lambdaorm.domain import MethodOptions, QueryOptions
+from lambdaorm.infrastructure import ChunkHelper, Orm, PageHelper
+from lambdaorm.transport import JsonArrayParser
 
 def test_suma():
     """Test the sum of two numbers"""
     assert 1 + 1 == 2
+
+def test_execute_many_chunks_by_chunk_size(stub_server):
+    """Rows are sent in chunks of QueryOptions.chunkSize"""
+    async def run():
+        orm = Orm(await stub_server.start())
+        rows = [{'id': i} for i in range(25)]
+        results = await orm.execute_many('Orders.bulkInsert()', rows, QueryOptions(stage='default', chunk_size=10))
+        await orm.close()
+        await stub_server.stop()
+        return results
+    results = asyncio.run(run())
+    assert [(result.index, result.offset, result.size) for result in results] == [(0, 0, 10), (1, 10, 10), (2, 20, 5)]
+    assert all(result.error is None for result in results)
+    sent = [body['data'] for path, body in stub_server.requests if path == '/execute']
+    assert sorted(len(data) for data in sent) == [5, 10, 10]
+    assert all(body['options']['chunkSize'] == 10 for _, body in stub_server.requests)
+
+def test_execute_many_reports_chunk_errors():
+    """A failing chunk is reported without cancelling the others"""
+    async def execute(data):
+        if data[0]['id'] == 2:
+            raise ValueError('duplicate key')
+        return len(data)
+    rows = [{'id': i} for i in range(5)]
+    results = asyncio.run(ChunkHelper().execute_many(execute, rows, method_options=MethodOptions(chunk=2, concurrency=1)))
+    assert [result.result for result in results] == [2, None, 1]
+    assert isinstance(results[1].error, ValueError)
+
+def test_json_array_parser_split_anywhere():
+    """Items are parsed whatever the chunk boundaries are"""
+    rows = [{'id': i, 'name': f'row "{i}"', 'price': i * 1.5} for i in range(20)]
+    content = json.dumps(rows).encode()
+    for size in (1, 3, 7, 64):
+        parser = JsonArrayParser()
+        parsed = []
+        for start in range(0, len(content), size):
+            parsed.extend(parser.feed(content[start:start + size]))
+        parsed.extend(parser.feed(b'', True))
+        assert parsed == rows
+    for chunks, items in [([b'[1.', b'5]'], [1.5]), ([b'[2', b'e3, -', b'0.25E', b'-1]'], [2e3, -0.025]),
+                          ([b'[1.5', b'\n,7', b']'], [1.5, 7])]:
+        parser = JsonArrayParser()
+        assert [item for chunk in chunks for item in parser.feed(chunk)] + parser.feed(b'', True) == items
+
+def test_execute_stream_yields_batches(stub_server):
+    """Rows of a chunked response are yielded in batches as they arrive"""
+    content = json.dumps([{'id': i} for i in range(10)]).encode()
+    stub_server.chunked['/execute'] = [content[i:i + 5] for i in range(0, len(content), 5)]
+    async def run():
+        orm = Orm(await stub_server.start())
+        batches = [batch async for batch in orm.execute_stream('Orders', options=QueryOptions(stage='default'), batch_size=4)]
+        await orm.close()
+        await stub_server.stop()
+        return batches
+    batches = asyncio.run(run())
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    assert batches[2] == [{'id': 8}, {'id': 9}]
+
+def test_execute_stream_from_cli(tmp_path, monkeypatch):
+    """The CLI backend streams the rows printed by the lambdaorm command"""
+    script = tmp_path / 'lambdaorm'
+    script.write_text('#!/bin/sh\necho \'[{"id": 1},\'\necho \'{"id": 2}]\'\n')
+    script.chmod(0o755)
+    monkeypatch.setenv('PATH', f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    async def run():
+        orm = Orm(str(tmp_path))
+        return [row async for row in orm.execute_stream('Orders')]
+    assert asyncio.run(run()) == [{'id': 1}, {'id': 2}]
+
+def test_page_clause_rewritten():
+    """The top level page clause is replaced and nested ones are kept"""
+    helper = PageHelper()
+    assert helper.rewrite('Orders.filter(p=>p.id>1)', 2, 50) == 'Orders.filter(p=>p.id>1).page(2,50)'
+    assert helper.rewrite('Orders.order(p=>p.id).page(1,1)', 3, 10) == 'Orders.order(p=>p.id).page(3,10)'
+    assert (helper.rewrite("Orders.include(p=>p.details.page(1,5)).filter(p=>p.name=='.page(')", 1, 10)
+            == "Orders.include(p=>p.details.page(1,5)).filter(p=>p.name=='.page(').page(1,10)")
+
+def test_execute_pages_prefetches_until_short_page():
+    """Pages are requested ahead of the consumer and the scan stops on a short page"""
+    requested = []
+    async def execute(expression):
+        requested.append(expression)
+        page = int(expression.split('.page(')[1].split(',')[0])
+        await asyncio.sleep(0.01)
+        return [{'id': i} for i in range(3 if page < 3 else 1)]
+    async def run():
+        return [page async for page in PageHelper().pages(execute, 'Orders', page_size=3, prefetch=2)]
+    pages = asyncio.run(run())
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert requested[:3] == ['Orders.page(1,3)', 'Orders.page(2,3)', 'Orders.page(3,3)']
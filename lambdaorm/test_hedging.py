@@ -0,0 +1,112 @@
+"""Tests for the hedged reads"""
+import asyncio
+import time
+import pytest
+from lambdaorm.balancer import LoadBalancer
+from lambdaorm.hedging import HedgePolicy
+from lambdaorm.infrastructure import Orm
+from lambdaorm.stub import StubServer
+from lambdaorm.transport import HttpError
+
+def primed(latency=0.01, **kwargs):
+    policy = HedgePolicy(min_samples=5, **kwargs)
+    for _ in range(5):
+        policy.observe('execute', latency)
+    return policy
+
+def test_slow_call_hedged_and_loser_cancelled():
+    """A call slower than the percentile is sent again, the first answer wins and the other is cancelled"""
+    policy = primed(budget=1)
+    delays = [0.5, 0.01]
+    cancelled = []
+    async def send():
+        delay = delays.pop(0)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(delay)
+            raise
+        return delay
+    async def run():
+        start = time.perf_counter()
+        result = await policy.call('execute', send)
+        return result, time.perf_counter() - start
+    result, elapsed = asyncio.run(run())
+    assert result == 0.01 and elapsed < 0.2
+    assert cancelled == [0.5]
+    assert policy.stats['hedged'] == 1 and policy.stats['won'] == 1
+
+def test_hedge_failure_waits_for_primary():
+    """A failed hedge does not fail the call while the first one can still answer"""
+    policy = primed(budget=1)
+    async def run():
+        calls = []
+        async def send():
+            calls.append(None)
+            if len(calls) == 2:
+                raise ConnectionError()
+            await asyncio.sleep(0.05)
+            return 'primary'
+        return await policy.call('execute', send)
+    assert asyncio.run(run()) == 'primary'
+    assert policy.stats['won'] == 0
+
+def test_budget_limits_hedges():
+    """The hedges stay within the budget and no call is hedged before enough samples"""
+    policy = primed(latency=0.001, min_delay=0.001, budget=0.1, max_tokens=1)
+    unprimed = HedgePolicy()
+    async def send():
+        await asyncio.sleep(0.005)
+    async def run():
+        for _ in range(50):
+            await policy.call('execute', send)
+            await unprimed.call('plan', send)
+    asyncio.run(run())
+    assert 1 <= policy.stats['hedged'] <= 5
+    assert policy.stats['denied'] > 0
+    assert unprimed.stats['hedged'] == 0 and unprimed.stats['denied'] == 0
+
+def test_hedge_reaches_other_replica():
+    """Reads to a slow replica are answered by the hedge sent to the fast one, writes are not hedged"""
+    fast, slow = StubServer(), StubServer(delay=0.3)
+    policy = primed(budget=1)
+    async def run():
+        orm = Orm([await fast.start(), await slow.start()], load_balancer=LoadBalancer(strategy='least'),
+                  hedge_policy=policy)
+        start = time.perf_counter()
+        for _ in range(10):
+            await orm.execute('Orders')
+        elapsed = time.perf_counter() - start
+        await orm.execute('Orders.insert()')
+        await orm.close()
+        await fast.stop()
+        await slow.stop()
+        return elapsed
+    elapsed = asyncio.run(run())
+    assert elapsed < 1
+    assert policy.stats['won'] == len([body for _, body in slow.requests if body['expression'] == 'Orders'])
+    assert policy.stats['calls'] == 10
+    assert len(fast.requests) + len(slow.requests) == 11 + policy.stats['hedged']
+
+def test_cancelled_hedge_keeps_replica_failures():
+    """A call cancelled because the other one answered first leaves the failures of its replica as they were"""
+    fast, slow = StubServer(), StubServer(delay=0.3)
+    slow.statuses['/execute'] = [503]
+    policy = primed(budget=1)
+    balancer = LoadBalancer(strategy='least', failure_threshold=3)
+    async def run():
+        fast_url = await fast.start()
+        orm = Orm([await slow.start()], load_balancer=balancer, hedge_policy=policy)
+        with pytest.raises(HttpError):
+            await orm.execute('Orders.insert()')
+        read = asyncio.ensure_future(orm.execute('Orders'))
+        # the read goes to the slow replica, its hedge to the fast one added meanwhile
+        await asyncio.sleep(0.002)
+        balancer.add(fast_url)
+        await read
+        await orm.close()
+        await fast.stop()
+        await slow.stop()
+    asyncio.run(run())
+    assert policy.stats['won'] == 1
+    assert [node['failures'] for node in balancer.stats['nodes']] == [1, 0]
@@ -0,0 +1,40 @@
+"""Tests for the cold start of the package"""
+import json
+import subprocess
+import sys
+
+PROGRAM = """
+import json, sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'elapsed': elapsed, 'modules': sorted(sys.modules)}}))
+"""
+
+def run(statement):
+    """Runs the statement in a fresh interpreter"""
+    return json.loads(subprocess.check_output([sys.executable, '-c', PROGRAM.format(statement=statement)]))
+
+def test_async_client_import_is_lazy():
+    """Importing Orm loads neither requests nor dataclasses_json"""
+    result = run('from lambdaorm import Orm')
+    assert 'requests' not in result['modules']
+    assert 'dataclasses_json' not in result['modules']
+    # generous budget, benchmarks.bench_import measures it precisely
+    assert result['elapsed'] < 1.0
+
+def test_sync_client_import_skips_asyncio():
+    """Importing SyncOrm does not load asyncio"""
+    result = run('from lambdaorm import SyncOrm')
+    assert 'asyncio' not in result['modules']
+    assert 'lambdaorm.infrastructure' not in result['modules']
+
+def test_domain_classes_are_dataclasses_at_import():
+    """The domain classes are dataclasses before any of them is used"""
+    run('import dataclasses\n'
+        'from lambdaorm.domain import Entity, MethodOptions, QueryOptions\n'
+        'assert dataclasses.is_dataclass(Entity)\n'
+        'options = dataclasses.replace(QueryOptions(stage="a", chunk_size=5), view="v")\n'
+        'assert (options.stage, options.view, options.chunkSize) == ("a", "v", 5)\n'
+        'assert dataclasses.asdict(MethodOptions(retry_writes=True))["retryWrites"] is True\n'
+        'assert Entity(name="a") == Entity(name="a")')
@@ -0,0 +1,99 @@
+"""Tests for the transport interceptors"""
+import asyncio
+import pytest
+from lambdaorm.application import Interceptor
+from lambdaorm.domain import QueryOptions
+from lambdaorm.infrastructure import Orm
+
+class Recorder(Interceptor):
+    """Records the calls it sees in a shared log"""
+    def __init__(self, name, log):
+        self.name = name
+        self.log = log
+
+    async def intercept(self, request, call_next):
+        self.log.append((self.name, 'request', request.backend, request.method, request.endpoint))
+        try:
+            response = await call_next(request)
+        except Exception as error:
+            self.log.append((self.name, 'error', type(error).__name__))
+            raise
+        self.log.append((self.name, 'response'))
+        return response
+
+class Headers(Interceptor):
+    """Adds headers to every request"""
+    def __init__(self, headers):
+        self.headers = headers
+
+    async def intercept(self, request, call_next):
+        request.headers.update(self.headers)
+        return await call_next(request)
+
+def test_chain_order_and_headers(stub_server):
+    """Interceptors run in order around every service of the client and can add headers"""
+    log = []
+    async def run():
+        orm = Orm(await stub_server.start(), interceptors=[Recorder('outer', log), Headers({'Authorization': 'Bearer x'}),
+                                                           Recorder('inner', log)])
+        await orm.execute('Orders', {'id': 1}, QueryOptions(stage='default'))
+        await orm.get_schema.entity('Orders')
+        await orm.close()
+        await stub_server.stop()
+    asyncio.run(run())
+    assert log == [('outer', 'request', 'rest', 'POST', '/execute'), ('inner', 'request', 'rest', 'POST', '/execute'),
+                   ('inner', 'response'), ('outer', 'response'),
+                   ('outer', 'request', 'rest', 'GET', '/entities/Orders'), ('inner', 'request', 'rest', 'GET', '/entities/Orders'),
+                   ('inner', 'response'), ('outer', 'response')]
+    assert all(headers['authorization'] == 'Bearer x' for headers in stub_server.headers)
+    assert stub_server.requests[0][1]['data'] == {'id': 1}
+
+def test_interceptor_answers_without_sending(stub_server):
+    """An interceptor can answer a call without sending it, e.g. a cache"""
+    class Canned(Interceptor):
+        async def intercept(self, request, call_next):
+            if request.endpoint == '/execute':
+                return [{'id': 1}]
+            return await call_next(request)
+    async def run():
+        orm = Orm(await stub_server.start(), interceptors=[Canned()])
+        result = await orm.execute('Orders')
+        await orm.close()
+        await stub_server.stop()
+        return result
+    assert asyncio.run(run()) == [{'id': 1}]
+    assert stub_server.requests == []
+
+def test_interceptor_sees_errors():
+    """A failed call raises through the interceptors"""
+    log = []
+    async def run():
+        orm = Orm('http://127.0.0.1:1', interceptors=[Recorder('only', log)])
+        with pytest.raises(OSError):
+            await orm.execute('Orders')
+    asyncio.run(run())
+    assert log[-1][:2] == ('only', 'error')
+
+def test_streamed_calls_intercepted(stub_server):
+    """Streamed calls pass through the chain, the response is the iterator of the items"""
+    log = []
+    stub_server.chunked['/execute'] = [b'[{"id": 1},', b'{"id": 2}]']
+    async def run():
+        orm = Orm(await stub_server.start(), interceptors=[Recorder('only', log)])
+        rows = [row async for row in orm.execute_stream('Orders')]
+        await orm.close()
+        await stub_server.stop()
+        return rows
+    assert asyncio.run(run()) == [{'id': 1}, {'id': 2}]
+    assert log == [('only', 'request', 'rest', 'POST', '/execute'), ('only', 'response')]
+
+def test_cli_commands_intercepted(fake_cli):
+    """CLI commands pass through the same chain and the interceptors can change their arguments"""
+    log = []
+    class Rewrite(Interceptor):
+        async def intercept(self, request, call_next):
+            request.body.data = {'id': 2}
+            return await call_next(request)
+    result = asyncio.run(Orm(fake_cli, interceptors=[Recorder('outer', log), Rewrite()]).execute('Orders', {'id': 1}))
+    assert result['data'] == {'id': 2}
+    assert log == [('outer', 'request', 'cli', 'exec', 'execute'), ('outer', 'response')]
@@ -0,0 +1,50 @@
+"""Tests for the load generator"""
+import asyncio
+import json
+import subprocess
+import sys
+import pytest
+from lambdaorm.infrastructure import Orm
+from lambdaorm.loadtest import bind, run
+from lambdaorm.stub import StubServer, stub_routes
+
+def test_mix_is_run_for_the_duration():
+    """Every call of the mix is made and reported with its percentiles"""
+    server = StubServer(routes=stub_routes(entities=3))
+    mix = [{'call': 'execute', 'expression': 'Orders', 'options': {'stage': 'default'}, 'weight': 3},
+           {'call': 'schema.entity', 'args': ['Entity1'], 'weight': 1}]
+    async def main():
+        orm = Orm(await server.start())
+        report = await run(orm, mix, concurrency=4, duration=0.3, seed=1)
+        await orm.close()
+        await server.stop()
+        return report
+    report = asyncio.run(main())
+    assert set(report['calls']) == {'execute', 'schema.entity'}
+    assert report['total']['count'] == len(server.requests) and report['total']['errors'] == 0
+    execute = report['calls']['execute']
+    assert execute['p50Ms'] <= execute['p95Ms'] <= execute['p99Ms'] <= execute['maxMs']
+    assert server.requests[0][1]['options'] == {'stage': 'default'}
+
+def test_errors_reported_per_type():
+    """Failed calls are counted by error type and excluded from the latencies"""
+    class Failing:
+        async def execute(self, expression, data=None, options=None):
+            raise TimeoutError()
+    report = asyncio.run(run(Failing(), [{'call': 'execute', 'expression': 'Orders'}], concurrency=2, duration=0.05))
+    execute = report['calls']['execute']
+    assert execute['errorRate'] == 1 and execute['errorTypes'] == {'TimeoutError': execute['count']}
+    assert 'p50Ms' not in execute
+
+def test_unknown_call_rejected():
+    """A mix entry naming an unknown call is rejected"""
+    with pytest.raises(ValueError):
+        bind(Orm('http://127.0.0.1:1'), {'call': 'drop'})
+
+def test_command_line_with_stub(tmp_path):
+    """python -m lambdaorm.loadtest --stub runs offline and writes the report"""
+    output = tmp_path / 'report.json'
+    subprocess.run([sys.executable, '-m', 'lambdaorm.loadtest', '--stub', '--duration', '0.3', '--concurrency', '2',
+                    '--output', str(output)], check=True, capture_output=True, timeout=30)
+    report = json.loads(output.read_text())
+    assert report['target'] == 'stub' and report['total']['count'] > 0 and report['total']['errors'] == 0
@@ -0,0 +1,84 @@
+"""Tests for the client instrumentation"""
+import asyncio
+import json
+import pytest
+from lambdaorm import codec
+from lambdaorm.domain import QueryOptions
+from lambdaorm.infrastructure import Orm
+from lambdaorm.metrics import Metrics, endpoint_label
+
+def test_endpoint_label_replaces_names():
+    """Names in REST paths are replaced so that the endpoint label is bounded"""
+    assert endpoint_label('/execute') == '/execute'
+    assert endpoint_label('/entities/Orders') == '/entities/{name}'
+    assert endpoint_label('/stages/default/export') == '/stages/{name}/export'
+    assert endpoint_label('/schema/version') == '/schema/version'
+
+def test_rest_calls_recorded(stub_server):
+    """Latency, sizes, decode times and in-flight gauges are recorded per endpoint"""
+    metrics = Metrics()
+    async def run():
+        orm = Orm(await stub_server.start(), metrics=metrics)
+        await orm.plan('Orders', QueryOptions(stage='default'))
+        await asyncio.gather(*[orm.get_schema.entity(name) for name in ('Orders', 'Customers')])
+        await orm.close()
+        await stub_server.stop()
+    asyncio.run(run())
+    snapshot = metrics.snapshot()
+    latency = {sample['labels']['endpoint']: sample for sample in snapshot['lambdaorm_request_seconds']}
+    assert latency['/plan']['count'] == 1 and latency['/entities/{name}']['count'] == 2
+    assert latency['/plan']['buckets'][-1] == [float('inf'), 1]
+    assert all(sample['value'] == 0 for sample in snapshot['lambdaorm_requests_in_flight'])
+    models = {sample['labels']['model'] for sample in snapshot['lambdaorm_model_decode_seconds']}
+    assert {'QueryPlan', 'Entity'} <= models
+    text = metrics.prometheus()
+    assert '# TYPE lambdaorm_request_seconds histogram' in text
+    assert 'lambdaorm_request_seconds_count{backend="rest",method="POST",endpoint="/plan"} 1' in text
+    assert 'lambdaorm_request_sent_bytes_bucket{backend="rest",method="GET",endpoint="/entities/{name}",le="256.0"} 2' in text
+
+def test_errors_counted():
+    """A failed call is counted as an error and leaves the in-flight gauge at zero"""
+    metrics = Metrics()
+    async def run():
+        orm = Orm('http://127.0.0.1:1', metrics=metrics)
+        with pytest.raises(OSError):
+            await orm.execute('Orders')
+    asyncio.run(run())
+    snapshot = metrics.snapshot()
+    [error] = snapshot['lambdaorm_request_errors_total']
+    assert error['labels']['endpoint'] == '/execute' and error['value'] == 1
+    assert snapshot['lambdaorm_requests_in_flight'][0]['value'] == 0
+
+def test_cli_commands_recorded(fake_cli):
+    """CLI commands are recorded with the command as endpoint"""
+    metrics = Metrics()
+    asyncio.run(Orm(fake_cli, metrics=metrics).execute('Orders', {'id': 1}))
+    [sample] = metrics.snapshot()['lambdaorm_request_seconds']
+    assert sample['labels'] == {'backend': 'cli', 'method': 'exec', 'endpoint': 'execute'}
+
+def test_cli_sent_bytes_of_spilled_data(fake_cli):
+    """Data written to a temporary file is measured by its JSON length, not by that of the path"""
+    metrics = Metrics()
+    data = {'rows': ['x' * 100] * 500}
+    asyncio.run(Orm(fake_cli, metrics=metrics).execute('Orders', data))
+    [sample] = metrics.snapshot()['lambdaorm_request_sent_bytes']
+    assert sample['sum'] == len(json.dumps(data))
+
+def test_decode_times_recorded_per_client(stub_server):
+    """The models decoded by a client are recorded in its own metrics only"""
+    first, second = Metrics(), Metrics()
+    async def run():
+        url = await stub_server.start()
+        measured, other, plain = Orm(url, metrics=first), Orm(url, metrics=second), Orm(url)
+        await measured.plan('Orders', QueryOptions(stage='default'))
+        await other.get_schema.entity('Orders')
+        await plain.get_schema.entity('Customers')
+        for orm in (measured, other, plain):
+            await orm.close()
+        await stub_server.stop()
+    asyncio.run(run())
+    def decoded(metrics):
+        return {sample['labels']['model']: sample['count'] for sample in metrics.snapshot()['lambdaorm_model_decode_seconds']}
+    assert decoded(first) == {'QueryPlan': 1}
+    assert decoded(second) == {'Entity': 1}
+    assert codec._metrics.get() is None
@@ -0,0 +1,122 @@
+"""Tests for the retries and the circuit breaker of the REST client"""
+import asyncio
+import time
+import pytest
+import requests
+from lambdaorm.domain import MethodOptions, QueryOptions
+from lambdaorm.infrastructure import Orm
+from lambdaorm.metrics import Metrics
+from lambdaorm.resilience import CircuitBreaker, CircuitOpenError, RetryPolicy
+from lambdaorm.sync import SyncOrm
+from lambdaorm.transport import HttpError
+
+FAST = RetryPolicy(retries=2, backoff=0.001)
+
+def test_reads_retried_after_server_errors(stub_server):
+    """Idempotent calls are retried after 5xx and the retries are counted"""
+    metrics = Metrics()
+    stub_server.statuses['/plan'] = [503, 500]
+    stub_server.routes['/plan'] = {'entity': 'Orders'}
+    async def run():
+        orm = Orm(await stub_server.start(), retry_policy=FAST, metrics=metrics)
+        plan = await orm.plan('Orders', QueryOptions(stage='default'))
+        await orm.close()
+        await stub_server.stop()
+        return plan
+    assert asyncio.run(run()).entity == 'Orders'
+    assert len(stub_server.requests) == 3
+    [retries] = metrics.snapshot()['lambdaorm_request_retries_total']
+    assert retries['value'] == 2 and retries['labels']['endpoint'] == '/plan'
+
+def test_writes_not_retried_by_default(stub_server):
+    """A write is sent once unless its options allow retrying writes"""
+    stub_server.statuses['/execute'] = [503, 503]
+    async def run():
+        orm = Orm(await stub_server.start(), retry_policy=FAST)
+        with pytest.raises(HttpError) as error:
+            await orm.execute('Orders.insert()', {'id': 1})
+        first = len(stub_server.requests)
+        result = await orm.execute('Orders.insert()', {'id': 1}, method_options=MethodOptions(retry_writes=True))
+        await orm.close()
+        await stub_server.stop()
+        return error.value.status, first, result
+    status, first, result = asyncio.run(run())
+    assert status == 503 and first == 1
+    assert result == {'requests': 3}
+
+def test_method_options_enable_retries(stub_server):
+    """Retries can be enabled per call and client errors are not retried"""
+    stub_server.statuses['/execute'] = [502, 400]
+    async def run():
+        orm = Orm(await stub_server.start())
+        with pytest.raises(HttpError) as error:
+            await orm.execute('Orders', method_options=MethodOptions(retries=3, backoff=0.001))
+        await orm.close()
+        await stub_server.stop()
+        return error.value.status
+    assert asyncio.run(run()) == 400
+    assert len(stub_server.requests) == 2
+
+def test_deadline_bounds_retries():
+    """No retry starts after the deadline"""
+    async def run():
+        orm = Orm('http://127.0.0.1:1', retry_policy=RetryPolicy(retries=100, backoff=0.02, deadline=0.2))
+        start = time.perf_counter()
+        with pytest.raises(ConnectionError):
+            await orm.execute('Orders')
+        return time.perf_counter() - start
+    assert asyncio.run(run()) < 0.5
+
+def test_deadline_applies_without_retries(stub_server):
+    """The deadline of a call cuts its timeout when it is not retried"""
+    stub_server.delay = 0.5
+    async def run():
+        orm = Orm(await stub_server.start())
+        start = time.perf_counter()
+        with pytest.raises(asyncio.TimeoutError):
+            await orm.execute('Orders', method_options=MethodOptions(timeout=5, deadline=0.1))
+        elapsed = time.perf_counter() - start
+        await orm.close()
+        await stub_server.stop()
+        return elapsed
+    assert asyncio.run(run()) < 0.4
+
+def test_sync_client_raises_on_error_status(stub_server):
+    """The synchronous client fails on a status that is not 2xx like the asynchronous one"""
+    stub_server.statuses['/plan'] = [503]
+    async def run():
+        url = await stub_server.start()
+        with SyncOrm(url) as orm:
+            with pytest.raises(requests.HTTPError):
+                await asyncio.to_thread(orm.plan, 'Orders', QueryOptions(stage='default'))
+        await stub_server.stop()
+    asyncio.run(run())
+
+def test_circuit_opens_and_recovers(stub_server):
+    """An endpoint that keeps failing is rejected without calls until a probe succeeds"""
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.1)
+    stub_server.statuses['/entities'] = [503, 503, 503]
+    async def run():
+        orm = Orm(await stub_server.start(), circuit_breaker=breaker)
+        for _ in range(2):
+            with pytest.raises(HttpError):
+                await orm.get_schema.entities()
+        with pytest.raises(CircuitOpenError):
+            await orm.get_schema.entities()
+        sent = len(stub_server.requests)
+        open_stats = breaker.stats
+        await asyncio.sleep(0.15)
+        with pytest.raises(HttpError):
+            await orm.get_schema.entities()
+        with pytest.raises(CircuitOpenError):
+            await orm.get_schema.entities()
+        await asyncio.sleep(0.15)
+        await orm.get_schema.entities()
+        await orm.get_schema.entities()
+        await orm.close()
+        await stub_server.stop()
+        return sent, open_stats
+    sent, open_stats = asyncio.run(run())
+    assert sent == 2
+    assert open_stats == {'open': ['/entities'], 'opened': 1, 'rejected': 1}
+    assert breaker.stats['open'] == [] and len(stub_server.requests) == 5
@@ -0,0 +1,36 @@
+"""Tests for the offline stub service"""
+import asyncio
+from lambdaorm.domain import QueryOptions
+from lambdaorm.infrastructure import Orm
+from lambdaorm.stub import StubServer, stub_routes
+
+def test_stub_routes_answer_every_read():
+    """The synthetic payloads decode into the domain classes of every read call"""
+    server = StubServer(routes=stub_routes(entities=3, rows=5))
+    async def run():
+        orm = Orm(await server.start())
+        schema = orm.get_schema
+        results = {
+            'execute': await orm.execute('Orders'),
+            'plan': await orm.plan('Orders', QueryOptions(stage='default')),
+            'metadata': await orm.metadata('Orders'),
+            'model': await orm.model('Orders'),
+            'version': await schema.version(),
+            'schema': await schema.schema(),
+            'entities': await schema.entities(),
+            'entity': await schema.entity('Entity1'),
+            'entityMapping': await schema.entityMapping('default', 'Entity2'),
+            'stage': await schema.stage('default'),
+            'ping': await orm.get_general.ping(),
+        }
+        await orm.close()
+        await server.stop()
+        return results
+    results = asyncio.run(run())
+    assert len(results['execute']) == 5
+    assert results['plan'].entity == 'Orders' and len(results['plan'].children) == 3
+    assert results['metadata'].entity == 'Orders'
+    assert len(results['schema'].domain.entities) == 3 and results['entities'][0].name == 'Entity0'
+    assert results['entity'].name == 'Entity1' and results['entityMapping'].mapping == 'ENTITY2'
+    assert results['stage'].name == 'default' and results['version'].version == '1.0.0'
+    assert results['ping'].message == 'pong'
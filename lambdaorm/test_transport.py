@@ -0,0 +1,138 @@
+"""Tests for the asyncio REST transport"""
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from lambdaorm.domain import MethodOptions
+from lambdaorm.infrastructure import Orm, SyncOrm
+from lambdaorm.transport import AsyncHttpClient
+
+def test_concurrent_calls_overlap(stub_server):
+    """Concurrent calls must not block each other on the event loop"""
+    async def run():
+        server = stub_server
+        server.delay = 0.2
+        orm = Orm(await server.start())
+        start = time.perf_counter()
+        results = await asyncio.gather(*[orm.get_general.metrics() for _ in range(5)])
+        elapsed = time.perf_counter() - start
+        await orm.close()
+        await server.stop()
+        return results, elapsed
+    results, elapsed = asyncio.run(run())
+    assert len(results) == 5
+    assert sorted(result['requests'] for result in results) == [1, 2, 3, 4, 5]
+    assert elapsed < 0.6
+
+def test_connections_are_reused(stub_server):
+    """Sequential calls share a single keep-alive connection"""
+    async def run():
+        server = stub_server
+        orm = Orm(await server.start())
+        for _ in range(3):
+            await orm.get_general.metrics()
+        await orm.close()
+        await server.stop()
+        return server
+    server = asyncio.run(run())
+    assert server.connections == 1
+    assert server.requests == [('/metrics', None)] * 3
+
+def test_wait_for_connection_within_timeout(stub_server):
+    """The wait for a free connection counts against the timeout of the call"""
+    stub_server.delay = 0.2
+    async def run():
+        orm = Orm(await stub_server.start(), max_connections=1)
+        options = MethodOptions(timeout=0.3)
+        results = await asyncio.gather(*[orm.execute('Orders', method_options=options) for _ in range(2)],
+                                       return_exceptions=True)
+        await orm.close()
+        await stub_server.stop()
+        return results
+    results = asyncio.run(run())
+    assert sum(isinstance(result, asyncio.TimeoutError) for result in results) == 1
+    assert stub_server.connections == 1
+
+def test_host_header_without_credentials(stub_server):
+    """The userinfo of the url is not sent in the Host header"""
+    async def run():
+        url = await stub_server.start()
+        orm = Orm(url.replace('http://', 'http://user:secret@'))
+        await orm.get_general.metrics()
+        await orm.close()
+        await stub_server.stop()
+        return url
+    url = asyncio.run(run())
+    assert stub_server.headers[0]['host'] == url[len('http://'):]
+
+async def dropping_server(received):
+    """Server answering the first request of a connection and closing it after reading the second"""
+    async def handle(reader, writer):
+        for answered in (True, False):
+            head = await reader.readuntil(b'\r\n\r\n')
+            lines = head.decode('latin-1').split('\r\n')
+            length = next((int(line.split(':')[1]) for line in lines if line.lower().startswith('content-length')), 0)
+            await reader.readexactly(length)
+            received.append(lines[0].split(' ')[0])
+            if not answered:
+                break
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: 2\r\n\r\n{}')
+            await writer.drain()
+        writer.close()
+    return await asyncio.start_server(handle, '127.0.0.1', 0)
+
+def test_written_write_not_sent_again_on_dropped_connection():
+    """A POST written to a reused connection the server drops is not sent again, a GET is"""
+    received = []
+    async def run():
+        server = await dropping_server(received)
+        url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/"
+        client = AsyncHttpClient()
+        await client.get(url)
+        try:
+            await client.post(url, b'{}')
+            raise AssertionError('the POST should fail')
+        except ConnectionError:
+            pass
+        await client.get(url)
+        response = await client.get(url)
+        await client.close()
+        server.close()
+        await server.wait_closed()
+        return response
+    assert asyncio.run(run()).status == 200
+    assert received == ['GET', 'POST', 'GET', 'GET', 'GET']
+
+class ThreadedStubHandler(BaseHTTPRequestHandler):
+    """Keep-alive handler answering every request with the number of open connections"""
+    protocol_version = 'HTTP/1.1'
+    connections = set()
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Answers a GET request"""
+        ThreadedStubHandler.connections.add(self.client_address)
+        content = json.dumps({'path': self.path}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+def test_sync_orm_shared_across_threads():
+    """SyncOrm can be shared by a thread pool and reuses its pooled connections"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ThreadedStubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with SyncOrm(f"http://127.0.0.1:{server.server_port}", pool_size=4) as orm:
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                results = list(executor.map(lambda _: orm.get_general.metrics(), range(40)))
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert results == [{'path': '/metrics'}] * 40
+    assert len(ThreadedStubHandler.connections) <= 4
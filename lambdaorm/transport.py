@@ -0,0 +1,375 @@
+"""Asyncio HTTP/1.1 transport used by the LambdaORM REST client."""
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+import asyncio
+import codecs
+import json
+import ssl
+from lambdaorm.compression import decode, decoder
+
+CHUNK_SIZE = 64 * 1024
+# methods that can be sent again when the first attempt may have reached the server
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+class HttpResponse:
+    """Response returned by the asyncio HTTP transport, size is the length of the body as received."""
+    def __init__(self, status: int, reason: str, headers: Dict[str, str], body: bytes, size: Optional[int] = None):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+        self.size = len(body) if size is None else size
+
+    @property
+    def ok(self) -> bool:
+        """True if the status code is 2xx."""
+        return 200 <= self.status < 300
+
+    def json(self):
+        """Decodes the body as JSON."""
+        if not self.body:
+            return None
+        return json.loads(self.body)
+
+class HttpError(Exception):
+    """Raised when the service answers with an unexpected status code."""
+    def __init__(self, response: HttpResponse):
+        super().__init__(f"HTTP {response.status} {response.reason}")
+        self.response = response
+
+    @property
+    def status(self) -> int:
+        """Status code of the response."""
+        return self.response.status
+
+class JsonArrayParser:
+    """Incremental parser of a JSON array that yields its items as the bytes arrive.
+
+    Only the item being parsed is buffered, so the memory used does not depend on the
+    length of the array. A document that is not an array is yielded as a single item once
+    it is complete.
+    """
+    _WHITESPACE = ' \t\r\n'
+    _DELIMITERS = _WHITESPACE + ',]'
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._started = False
+        self._array = True
+        self._done = False
+
+    def feed(self, data: bytes, final: bool = False) -> List[Any]:
+        """Adds bytes to the parser and returns the items completed by them."""
+        self._buffer += self._text.decode(data, final)
+        items = []
+        if self._done:
+            return items
+        if not self._started:
+            position = self._skip(0)
+            if position == len(self._buffer):
+                return items
+            self._started = True
+            self._array = self._buffer[position] == '['
+            self._buffer = self._buffer[position + 1:] if self._array else self._buffer[position:]
+        if not self._array:
+            if final:
+                items.append(json.loads(self._buffer))
+                self._buffer = ''
+                self._done = True
+            return items
+        position = 0
+        while True:
+            position = self._skip(position, ',')
+            if position == len(self._buffer):
+                break
+            if self._buffer[position] == ']':
+                self._done = True
+                position += 1
+                break
+            try:
+                item, end = self._decoder.raw_decode(self._buffer, position)
+            except json.JSONDecodeError:
+                break
+            # an item is complete once a delimiter follows it, a number such as 1. or 1e may
+            # continue in the next chunk
+            if end == len(self._buffer):
+                if not final:
+                    break
+            elif self._buffer[end] not in self._DELIMITERS:
+                break
+            items.append(item)
+            position = end
+        self._buffer = self._buffer[position:]
+        if final and not self._done:
+            raise ValueError("Incomplete JSON array")
+        return items
+
+    def _skip(self, position: int, extra: str = '') -> int:
+        while position < len(self._buffer) and (self._buffer[position] in self._WHITESPACE or self._buffer[position] in extra):
+            position += 1
+        return position
+
+class _Connection:
+    """Keep-alive connection to a single origin."""
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.reusable = True
+
+    def close(self) -> None:
+        """Closes the underlying socket."""
+        self.reusable = False
+        try:
+            self.writer.close()
+        except RuntimeError:
+            # the event loop that owned the socket is already closed
+            pass
+
+    async def send(self, method: str, target: str, headers: List[Tuple[str, str]], body: Optional[bytes]) -> None:
+        """Writes a request to the socket."""
+        lines = [f"{method} {target} HTTP/1.1"]
+        lines.extend(f"{name}: {value}" for name, value in headers)
+        head = ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1')
+        self.writer.write(head + body if body else head)
+        await self.writer.drain()
+
+    async def read_head(self) -> Tuple[int, str, Dict[str, str]]:
+        """Reads the status line and the headers of a response."""
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed by the server")
+        version, status, *reason = status_line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if version == 'HTTP/1.0' or headers.get('connection', '').lower() == 'close':
+            self.reusable = False
+        return int(status), reason[0] if reason else '', headers
+
+    async def read_body(self, method: str, status: int, headers: Dict[str, str]) -> bytes:
+        """Reads the body of a response according to its framing headers."""
+        return b''.join([chunk async for chunk in self.iter_body(method, status, headers)])
+
+    async def iter_body(self, method: str, status: int, headers: Dict[str, str],
+                        timeout: Optional[float] = None) -> AsyncIterator[bytes]:
+        """Yields the body of a response as it arrives, waiting at most timeout seconds per read."""
+        if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            return
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                size_line = await asyncio.wait_for(self.reader.readline(), timeout)
+                size = int(size_line.split(b';', 1)[0].strip(), 16)
+                if size == 0:
+                    # skip trailers
+                    while (await asyncio.wait_for(self.reader.readline(), timeout)) not in (b'\r\n', b'\n', b''):
+                        pass
+                    return
+                yield await asyncio.wait_for(self.reader.readexactly(size), timeout)
+                await asyncio.wait_for(self.reader.readexactly(2), timeout)
+        elif 'content-length' in headers:
+            remaining = int(headers['content-length'])
+            while remaining > 0:
+                chunk = await asyncio.wait_for(self.reader.read(min(remaining, CHUNK_SIZE)), timeout)
+                if not chunk:
+                    raise asyncio.IncompleteReadError(b'', remaining)
+                remaining -= len(chunk)
+                yield chunk
+        else:
+            self.reusable = False
+            while chunk := await asyncio.wait_for(self.reader.read(CHUNK_SIZE), timeout):
+                yield chunk
+
+class _Pool:
+    """Idle connections and concurrency limit for a single origin."""
+    def __init__(self, max_connections: int):
+        self.idle: List[_Connection] = []
+        self.semaphore = asyncio.Semaphore(max_connections)
+
+class AsyncHttpClient:
+    """Non-blocking HTTP/1.1 client with keep-alive connection reuse.
+
+    Connections are pooled per origin and bound to the running event loop; when the loop
+    changes (for example across calls to asyncio.run) the idle connections are discarded.
+    """
+    def __init__(self, max_connections: int = 10, headers: Dict[str, str] = None):
+        self.max_connections = max_connections
+        self.headers = headers or {}
+        self._pools: Dict[Tuple[str, str, int], _Pool] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ssl_context: Optional[ssl.SSLContext] = None
+
+    def _pool(self, origin: Tuple[str, str, int]) -> _Pool:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._discard()
+            self._loop = loop
+        pool = self._pools.get(origin)
+        if pool is None:
+            pool = self._pools[origin] = _Pool(self.max_connections)
+        return pool
+
+    def _discard(self) -> None:
+        for pool in self._pools.values():
+            for connection in pool.idle:
+                connection.close()
+        self._pools = {}
+
+    async def _connect(self, scheme: str, host: str, port: int) -> _Connection:
+        ssl_context = None
+        if scheme == 'https':
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+            ssl_context = self._ssl_context
+        reader, writer = await asyncio.open_connection(host, port, ssl=ssl_context)
+        return _Connection(reader, writer)
+
+    def _prepare(self, url: str, body: Optional[bytes],
+                 headers: Optional[Dict[str, str]]) -> Tuple[Tuple[str, str, int], str, List[Tuple[str, str]]]:
+        parts = urlsplit(url)
+        scheme = parts.scheme or 'http'
+        port = parts.port or (443 if scheme == 'https' else 80)
+        target = parts.path or '/'
+        if parts.query:
+            target += '?' + parts.query
+        host = f"[{parts.hostname}]" if ':' in parts.hostname else parts.hostname
+        if parts.port is not None:
+            host += f":{parts.port}"
+        # built from the host and port, the userinfo of the url must not be sent
+        request_headers = [('Host', host), ('Connection', 'keep-alive'),
+                           ('Accept', 'application/json'), ('User-Agent', 'lambdaorm-client-python')]
+        request_headers.extend(self.headers.items())
+        if headers:
+            request_headers.extend(headers.items())
+        if body is not None:
+            request_headers.append(('Content-Length', str(len(body))))
+        return (scheme, parts.hostname, port), target, request_headers
+
+    async def request(self, method: str, url: str, body: Optional[bytes] = None, headers: Dict[str, str] = None,
+                      timeout: Optional[float] = None, idempotent: Optional[bool] = None) -> HttpResponse:
+        """Sends a request and returns the buffered response, its body decoded if it is gzip or deflate encoded.
+
+        The timeout includes the wait for a free connection of the origin. When a reused
+        keep-alive connection fails after the request was written, the request is sent again
+        on a new connection only if it is idempotent, by default if its method is.
+        """
+        origin, target, request_headers = self._prepare(url, body, headers)
+        pool = self._pool(origin)
+        idempotent = method in IDEMPOTENT_METHODS if idempotent is None else idempotent
+        return await asyncio.wait_for(
+            self._limited(pool, *origin, method, target, request_headers, body, idempotent), timeout)
+
+    async def _limited(self, pool: _Pool, scheme: str, host: str, port: int, method: str, target: str,
+                       headers: List[Tuple[str, str]], body: Optional[bytes], idempotent: bool) -> HttpResponse:
+        async with pool.semaphore:
+            return await self._exchange(pool, scheme, host, port, method, target, headers, body, idempotent)
+
+    async def _open(self, pool: _Pool, scheme: str, host: str, port: int, method: str, target: str,
+                    headers: List[Tuple[str, str]], body: Optional[bytes],
+                    idempotent: bool) -> Tuple[_Connection, int, str, Dict[str, str]]:
+        """Sends the request and reads the head of the response."""
+        while True:
+            reused = bool(pool.idle)
+            connection = pool.idle.pop() if reused else await self._connect(scheme, host, port)
+            written = False
+            try:
+                await connection.send(method, target, headers, body)
+                written = True
+                return (connection, *await connection.read_head())
+            except ConnectionError:
+                connection.close()
+                # the server may have dropped an idle keep-alive connection, retry on a fresh one
+                # unless the request was written and sending it again could apply it twice
+                if reused and (not written or idempotent):
+                    continue
+                raise
+            except BaseException:
+                connection.close()
+                raise
+
+    async def _acquire(self, pool: _Pool, scheme: str, host: str, port: int, method: str, target: str,
+                       headers: List[Tuple[str, str]], body: Optional[bytes],
+                       idempotent: bool) -> Tuple[_Connection, int, str, Dict[str, str]]:
+        """Takes a connection slot of the origin and opens the request, the caller must release the slot."""
+        await pool.semaphore.acquire()
+        try:
+            return await self._open(pool, scheme, host, port, method, target, headers, body, idempotent)
+        except BaseException:
+            pool.semaphore.release()
+            raise
+
+    def _release(self, pool: _Pool, connection: _Connection, completed: bool) -> None:
+        if completed and connection.reusable:
+            pool.idle.append(connection)
+        else:
+            connection.close()
+
+    async def _exchange(self, pool: _Pool, scheme: str, host: str, port: int, method: str, target: str,
+                        headers: List[Tuple[str, str]], body: Optional[bytes], idempotent: bool) -> HttpResponse:
+        connection, status, reason, response_headers = await self._open(
+            pool, scheme, host, port, method, target, headers, body, idempotent)
+        completed = False
+        try:
+            response_body = await connection.read_body(method, status, response_headers)
+            completed = True
+        finally:
+            self._release(pool, connection, completed)
+        return HttpResponse(status, reason, response_headers, decode(response_body, response_headers.get('content-encoding')),
+                            len(response_body))
+
+    async def stream(self, method: str, url: str, body: Optional[bytes] = None, headers: Dict[str, str] = None,
+                     timeout: Optional[float] = None, received: Callable[[int], None] = None,
+                     idempotent: Optional[bool] = None) -> AsyncIterator[bytes]:
+        """Sends a request and yields the body of the response as it arrives.
+
+        The timeout applies to the wait for a free connection and the response head together,
+        and to every read of the body. A response that is not 2xx raises HttpError. A gzip or
+        deflate encoded body is decoded, received is called with the length of every part of
+        the body as it arrives, before it is decoded. idempotent is handled as by request.
+        """
+        origin, target, request_headers = self._prepare(url, body, headers)
+        pool = self._pool(origin)
+        idempotent = method in IDEMPOTENT_METHODS if idempotent is None else idempotent
+        connection, status, reason, response_headers = await asyncio.wait_for(
+            self._acquire(pool, *origin, method, target, request_headers, body, idempotent), timeout)
+        try:
+            completed = False
+            try:
+                if not 200 <= status < 300:
+                    content = await asyncio.wait_for(connection.read_body(method, status, response_headers), timeout)
+                    completed = True
+                    raise HttpError(HttpResponse(status, reason, response_headers,
+                                                 decode(content, response_headers.get('content-encoding'))))
+                body_decoder = decoder(response_headers.get('content-encoding'))
+                async for chunk in connection.iter_body(method, status, response_headers, timeout):
+                    if received is not None:
+                        received(len(chunk))
+                    if body_decoder is not None:
+                        chunk = body_decoder.feed(chunk)
+                    if chunk:
+                        yield chunk
+                if body_decoder is not None and (chunk := body_decoder.feed(b'', True)):
+                    yield chunk
+                completed = True
+            finally:
+                self._release(pool, connection, completed)
+        finally:
+            pool.semaphore.release()
+
+    async def get(self, url: str, headers: Dict[str, str] = None, timeout: Optional[float] = None) -> HttpResponse:
+        """Sends a GET request."""
+        return await self.request('GET', url, None, headers, timeout)
+
+    async def post(self, url: str, body: Optional[bytes] = None, headers: Dict[str, str] = None,
+                   timeout: Optional[float] = None) -> HttpResponse:
+        """Sends a POST request."""
+        return await self.request('POST', url, body, headers, timeout)
+
+    async def close(self) -> None:
+        """Closes all idle connections."""
+        self._discard()
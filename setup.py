@@ -16,6 +16,7 @@ setup(
   url='https://github.com/lambda-orm/lambdaorm-client-kotlin',
   download_url='https://github.com/lambda-orm/lambdaorm-client-kotlin',
   keywords=['orm', 'lambdaorm', 'lambda', 'orm-client', 'orm-client-python'],
-  install_requires=['dataclasses-json'],
+  install_requires=['requests'],
+  python_requires='>=3.10',
   classifiers=[]
 )
\ No newline at end of file